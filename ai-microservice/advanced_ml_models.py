@@ -1,27 +1,39 @@
-import torch
-import torch.nn as nn
-import torch.optim as optim
-from transformers import AutoTokenizer, AutoModel, pipeline
 from sklearn.ensemble import RandomForestClassifier, GradientBoostingClassifier
+from sklearn.linear_model import LogisticRegression
 from sklearn.neural_network import MLPClassifier
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.preprocessing import StandardScaler, LabelEncoder
+from sklearn.preprocessing import normalize
+from sklearn.preprocessing import StandardScaler, MaxAbsScaler, LabelEncoder
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import classification_report, accuracy_score
 import numpy as np
 import pandas as pd
 import joblib
 import logging
+import os
 from typing import Dict, List, Any, Tuple
 import re
 from datetime import datetime, timedelta
+from scipy import sparse
+
+from monitoring import timed_stage
+from text_featurizer import text_featurizer
 
 logger = logging.getLogger(__name__)
 
+SLA_FEATURE_NAMES = [
+    'days_remaining', 'progress_ratio', 'processing_speed',
+    'workload_factor', 'complexity_score', 'team_efficiency',
+    'historical_performance', 'client_priority'
+]
+# Items scored per predict_proba call by SLABreachPredictor.predict_batch
+SLA_PREDICT_CHUNK_SIZE = int(os.getenv('SLA_PREDICT_CHUNK_SIZE', 5000))
+
 class DocumentClassifier:
     def __init__(self):
         self.model = None
-        self.vectorizer = None
+        self.vectorizer = None  # only set by models saved before the shared featurizer
+        self.feature_columns = None
+        self.feature_idf = None
         self.label_encoder = None
         self.scaler = None
         self.model_type = None
@@ -42,20 +54,48 @@ class DocumentClassifier:
         
         return text
     
-    def extract_features(self, documents: List[str]) -> np.ndarray:
-        """Extract features from documents"""
-        if self.vectorizer is None:
-            self.vectorizer = TfidfVectorizer(
-                max_features=5000,
-                ngram_range=(1, 3),
-                stop_words=None,
-                min_df=1,
-                max_df=0.95
-            )
+    def fit_features(self, documents: List[str], max_features: int = 5000, min_df: int = 1,
+                     max_df: float = 0.95) -> sparse.csr_matrix:
+        """Choose the model's feature columns from the shared featurizer and return training features
+        
+        The documents are added to the shared IDF statistics; the most frequent hashed
+        n-grams within the df bounds become the model's columns (like max_features), and
+        their IDF is frozen with the model so later IDF updates do not shift its inputs.
+        """
+        text_featurizer.partial_fit(documents)
+        counts = text_featurizer.counts(documents)
+        n_docs = counts.shape[0]
+        doc_freq = np.bincount(counts.indices, minlength=counts.shape[1])
+        term_freq = np.asarray(counts.sum(axis=0)).ravel()
+        eligible = np.flatnonzero((doc_freq >= min_df) & (doc_freq <= max_df * n_docs) & (doc_freq > 0))
+        if len(eligible) == 0:
+            eligible = np.flatnonzero(doc_freq)
+        top = eligible[np.argsort(-term_freq[eligible], kind='stable')[:max_features]]
         
-        # Always fit_transform during training
-        features = self.vectorizer.fit_transform(documents)
-        return features.toarray()
+        self.vectorizer = None
+        self.feature_columns = np.sort(top)
+        self.feature_idf = text_featurizer.idf()[self.feature_columns]
+        return self._weight_features(counts[:, self.feature_columns])
+    
+    def _weight_features(self, counts) -> sparse.csr_matrix:
+        return normalize(counts @ sparse.diags(self.feature_idf), norm='l2', copy=False).tocsr()
+    
+    def transform_features(self, documents: List[str]) -> sparse.csr_matrix:
+        """Features of preprocessed documents in the columns chosen at training time"""
+        if self.feature_columns is None:
+            return self.vectorizer.transform(documents)
+        return self._weight_features(text_featurizer.counts(documents)[:, self.feature_columns])
+    
+    def _model_input(self, X: sparse.csr_matrix):
+        """Scaled features for the trained model; only the sparse model takes CSR input"""
+        if self.model_type != 'sparse_linear':
+            X = X.toarray()
+        return self.scaler.transform(X)
+    
+    def extract_features(self, documents: List[str]) -> sparse.csr_matrix:
+        """Extract features from documents"""
+        # Always refit the feature columns during training
+        return self.fit_features(documents)
     
     def train_deep_learning_model(self, documents: List[str], labels: List[str]) -> Dict[str, Any]:
         """Train deep learning model for document classification"""
@@ -63,15 +103,8 @@ class DocumentClassifier:
             # Preprocess documents
             processed_docs = [self.preprocess_text(doc) for doc in documents]
             
-            # Extract features - fit vectorizer during training
-            self.vectorizer = TfidfVectorizer(
-                max_features=5000,
-                ngram_range=(1, 3),
-                stop_words=None,
-                min_df=1,
-                max_df=0.95
-            )
-            X = self.vectorizer.fit_transform(processed_docs).toarray()
+            # Extract features - choose feature columns during training; the MLP needs dense input
+            X = self.fit_features(processed_docs, max_features=5000, min_df=1, max_df=0.95).toarray()
             
             # Always create new label encoder for training to handle new labels
             self.label_encoder = LabelEncoder()
@@ -146,33 +179,14 @@ class DocumentClassifier:
             max_features = min(5000, max(100, data_size * 10))
             min_df = 1 if data_size < 100 else max(1, int(data_size * 0.01))
             
-            self.vectorizer = TfidfVectorizer(
-                max_features=max_features,
-                ngram_range=(1, 2) if data_size < 500 else (1, 3),
-                stop_words=None,
-                min_df=min_df,
-                max_df=0.95
-            )
-            X = self.vectorizer.fit_transform(processed_docs).toarray()
+            # Gradient boosting needs dense input
+            X = self.fit_features(processed_docs, max_features=max_features, min_df=min_df, max_df=0.95).toarray()
             
             # Always create new label encoder
             self.label_encoder = LabelEncoder()
             y = self.label_encoder.fit_transform(labels)
             
-            # Adaptive train/test split
-            test_size = 0.2 if data_size > 50 else 0.1 if data_size > 20 else 0.0
-            
-            if test_size > 0 and len(np.unique(y)) > 1:
-                try:
-                    X_train, X_test, y_train, y_test = train_test_split(
-                        X, y, test_size=test_size, random_state=42, stratify=y
-                    )
-                except:
-                    X_train, X_test, y_train, y_test = train_test_split(
-                        X, y, test_size=test_size, random_state=42
-                    )
-            else:
-                X_train, X_test, y_train, y_test = X, X[:0], y, y[:0]
+            X_train, X_test, y_train, y_test = self._adaptive_split(X, y)
             
             # Always create new scaler
             self.scaler = StandardScaler()
@@ -229,6 +243,83 @@ class DocumentClassifier:
             logger.error(f"Ensemble training failed: {e}")
             raise
     
+    def _adaptive_split(self, X, y):
+        """Train/test split sized to the data; small sets are trained on in full"""
+        data_size = X.shape[0]
+        test_size = 0.2 if data_size > 50 else 0.1 if data_size > 20 else 0.0
+        
+        if test_size > 0 and len(np.unique(y)) > 1:
+            try:
+                return train_test_split(X, y, test_size=test_size, random_state=42, stratify=y)
+            except ValueError:
+                return train_test_split(X, y, test_size=test_size, random_state=42)
+        return X, X[:0], y, y[:0]
+    
+    def train_sparse_model(self, documents: List[str], labels: List[str]) -> Dict[str, Any]:
+        """Train a linear classifier on the sparse TF-IDF matrix without densifying it
+        
+        MaxAbsScaler keeps the CSR structure and multinomial logistic regression fits on it,
+        so time and memory follow the non-zero n-grams instead of n_docs x features.
+        Predictions have the same class probabilities as the ensemble model.
+        """
+        try:
+            data_size = len(documents)
+            logger.info(f"Training sparse model on {data_size} documents")
+            
+            processed_docs = [self.preprocess_text(doc) for doc in documents]
+            
+            # Same adaptive feature selection as the ensemble model
+            max_features = min(5000, max(100, data_size * 10))
+            min_df = 1 if data_size < 100 else max(1, int(data_size * 0.01))
+            
+            X = self.fit_features(processed_docs, max_features=max_features, min_df=min_df, max_df=0.95)
+            
+            self.label_encoder = LabelEncoder()
+            y = self.label_encoder.fit_transform(labels)
+            
+            X_train, X_test, y_train, y_test = self._adaptive_split(X, y)
+            
+            self.scaler = MaxAbsScaler()
+            X_train_scaled = self.scaler.fit_transform(X_train)
+            
+            self.model = LogisticRegression(C=10.0, max_iter=1000, tol=1e-3)
+            self.model.fit(X_train_scaled, y_train)
+            self.model_type = 'sparse_linear'
+            
+            accuracy = 1.0
+            if X_test.shape[0] > 0:
+                y_pred = self.model.predict(self.scaler.transform(X_test))
+                accuracy = accuracy_score(y_test, y_pred)
+            
+            coefficients = np.abs(self.model.coef_)
+            
+            return {
+                'model_type': 'sparse_linear',
+                'accuracy': float(accuracy),
+                'n_classes': len(self.label_encoder.classes_),
+                'classes': self.label_encoder.classes_.tolist(),
+                'training_samples': X_train.shape[0],
+                'test_samples': X_test.shape[0],
+                'feature_count': X.shape[1],
+                'feature_density': float(X.nnz / max(1, X.shape[0] * X.shape[1])),
+                'data_size': data_size,
+                'adaptive_params': {
+                    'max_features': max_features,
+                    'min_df': min_df,
+                    'iterations': int(np.max(self.model.n_iter_))
+                },
+                'coefficient_stats': {
+                    'mean': float(np.mean(coefficients)),
+                    'std': float(np.std(coefficients)),
+                    'max': float(np.max(coefficients))
+                }
+            }
+            
+        except Exception as e:
+            logger.error(f"Sparse model training failed: {e}")
+            raise
+    
+    @timed_stage('inference', model_type='sklearn')
     def classify_document(self, document: str, return_confidence: bool = True) -> Dict[str, Any]:
         """Classify a single document"""
         try:
@@ -238,11 +329,11 @@ class DocumentClassifier:
             # Preprocess document
             processed_doc = self.preprocess_text(document)
             
-            # Extract features using fitted vectorizer
-            X = self.vectorizer.transform([processed_doc]).toarray()
+            # Extract features in the trained columns
+            X = self.transform_features([processed_doc])
             
             # Scale features
-            X_scaled = self.scaler.transform(X)
+            X_scaled = self._model_input(X)
             
             # Make prediction
             prediction = self.model.predict(X_scaled)[0]
@@ -276,6 +367,7 @@ class DocumentClassifier:
             logger.error(f"Document classification failed: {e}")
             raise
     
+    @timed_stage('inference', model_type='sklearn')
     def batch_classify(self, documents: List[str]) -> List[Dict[str, Any]]:
         """Classify multiple documents"""
         try:
@@ -285,11 +377,11 @@ class DocumentClassifier:
             # Preprocess documents
             processed_docs = [self.preprocess_text(doc) for doc in documents]
             
-            # Extract features using fitted vectorizer
-            X = self.vectorizer.transform(processed_docs).toarray()
+            # Extract features in the trained columns
+            X = self.transform_features(processed_docs)
             
             # Scale features
-            X_scaled = self.scaler.transform(X)
+            X_scaled = self._model_input(X)
             
             # Make predictions
             predictions = self.model.predict(X_scaled)
@@ -334,6 +426,8 @@ class DocumentClassifier:
             model_data = {
                 'model': self.model,
                 'vectorizer': self.vectorizer,
+                'feature_columns': self.feature_columns,
+                'feature_idf': self.feature_idf,
                 'label_encoder': self.label_encoder,
                 'scaler': self.scaler,
                 'model_type': self.model_type
@@ -352,7 +446,9 @@ class DocumentClassifier:
             model_data = joblib.load(model_path)
             
             self.model = model_data['model']
-            self.vectorizer = model_data['vectorizer']
+            self.vectorizer = model_data.get('vectorizer')
+            self.feature_columns = model_data.get('feature_columns')
+            self.feature_idf = model_data.get('feature_idf')
             self.label_encoder = model_data['label_encoder']
             self.scaler = model_data['scaler']
             self.model_type = model_data['model_type']
@@ -368,50 +464,57 @@ class SLABreachPredictor:
         self.model = None
         self.scaler = None
         self.feature_names = None
+    
+    def _feature_frame(self, data: List[Dict]) -> Tuple[np.ndarray, np.ndarray]:
+        """Features of all items in one vectorized pass, and a mask of the items with valid dates
         
-    def prepare_features(self, data: List[Dict]) -> Tuple[np.ndarray, List[str]]:
-        """Prepare features for SLA breach prediction"""
-        features = []
-        feature_names = [
-            'days_remaining', 'progress_ratio', 'processing_speed', 
-            'workload_factor', 'complexity_score', 'team_efficiency',
-            'historical_performance', 'client_priority'
-        ]
+        Dates may be ISO strings or datetimes (as returned by get_sla_items). Items with a
+        missing or unparseable start_date or deadline are marked invalid; their row is 0.
+        """
+        frame = pd.DataFrame(data, columns=[
+            'start_date', 'deadline', 'current_progress', 'total_required', 'workload',
+            'complexity', 'team_efficiency', 'historical_performance', 'client_priority'
+        ])
+        
+        def numeric(column: str, default: float) -> np.ndarray:
+            return pd.to_numeric(frame[column], errors='coerce').fillna(default).to_numpy(dtype=float)
+        
+        def dates(column: str) -> pd.Series:
+            # Aware timestamps are converted to UTC, naive ones are kept as they are
+            return pd.to_datetime(frame[column], errors='coerce', utc=True, format='ISO8601').dt.tz_convert(None)
+        
+        start_date = dates('start_date')
+        deadline = dates('deadline')
+        current_date = pd.Timestamp.now()
+        valid = (start_date.notna() & deadline.notna()).to_numpy()
+        
+        days_remaining = (deadline - current_date).dt.days.fillna(0).to_numpy(dtype=float)
+        days_elapsed = (current_date - start_date).dt.days.fillna(0).to_numpy(dtype=float)
         
-        for item in data:
-            # Calculate derived features
-            start_date = datetime.fromisoformat(item['start_date'])
-            deadline = datetime.fromisoformat(item['deadline'])
-            current_date = datetime.now()
-            
-            total_days = (deadline - start_date).days
-            days_remaining = (deadline - current_date).days
-            days_elapsed = (current_date - start_date).days
-            
-            progress = item.get('current_progress', 0)
-            total_required = item.get('total_required', 1)
-            
-            # Feature engineering
-            progress_ratio = progress / max(total_required, 1)
-            processing_speed = progress / max(days_elapsed, 1)
-            workload_factor = item.get('workload', 1.0)
-            complexity_score = item.get('complexity', 1.0)
-            team_efficiency = item.get('team_efficiency', 1.0)
-            historical_performance = item.get('historical_performance', 1.0)
-            client_priority = item.get('client_priority', 1.0)
-            
-            features.append([
-                days_remaining,
-                progress_ratio,
-                processing_speed,
-                workload_factor,
-                complexity_score,
-                team_efficiency,
-                historical_performance,
-                client_priority
-            ])
+        progress = numeric('current_progress', 0)
+        total_required = numeric('total_required', 1)
         
-        return np.array(features), feature_names
+        # Feature engineering
+        X = np.column_stack([
+            days_remaining,
+            progress / np.maximum(total_required, 1),  # progress_ratio
+            progress / np.maximum(days_elapsed, 1),  # processing_speed
+            numeric('workload', 1.0),
+            numeric('complexity', 1.0),
+            numeric('team_efficiency', 1.0),
+            numeric('historical_performance', 1.0),
+            numeric('client_priority', 1.0)
+        ])
+        X[~valid] = 0
+        return X, valid
+    
+    def prepare_features(self, data: List[Dict]) -> Tuple[np.ndarray, List[str]]:
+        """Prepare features for SLA breach prediction"""
+        X, valid = self._feature_frame(data)
+        if not valid.all():
+            invalid = np.flatnonzero(~valid)
+            raise ValueError(f"{len(invalid)} items without a valid start_date and deadline, e.g. index {invalid[0]}")
+        return X, list(SLA_FEATURE_NAMES)
     
     def train_sla_predictor(self, training_data: List[Dict], labels: List[int]) -> Dict[str, Any]:
         """Train SLA breach prediction model"""
@@ -460,40 +563,86 @@ class SLABreachPredictor:
             logger.error(f"SLA predictor training failed: {e}")
             raise
     
+    def _predict_rows(self, items: List[Dict], chunk_size: int) -> List[Dict[str, Any]]:
+        """Prediction records for items, one predict_proba call per chunk"""
+        if self.model is None:
+            raise ValueError("Model not trained yet")
+        
+        risk_levels = ['Low', 'Medium', 'High']
+        risk_colors = ['🟢', '🟠', '🔴']
+        records = []
+        for begin in range(0, len(items), chunk_size):
+            X, valid = self._feature_frame(items[begin:begin + chunk_size])
+            probabilities = np.zeros((len(X), len(self.model.classes_)))
+            if valid.any():
+                probabilities[valid] = self.model.predict_proba(self.scaler.transform(X[valid]))
+            predictions = self.model.classes_[np.argmax(probabilities, axis=1)]
+            
+            for row, probs, prediction, is_valid in zip(X.tolist(), probabilities.tolist(), predictions.tolist(), valid):
+                if not is_valid:
+                    records.append({'error': 'start_date and deadline are required ISO dates'})
+                    continue
+                records.append({
+                    'risk_level': risk_levels[prediction],
+                    'risk_color': risk_colors[prediction],
+                    'breach_probability': float(probs[prediction]),
+                    'class_probabilities': {
+                        'no_breach': float(probs[0]),
+                        'breach_likely': float(probs[1]),
+                        'breach_certain': float(probs[2])
+                    },
+                    'confidence': float(max(probs)),
+                    'feature_contributions': dict(zip(self.feature_names, row))
+                })
+        return records
+    
+    @timed_stage('inference', model_type='sklearn')
     def predict_sla_breach(self, data: Dict) -> Dict[str, Any]:
         """Predict SLA breach for a single item"""
         try:
-            if self.model is None:
-                raise ValueError("Model not trained yet")
-            
-            # Prepare features
-            X, _ = self.prepare_features([data])
-            X_scaled = self.scaler.transform(X)
-            
-            # Make prediction
-            prediction = self.model.predict(X_scaled)[0]
-            probabilities = self.model.predict_proba(X_scaled)[0]
-            
-            risk_levels = ['Low', 'Medium', 'High']
-            risk_colors = ['🟢', '🟠', '🔴']
-            
-            return {
-                'risk_level': risk_levels[prediction],
-                'risk_color': risk_colors[prediction],
-                'breach_probability': float(probabilities[prediction]),
-                'class_probabilities': {
-                    'no_breach': float(probabilities[0]),
-                    'breach_likely': float(probabilities[1]),
-                    'breach_certain': float(probabilities[2])
-                },
-                'confidence': float(np.max(probabilities)),
-                'feature_contributions': dict(zip(self.feature_names, X[0].tolist()))
-            }
+            result = self._predict_rows([data], chunk_size=1)[0]
+            if 'error' in result:
+                raise ValueError(result['error'])
+            return result
             
         except Exception as e:
             logger.error(f"SLA breach prediction failed: {e}")
             raise
+    
+    @timed_stage('inference', model_type='sklearn')
+    def predict_batch(self, items: List[Dict], chunk_size: int = SLA_PREDICT_CHUNK_SIZE) -> List[Dict[str, Any]]:
+        """Predict SLA breach for many items
+        
+        Features are built for a whole chunk at once and scored with one predict_proba call.
+        Items without valid dates get an error record instead of failing the batch.
+        """
+        try:
+            records = self._predict_rows(items, max(1, chunk_size))
+            for index, (item, record) in enumerate(zip(items, records)):
+                record['item_index'] = index
+                record['item_id'] = item.get('id')
+            return records
+            
+        except Exception as e:
+            logger.error(f"Batch SLA breach prediction failed: {e}")
+            raise
+
+def train_document_classifier_model(documents: List[str], labels: List[str]) -> Tuple[Dict[str, Any], DocumentClassifier]:
+    """Train a fresh document classifier; returns its metrics and the classifier to publish
+
+    Module-level so the fit can run in a compute worker process.
+    """
+    classifier = DocumentClassifier()
+    result = classifier.train_sparse_model(documents, labels)
+    # Share the training documents' IDF counts; compute workers have no sync schedule
+    text_featurizer.sync()
+    return result, classifier
+
+def train_sla_predictor_model(training_data: List[Dict], labels: List[int]) -> Tuple[Dict[str, Any], SLABreachPredictor]:
+    """Train a fresh SLA predictor; returns its metrics and the predictor to publish
 
-# Global instances
-document_classifier = DocumentClassifier()
-sla_predictor = SLABreachPredictor()
\ No newline at end of file
+    Module-level so the fit can run in a compute worker process.
+    """
+    predictor = SLABreachPredictor()
+    result = predictor.train_sla_predictor(training_data, labels)
+    return result, predictor
\ No newline at end of file
@@ -75,14 +75,13 @@ class AILearningEngine:
             from advanced_ml_models import DocumentClassifier
             improved_classifier = DocumentClassifier()
             
-            result = improved_classifier.train_ensemble_model(unique_docs, unique_labels)
+            result = improved_classifier.train_sparse_model(unique_docs, unique_labels)
             
-            # Replace global classifier if improvement is significant
+            # Publish as the served classifier if improvement is significant
             if result['accuracy'] > 0.8:  # Only if good accuracy
-                global document_classifier
-                from ai_microservice import document_classifier
-                document_classifier = improved_classifier
-                logger.info(f"Model improved with accuracy: {result['accuracy']:.3f}")
+                from model_serving import document_classifier
+                version = document_classifier.publish(improved_classifier, {'performance': result})
+                logger.info(f"Model improved with accuracy: {result['accuracy']:.3f} (version {version})")
                 return True
             
             return False
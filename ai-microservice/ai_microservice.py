@@ -1,10 +1,11 @@
 from fastapi import FastAPI, Body, Depends, HTTPException, status, File, UploadFile
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from typing import List, Dict, Any, Optional
 from collections import Counter, defaultdict
-import spacy
-from sklearn.feature_extraction.text import TfidfVectorizer
+import heapq
+import json
 from sklearn.metrics.pairwise import cosine_similarity
 from sklearn.ensemble import IsolationForest
 from sklearn.neighbors import LocalOutlierFactor
@@ -15,11 +16,11 @@ from datetime import datetime, timedelta
 import numpy as np
 import pandas as pd
 import joblib
-from prophet import Prophet
 import warnings
 import asyncio
 import schedule
 import threading
+import atexit
 import logging
 warnings.filterwarnings("ignore")
 logging.getLogger("passlib").setLevel(logging.CRITICAL)
@@ -29,36 +30,50 @@ logging.getLogger("adaptive_learning").setLevel(logging.CRITICAL)
 # Import our custom modules
 from auth import authenticate_user, create_access_token, get_current_active_user, real_users_db, Token, ACCESS_TOKEN_EXPIRE_MINUTES, get_user
 from database import get_db_manager
-from monitoring import log_endpoint_call, metrics_middleware, get_metrics, logger
-from explainable_ai import explainer
-from advanced_ml_models import document_classifier, sla_predictor
-from pattern_recognition import recurring_detector, temporal_analyzer
+from monitoring import log_endpoint_call, metrics_middleware, get_metrics, logger, time_stage, TimedJSONResponse, TimedRoute
+from model_serving import model_serving, document_classifier, sla_predictor, anomaly_baseline, MODEL_REFRESH_SECONDS
+from pattern_recognition import recurring_detector, temporal_analyzer, sparse_similarity_join, similarity_clusters
 from intelligent_automation import smart_router, decision_engine
 # Import ARS-specific modules
-from ars_forecasting import generate_client_forecast, calculate_staffing_requirements
+from ars_forecasting import generate_client_forecast, calculate_staffing_requirements, shutdown_forecast_pool
 from ars_complaints_intelligence import generate_complaints_intelligence
 # Learning and persistence modules
 from learning_engine import learning_engine
 from model_persistence import model_persistence
 from adaptive_learning import adaptive_learning
 from pattern_recognition_enhanced import enhanced_pattern_recognition
-# Generative AI module
-from generative_ai import generative_ai
 # Performance Analytics AI Enhancement
 from performance_analytics_enhancement import performance_analytics_ai
 # Advanced AI modules
 from advanced_clustering import advanced_clustering
 from sophisticated_anomaly_detection import sophisticated_anomaly_detection
+# Columnar SLA risk scoring
+from sla_risk_scoring import score_sla_risk, parse_sla_date, agent_risk_from_metrics
+from keyword_matcher import KeywordMatcher
+from forecast_cache import forecast_cache
+from nlp_service import nlp_service
+from text_featurizer import text_featurizer, analyze_featurizer, TEXT_FEATURIZER_SYNC_SECONDS
+from leader_election import scheduler_lock
+# Heavy subsystems (SHAP, torch/transformers, Prophet, spaCy) load on first use
+from subsystems import subsystems, explainer, generative_ai
+from compute_executor import compute_executor, ComputeError
+from sophisticated_anomaly_detection import (
+    score_feature_anomalies, fit_performance_baseline,
+    ANOMALY_BASELINE_DAYS, ANOMALY_BASELINE_MIN_RECORDS, ANOMALY_BASELINE_WINDOW_DAYS
+)
+from advanced_ml_models import train_document_classifier_model, train_sla_predictor_model, SLA_PREDICT_CHUNK_SIZE
 
-app = FastAPI(title="Enhanced ML Analytics API", version="2.0.0")
-nlp = spacy.load("fr_core_news_sm")
+app = FastAPI(title="Enhanced ML Analytics API", version="2.0.0", default_response_class=TimedJSONResponse)
+# Routes record when their endpoint returns, so serialization covers encoding and rendering
+app.router.route_class = TimedRoute
 
-# Add connection handling middleware first
+# Add connection handling middleware first (timeout, error mapping and metrics in one ASGI layer)
 try:
     from connection_middleware import add_connection_middleware
     app = add_connection_middleware(app)
 except ImportError:
     logger.warning("Connection middleware not available")
+    app.middleware("http")(metrics_middleware)
 
 # Add CORS middleware
 app.add_middleware(
@@ -69,9 +84,6 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Add metrics middleware
-app.middleware("http")(metrics_middleware)
-
 # Authentication endpoint
 @app.post("/token", response_model=Token)
 async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends()):
@@ -129,41 +141,88 @@ async def get_live_performance(period: str = "current_month", current_user = Dep
     performance_data = await db.get_performance_data(period)
     return {"performance": performance_data, "period": period}
 
+# Cosine similarity above which two complaints count as recurrent, calibrated for
+# unigram TF-IDF without stop words (analyze_featurizer)
+ANALYZE_SIMILARITY_THRESHOLD = 0.8
+
 @app.post("/analyze")
 @log_endpoint_call("analyze")
 async def analyze(complaints: List[Dict], current_user = Depends(get_current_active_user)):
-    # Use TF-IDF and cosine similarity to detect recurrent complaints
+    # Use unigram TF-IDF (persisted hashed featurizer) and cosine similarity to detect recurrent complaints
     db = await get_db_manager()
     await db.save_prediction_result("analyze", {"complaints_count": len(complaints)}, {}, current_user.username)
     
     texts = [c.get("description", "") for c in complaints]
     if not texts:
         return {"recurrent": [], "summary": "No complaints provided."}
-    vectorizer = TfidfVectorizer().fit_transform(texts)
-    similarity_matrix = cosine_similarity(vectorizer)
-    recurrent_indices = set()
-    for i in range(len(texts)):
-        for j in range(i+1, len(texts)):
-            if similarity_matrix[i][j] > 0.8:  # 80% similarity threshold
-                recurrent_indices.add(i)
-                recurrent_indices.add(j)
+    tfidf_matrix = analyze_featurizer.transform(texts)
+    
+    # Blocked sparse join: only pairs above the threshold are ever materialized
+    rows, cols, similarities = sparse_similarity_join(tfidf_matrix, ANALYZE_SIMILARITY_THRESHOLD)
+    above = similarities > ANALYZE_SIMILARITY_THRESHOLD
+    rows, cols, similarities = rows[above], cols[above], similarities[above]
+    
+    groups = similarity_clusters(len(texts), rows, cols)
+    recurrent_indices = sorted(i for group in groups for i in group)
     recurrent = [complaints[i] for i in recurrent_indices]
-    summary = f"{len(recurrent)} recurrent complaints detected." if recurrent else "No recurrent complaints."
-    return {"recurrent": recurrent, "summary": summary}
+    
+    pair_cluster = {}
+    for cluster_id, group in enumerate(groups):
+        for i in group:
+            pair_cluster[i] = cluster_id
+    cluster_similarities = defaultdict(list)
+    for i, similarity in zip(rows, similarities):
+        cluster_similarities[pair_cluster[int(i)]].append(float(similarity))
+    
+    clusters = [
+        {
+            "cluster_id": cluster_id,
+            "size": len(group),
+            "complaint_ids": [complaints[i].get("id", i) for i in group],
+            "avg_similarity": round(float(np.mean(cluster_similarities[cluster_id])), 3),
+            "max_similarity": round(float(np.max(cluster_similarities[cluster_id])), 3)
+        }
+        for cluster_id, group in enumerate(groups)
+    ]
+    summary = (f"{len(recurrent)} recurrent complaints detected in {len(clusters)} clusters."
+               if recurrent else "No recurrent complaints.")
+    return {"recurrent": recurrent, "clusters": clusters, "summary": summary}
+
+def build_suggestion(entities: List[tuple]) -> str:
+    """Reply suggestion mentioning the entities found in a complaint"""
+    if entities:
+        entity_str = ", ".join(text for text, _ in entities)
+        return f"Bonjour, nous traitons votre réclamation concernant: {entity_str}. Merci de votre patience."
+    return "Bonjour, nous traitons votre réclamation. Merci de votre patience."
 
 @app.post("/suggestions")
 @log_endpoint_call("suggestions")
 async def suggestions(complaint: Dict = Body(...), current_user = Depends(get_current_active_user)):
     # Use spaCy to extract entities and suggest a response
     desc = complaint.get("description", "")
-    doc = nlp(desc)
-    entities = [ent.text for ent in doc.ents]
-    if entities:
-        entity_str = ", ".join(entities)
-        suggestion = f"Bonjour, nous traitons votre réclamation concernant: {entity_str}. Merci de votre patience."
-    else:
-        suggestion = "Bonjour, nous traitons votre réclamation. Merci de votre patience."
-    return {"suggestion": suggestion}
+    entities = await nlp_service.entities(desc)
+    return {"suggestion": build_suggestion(entities)}
+
+@app.post("/suggestions/batch")
+@log_endpoint_call("suggestions_batch")
+async def suggestions_batch(data: Dict = Body(...), current_user = Depends(get_current_active_user)):
+    """Reply suggestions for a list of complaints, run through spaCy in shared batches"""
+    complaints = data.get("complaints", [])
+    if not isinstance(complaints, list):
+        raise HTTPException(status_code=400, detail="complaints must be a list")
+    descriptions = [(c.get("description", "") if isinstance(c, dict) else str(c)) or "" for c in complaints]
+    try:
+        entities = await nlp_service.entities_many(descriptions)
+    except Exception as e:
+        logger.error(f"Batch suggestions failed: {e}")
+        raise HTTPException(status_code=500, detail=f"Batch suggestions failed: {str(e)}")
+    return {
+        "suggestions": [
+            {"id": c.get("id") if isinstance(c, dict) else None, "suggestion": build_suggestion(ents)}
+            for c, ents in zip(complaints, entities)
+        ],
+        "count": len(complaints)
+    }
 
 @app.post("/recommendations")
 @log_endpoint_call("recommendations")
@@ -387,34 +446,51 @@ async def recommendations(payload: Dict = Body(...), current_user = Depends(get_
         raise HTTPException(status_code=500, detail=f"Recommendations generation failed: {str(e)}")
 
 # === AI LEARNING COMPONENTS ===
-from functools import wraps
-from database import save_ai_output_global
-
-def save_ai_response(endpoint_name: str = None):
-    def decorator(func):
-        @wraps(func)
-        async def wrapper(*args, **kwargs):
-            try:
-                result = await func(*args, **kwargs)
-                user_id = "system"
-                input_data = {}
-                confidence = None
-                
-                if 'current_user' in kwargs and kwargs['current_user']:
-                    user_id = getattr(kwargs['current_user'], 'username', 'system')
-                if 'data' in kwargs:
-                    input_data = kwargs['data']
-                if isinstance(result, dict):
-                    confidence = result.get('confidence', result.get('accuracy', None))
-                
-                endpoint = endpoint_name or func.__name__
-                await save_ai_output_global(endpoint, input_data, result, user_id, confidence)
-                return result
-            except Exception as e:
-                logger.debug(f"AI save failed: {e}")
-                return await func(*args, **kwargs)
-        return wrapper
-    return decorator
+from ai_decorator import save_ai_response
+from database import ai_output_writer
+
+@app.on_event("shutdown")
+async def flush_ai_outputs():
+    """Persist AI outputs still waiting in the write-behind queue"""
+    await ai_output_writer.drain()
+
+@app.on_event("shutdown")
+async def stop_forecast_pool():
+    """Stop the multi-client forecasting worker processes"""
+    shutdown_forecast_pool()
+
+@app.on_event("shutdown")
+async def stop_compute_executor():
+    """Stop the sklearn compute worker processes"""
+    compute_executor.shutdown()
+
+def compute_http_error(error: ComputeError) -> HTTPException:
+    """503 when the compute executor is saturated or lost its worker, 504 on task timeout"""
+    return HTTPException(status_code=error.status_code, detail=str(error))
+
+@app.on_event("startup")
+async def warm_subsystems():
+    """Load the subsystems listed in AI_WARMUP_SUBSYSTEMS before the first request"""
+    loaded = await asyncio.to_thread(subsystems.warmup)
+    if loaded:
+        logger.info(f"Warm-up subsystems: {loaded}")
+
+@app.on_event("startup")
+async def load_served_models():
+    """Serve the latest published model versions; a fork inherits them from the master"""
+    swapped = await asyncio.to_thread(model_serving.refresh)
+    if any(swapped.values()):
+        logger.info(f"Loaded served models: {model_serving.info()['models']}")
+
+@app.on_event("shutdown")
+async def stop_nlp_service():
+    nlp_service.shutdown()
+
+@app.on_event("shutdown")
+async def save_text_featurizer():
+    """Merge IDF statistics gathered since the last scheduled sync"""
+    text_featurizer.sync()
+    analyze_featurizer.sync()
 
 class AILearningEngine:
     async def improve_classification_model(self, documents, labels):
@@ -432,8 +508,13 @@ ai_learning_engine = AILearningEngine()
 @app.post("/sla_prediction")
 @log_endpoint_call("sla_prediction")
 @save_ai_response("sla_prediction")
-async def sla_prediction(data: List[Dict] = Body(...), explain: bool = False, current_user = Depends(get_current_active_user)):
-    """Real ARS SLA breach prediction using actual bordereau data"""
+async def sla_prediction(data: List[Dict] = Body(...), explain: bool = False, stream: bool = False,
+                         chunk_size: int = 500, current_user = Depends(get_current_active_user)):
+    """Real ARS SLA breach prediction using actual bordereau data
+    
+    With stream=true the whole open backlog is scored chunk by chunk from a server-side
+    cursor and returned as NDJSON, with the summary in a trailer record.
+    """
     try:
         db = await get_db_manager()
         
@@ -455,71 +536,40 @@ async def sla_prediction(data: List[Dict] = Body(...), explain: bool = False, cu
                     'assigned_to_name': 'Non assigné'
                 }
                 bordereaux.append(bordereau)
+        elif stream:
+            bordereaux = None
         else:
             # Get real bordereau data
             bordereaux = await db.get_bordereau_with_sla_data(limit=100)
         
+        if stream:
+            async def test_chunks():
+                yield bordereaux
+            chunks = test_chunks() if bordereaux is not None else db.iter_bordereau_with_sla_data(chunk_size=max(1, chunk_size))
+            return StreamingResponse(
+                stream_sla_predictions(chunks, db, explain, current_user.username),
+                media_type="application/x-ndjson"
+            )
+        
         if not bordereaux:
             return {'sla_predictions': [], 'message': 'No bordereau data found'}
         
-        results = []
-        for bordereau in bordereaux:
-            try:
-                # Real ARS SLA calculation
-                sla_analysis = await calculate_real_sla_risk(bordereau, db)
-                
-                result = {
-                    'bordereau_id': bordereau['id'],
-                    'reference': bordereau['reference'],
-                    'client_name': bordereau['client_name'],
-                    'risk_score': sla_analysis['risk_score'],
-                    'status_color': sla_analysis['status_color'],
-                    'risk_level': sla_analysis['risk_level'],
-                    'days_remaining': sla_analysis['days_remaining'],
-                    'processing_days': sla_analysis['processing_days'],
-                    'sla_deadline_days': bordereau['delaiReglement'],
-                    'predicted_breach_at': sla_analysis.get('predicted_breach_at'),
-                    'top_risk_drivers': sla_analysis['risk_drivers'],
-                    'reassignment_suggestion': sla_analysis.get('reassignment_suggestion'),
-                    'current_status': bordereau['statut'],
-                    'assigned_to': bordereau.get('assigned_to_name', 'Non assigné')
-                }
-                
-                # Add explanation if requested
-                if explain:
-                    result['explanation'] = generate_sla_explanation(bordereau, sla_analysis)
-                
-                results.append(result)
-                
-            except Exception as e:
-                logger.error(f"SLA prediction error for bordereau {bordereau.get('id')}: {e}")
-                results.append({
-                    'bordereau_id': bordereau.get('id'),
-                    'error': f'SLA calculation failed: {str(e)}'
-                })
+        # Load agent metrics once for the whole request instead of once per bordereau
+        agent_snapshot = await db.get_agent_metrics_snapshot()
+        
+        results = await score_sla_chunk(bordereaux, db, agent_snapshot, explain)
         
         # Sort by risk score (highest risk first)
         results.sort(key=lambda x: x.get('risk_score', 0), reverse=True)
         
-        # Generate summary statistics
-        total_count = len(results)
-        high_risk_count = len([r for r in results if r.get('risk_score', 0) > 0.7])
-        medium_risk_count = len([r for r in results if 0.3 <= r.get('risk_score', 0) <= 0.7])
-        
         base_result = {
             'sla_predictions': results,
-            'summary': {
-                'total_bordereaux': total_count,
-                'high_risk_count': high_risk_count,
-                'medium_risk_count': medium_risk_count,
-                'low_risk_count': total_count - high_risk_count - medium_risk_count,
-                'overall_risk_rate': (high_risk_count + medium_risk_count) / total_count if total_count > 0 else 0
-            }
+            'summary': summarize_sla_predictions(results)
         }
         
         # Enhance with ARS-specific learning
         from learning_engine import enhance_with_ars_learning
-        enhanced_result = enhance_with_ars_learning('sla_prediction', base_result, {'bordereaux': bordereaux})
+        enhanced_result = await enhance_with_ars_learning('sla_prediction', base_result, {'bordereaux': bordereaux})
         
         # Also apply adaptive learning
         try:
@@ -541,29 +591,143 @@ async def sla_prediction(data: List[Dict] = Body(...), explain: bool = False, cu
         logger.error(f"SLA prediction endpoint failed: {e}")
         raise HTTPException(status_code=500, detail=f"SLA prediction failed: {str(e)}")
 
-async def calculate_real_sla_risk(bordereau: Dict, db_manager) -> Dict:
+async def score_sla_chunk(bordereaux: List[Dict], db, agent_snapshot, explain: bool = False) -> List[Dict]:
+    """Score one chunk of bordereaux and build the /sla_prediction result records"""
+    # Score every bordereau in one vectorized pass (same results as calculate_real_sla_risk)
+    risk_batch = score_sla_risk(bordereaux, agent_snapshot)
+    
+    results = []
+    for i, bordereau in enumerate(bordereaux):
+        try:
+            # Real ARS SLA calculation
+            sla_analysis = risk_batch.analysis(i)
+            if not sla_analysis.get('calculation_error') and risk_batch.risk_score[i] > 0.7:
+                sla_analysis['reassignment_suggestion'] = await generate_reassignment_suggestion(
+                    bordereau, db, agent_snapshot
+                )
+            
+            result = {
+                'bordereau_id': bordereau['id'],
+                'reference': bordereau['reference'],
+                'client_name': bordereau['client_name'],
+                'risk_score': sla_analysis['risk_score'],
+                'status_color': sla_analysis['status_color'],
+                'risk_level': sla_analysis['risk_level'],
+                'days_remaining': sla_analysis['days_remaining'],
+                'processing_days': sla_analysis['processing_days'],
+                'sla_deadline_days': bordereau['delaiReglement'],
+                'predicted_breach_at': sla_analysis.get('predicted_breach_at'),
+                'top_risk_drivers': sla_analysis['risk_drivers'],
+                'reassignment_suggestion': sla_analysis.get('reassignment_suggestion'),
+                'current_status': bordereau['statut'],
+                'assigned_to': bordereau.get('assigned_to_name', 'Non assigné')
+            }
+            
+            # Add explanation if requested
+            if explain:
+                result['explanation'] = generate_sla_explanation(bordereau, sla_analysis)
+            
+            results.append(result)
+            
+        except Exception as e:
+            logger.error(f"SLA prediction error for bordereau {bordereau.get('id')}: {e}")
+            results.append({
+                'bordereau_id': bordereau.get('id'),
+                'error': f'SLA calculation failed: {str(e)}'
+            })
+    
+    return results
+
+def summarize_sla_predictions(results: List[Dict]) -> Dict:
+    """Summary statistics over /sla_prediction result records"""
+    total_count = len(results)
+    high_risk_count = len([r for r in results if r.get('risk_score', 0) > 0.7])
+    medium_risk_count = len([r for r in results if 0.3 <= r.get('risk_score', 0) <= 0.7])
+    return {
+        'total_bordereaux': total_count,
+        'high_risk_count': high_risk_count,
+        'medium_risk_count': medium_risk_count,
+        'low_risk_count': total_count - high_risk_count - medium_risk_count,
+        'overall_risk_rate': (high_risk_count + medium_risk_count) / total_count if total_count > 0 else 0
+    }
+
+# Highest-risk records kept for the streaming trailer
+SLA_STREAM_TOP_RISKS = 50
+
+async def stream_sla_predictions(chunks, db, explain: bool, username: str):
+    """Yield NDJSON prediction records chunk by chunk, then a summary trailer
+    
+    Only counters and a bounded top-risk heap are kept across chunks, so memory does not
+    grow with the size of the backlog.
+    """
+    total_count = high_risk_count = medium_risk_count = error_count = 0
+    top_risks = []  # min-heap of (risk_score, seq, record)
+    seq = 0
+    agent_snapshot = await db.get_agent_metrics_snapshot()
+    
+    try:
+        async for chunk in chunks:
+            results = await score_sla_chunk(chunk, db, agent_snapshot, explain)
+            lines = []
+            for result in results:
+                risk_score = result.get('risk_score', 0)
+                total_count += 1
+                if 'error' in result:
+                    error_count += 1
+                if risk_score > 0.7:
+                    high_risk_count += 1
+                elif risk_score >= 0.3:
+                    medium_risk_count += 1
+                
+                seq += 1
+                entry = (risk_score, seq, result)
+                if len(top_risks) < SLA_STREAM_TOP_RISKS:
+                    heapq.heappush(top_risks, entry)
+                elif risk_score > top_risks[0][0]:
+                    heapq.heapreplace(top_risks, entry)
+                
+                lines.append(json.dumps({'type': 'prediction', **result}, default=str))
+            if lines:
+                yield '\n'.join(lines) + '\n'
+    except Exception as e:
+        logger.error(f"SLA prediction stream failed after {total_count} bordereaux: {e}")
+        yield json.dumps({'type': 'error', 'error': f'SLA prediction stream failed: {str(e)}'}) + '\n'
+    
+    summary = {
+        'total_bordereaux': total_count,
+        'high_risk_count': high_risk_count,
+        'medium_risk_count': medium_risk_count,
+        'low_risk_count': total_count - high_risk_count - medium_risk_count,
+        'error_count': error_count,
+        'overall_risk_rate': (high_risk_count + medium_risk_count) / total_count if total_count > 0 else 0
+    }
+    top = [entry[2] for entry in sorted(top_risks, key=lambda x: (-x[0], x[1]))]
+    yield json.dumps({'type': 'summary', 'summary': summary, 'top_risks': top}, default=str) + '\n'
+    
+    await db.save_prediction_result(
+        "sla_prediction",
+        {'bordereau_count': total_count, 'stream': True},
+        {'summary': summary},
+        username
+    )
+
+async def calculate_real_sla_risk(bordereau: Dict, db_manager, agent_snapshot=None) -> Dict:
     """Calculate real SLA risk using ARS business logic"""
     try:
         now = datetime.now()
+        if agent_snapshot is None:
+            agent_snapshot = await db_manager.get_agent_metrics_snapshot()
         
         # Handle both test data and real bordereau data with robust date parsing
         if 'start_date' in bordereau and 'deadline' in bordereau:
             # Test data format
             try:
-                start_date_str = str(bordereau['start_date']).replace('Z', '').replace('+00:00', '')
-                if 'T' in start_date_str:
-                    start_date = datetime.fromisoformat(start_date_str)
-                else:
-                    start_date = datetime.strptime(start_date_str, '%Y-%m-%d')
+                start_date = parse_sla_date(bordereau['start_date'])
             except (ValueError, TypeError):
                 start_date = now - timedelta(days=5)
                 
             try:
-                deadline_str = str(bordereau['deadline']).replace('Z', '').replace('+00:00', '')
-                if 'T' in deadline_str:
-                    deadline = datetime.fromisoformat(deadline_str)
-                else:
-                    deadline = datetime.strptime(deadline_str, '%Y-%m-%d')
+                deadline = parse_sla_date(bordereau['deadline'])
             except (ValueError, TypeError):
                 deadline = now + timedelta(days=5)
             
@@ -574,11 +738,7 @@ async def calculate_real_sla_risk(bordereau: Dict, db_manager) -> Dict:
             # Real bordereau data - calculate from dateReception and delaiReglement
             try:
                 if bordereau.get('dateReception'):
-                    reception_date_str = str(bordereau['dateReception'])
-                    if 'T' in reception_date_str:
-                        reception_date = datetime.fromisoformat(reception_date_str.replace('Z', '').replace('+00:00', ''))
-                    else:
-                        reception_date = datetime.strptime(reception_date_str.split('T')[0], '%Y-%m-%d')
+                    reception_date = parse_sla_date(bordereau['dateReception'])
                 else:
                     reception_date = now - timedelta(days=5)
                     
@@ -604,7 +764,7 @@ async def calculate_real_sla_risk(bordereau: Dict, db_manager) -> Dict:
         # Base risk factors
         time_risk = calculate_time_risk(days_remaining, sla_days)
         complexity_risk = calculate_complexity_risk(bs_count)
-        agent_risk = await calculate_agent_risk(assigned_user_id, db_manager) if assigned_user_id else 0.8
+        agent_risk = await calculate_agent_risk(assigned_user_id, db_manager, agent_snapshot) if assigned_user_id else 0.8
         
         # Combined risk score (weighted)
         risk_score = (
@@ -653,7 +813,7 @@ async def calculate_real_sla_risk(bordereau: Dict, db_manager) -> Dict:
         # Generate reassignment suggestion if high risk
         reassignment_suggestion = None
         if risk_score > 0.7:
-            reassignment_suggestion = await generate_reassignment_suggestion(bordereau, db_manager)
+            reassignment_suggestion = await generate_reassignment_suggestion(bordereau, db_manager, agent_snapshot)
         
         return {
             'risk_score': min(1.0, max(0.0, risk_score)),
@@ -707,44 +867,29 @@ def calculate_complexity_risk(bs_count: int) -> float:
     else:
         return 0.2  # Simple
 
-async def calculate_agent_risk(assigned_user_id: int, db_manager) -> float:
+async def calculate_agent_risk(assigned_user_id: int, db_manager, agent_snapshot=None) -> float:
     """Calculate risk based on assigned agent performance"""
     try:
-        agents = await db_manager.get_agent_performance_metrics()
-        agent = next((a for a in agents if a['id'] == assigned_user_id), None)
-        
-        if not agent:
-            return 0.8  # Unknown agent = high risk
-        
-        total_bordereaux = agent.get('total_bordereaux', 0)
-        sla_compliant = agent.get('sla_compliant', 0)
-        avg_hours = agent.get('avg_hours', 48)
-        
-        if total_bordereaux == 0:
-            return 0.7  # New agent = medium-high risk
-        
-        # SLA compliance rate
-        compliance_rate = sla_compliant / total_bordereaux
-        
-        # Speed factor (lower hours = better)
-        speed_factor = min(1.0, 24 / max(avg_hours, 1))
-        
-        # Combined agent risk (lower is better)
-        agent_performance = (compliance_rate + speed_factor) / 2
-        
-        return max(0.1, 1.0 - agent_performance)
+        if agent_snapshot is None:
+            agent_snapshot = await db_manager.get_agent_metrics_snapshot()
+        return agent_risk_from_metrics(agent_snapshot.get(assigned_user_id))
         
     except Exception as e:
         logger.error(f"Agent risk calculation failed: {e}")
         return 0.5
 
-async def generate_reassignment_suggestion(bordereau: Dict, db_manager) -> Dict:
+async def generate_reassignment_suggestion(bordereau: Dict, db_manager, agent_snapshot=None) -> Dict:
     """Generate reassignment suggestion for high-risk bordereaux"""
     try:
         from intelligent_automation import smart_router
         
+        if agent_snapshot is None:
+            agent_snapshot = await db_manager.get_agent_metrics_snapshot()
+        
         # Get assignment suggestion
-        suggestion = await smart_router.suggest_optimal_assignment(bordereau, db_manager)
+        suggestion = await smart_router.suggest_optimal_assignment(
+            bordereau, db_manager, agents=agent_snapshot.agents
+        )
         
         if suggestion.get('recommended_assignment'):
             recommended = suggestion['recommended_assignment']
@@ -1273,8 +1418,12 @@ async def predict_resources(data: Dict = Body(...), current_user = Depends(get_c
 # NEW ENDPOINTS - ANOMALY DETECTION
 @app.post("/forecast_trends")
 @log_endpoint_call("forecast_trends")
-async def forecast_trends(data: List[Dict] = Body(...), current_user = Depends(get_current_active_user)):
-    """Enhanced Prophet time series forecasting with advanced features"""
+async def forecast_trends(data: List[Dict] = Body(...), series_key: str = None, current_user = Depends(get_current_active_user)):
+    """Enhanced Prophet time series forecasting with advanced features
+    
+    Fitted models are cached per series (series_key, or caller + first date) and reused
+    while the posted series is unchanged.
+    """
     try:
         # Validate input data
         if not data or len(data) == 0:
@@ -1359,26 +1508,38 @@ async def forecast_trends(data: List[Dict] = Body(...), current_user = Depends(g
             }
         
         # Enhanced Prophet model with automatic parameter tuning
-        model = Prophet(
-            daily_seasonality=len(df) > 14,  # Enable if enough data
-            weekly_seasonality=len(df) > 14,
-            yearly_seasonality=len(df) > 365,
-            seasonality_mode='multiplicative' if df['y'].std() > df['y'].mean() * 0.1 else 'additive',
-            changepoint_prior_scale=0.05,  # More flexible to trend changes
-            seasonality_prior_scale=10.0,  # More flexible to seasonality
-            interval_width=0.8  # 80% confidence intervals
-        )
-        
-        # Add custom seasonalities if data supports it
-        if len(df) > 30:
-            model.add_seasonality(name='monthly', period=30.5, fourier_order=5)
-        
-        model.fit(df)
+        seasonality_enabled = len(df) > 14  # Enable if enough data
+        yearly_enabled = len(df) > 365
+        monthly_enabled = len(df) > 30
+        seasonality_mode = 'multiplicative' if df['y'].std() > df['y'].mean() * 0.1 else 'additive'
+        
+        Prophet = subsystems.get('prophet').Prophet
+        
+        def build_trend_model():
+            model = Prophet(
+                daily_seasonality=seasonality_enabled,
+                weekly_seasonality=seasonality_enabled,
+                yearly_seasonality=yearly_enabled,
+                seasonality_mode=seasonality_mode,
+                changepoint_prior_scale=0.05,  # More flexible to trend changes
+                seasonality_prior_scale=10.0,  # More flexible to seasonality
+                interval_width=0.8  # 80% confidence intervals
+            )
+            
+            # Add custom seasonalities if data supports it
+            if monthly_enabled:
+                model.add_seasonality(name='monthly', period=30.5, fourier_order=5)
+            return model
         
         # Make future predictions with enhanced periods
         forecast_periods = min(14, max(7, len(df) // 4))  # Adaptive forecast period
-        future = model.make_future_dataframe(periods=forecast_periods)
-        forecast = model.predict(future)
+        model_config = ('trends', seasonality_enabled, yearly_enabled, monthly_enabled, seasonality_mode)
+        cache_key = f"trends:{series_key or current_user.username + ':' + df['ds'].min().strftime('%Y-%m-%d')}"
+        with time_stage('inference', model_type='prophet'):
+            model, forecast = await forecast_cache.forecast(
+                cache_key, df, model_config, build_trend_model, forecast_periods,
+                allow_stale=False
+            )
         
         # Advanced trend analysis
         trend_analysis = _analyze_forecast_trends(forecast, df)
@@ -1547,7 +1708,16 @@ async def anomaly_detection(data: Dict = Body(...), current_user = Depends(get_c
                 }
             
             try:
-                result = sophisticated_anomaly_detection.detect_performance_anomalies(performance_data)
+                baseline = anomaly_baseline.current
+                if baseline is not None:
+                    # Score only, against the persisted baseline
+                    return await asyncio.to_thread(
+                        sophisticated_anomaly_detection.detect_performance_anomalies, performance_data, baseline
+                    )
+                result = await compute_executor.run_method(
+                    'sophisticated_anomaly_detection', 'sophisticated_anomaly_detection',
+                    'detect_performance_anomalies', performance_data
+                )
                 return result
             except Exception as e:
                 logger.error(f"Sophisticated anomaly detection failed: {e}")
@@ -1581,26 +1751,14 @@ async def anomaly_detection(data: Dict = Body(...), current_user = Depends(get_c
             
             features = np.array(features_list)
             
-            # Standardize features safely
-            try:
-                scaler = StandardScaler()
-                features_scaled = scaler.fit_transform(features)
-            except Exception as e:
-                logger.error(f"Feature scaling failed: {e}")
-                return {'anomalies': [], 'summary': f'Feature scaling failed: {str(e)}'}
+            if method not in ('isolation_forest', 'lof'):
+                return {'anomalies': [], 'summary': "Method must be 'isolation_forest' or 'lof'"}
             
-            # Apply anomaly detection
+            # Scale and fit in a compute worker
             try:
-                if method == 'isolation_forest':
-                    detector = IsolationForest(contamination=contamination, random_state=42)
-                    anomaly_labels = detector.fit_predict(features_scaled)
-                    anomaly_scores = detector.score_samples(features_scaled)
-                elif method == 'lof':
-                    detector = LocalOutlierFactor(contamination=contamination)
-                    anomaly_labels = detector.fit_predict(features_scaled)
-                    anomaly_scores = detector.negative_outlier_factor_
-                else:
-                    return {'anomalies': [], 'summary': "Method must be 'isolation_forest' or 'lof'"}
+                anomaly_labels, anomaly_scores = await compute_executor.run(
+                    score_feature_anomalies, features, method, contamination
+                )
                 
                 # Prepare results safely
                 anomalies = []
@@ -1641,7 +1799,49 @@ async def anomaly_detection(data: Dict = Body(...), current_user = Depends(get_c
             'total_samples': 0
         }
 
-
+async def train_anomaly_baseline(performance_data: Optional[List[Dict]] = None, contamination: float = 0.1):
+    """Start fitting the performance anomaly baseline; returns the job, None without enough history"""
+    if performance_data is None:
+        db = await get_db_manager()
+        performance_data = await db.get_agent_performance_windows(
+            days=ANOMALY_BASELINE_DAYS, window_days=ANOMALY_BASELINE_WINDOW_DAYS
+        )
+    if len(performance_data) < ANOMALY_BASELINE_MIN_RECORDS:
+        logger.info(f"Anomaly baseline not trained: {len(performance_data)} historical records")
+        return None
+    return model_serving.start_training(
+        'performance_anomaly_baseline', fit_performance_baseline, performance_data, contamination
+    )
+
+@app.post("/anomaly_detection/baseline/train")
+@log_endpoint_call("anomaly_detection_baseline_train")
+async def train_anomaly_detection_baseline(data: Dict = Body(...), current_user = Depends(get_current_active_user)):
+    """Fit the baseline that performance anomaly detection scores against
+    
+    Uses data['performance_data'] as history (aggregated like the records that will be
+    scored), or per-agent ANOMALY_BASELINE_WINDOW_DAYS windows ending on each of the last
+    ANOMALY_BASELINE_DAYS days from the database. Runs as a background job unless
+    {"wait": true}.
+    """
+    try:
+        job = await train_anomaly_baseline(data.get('performance_data'), float(data.get('contamination', 0.1)))
+        if job is None:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Need at least {ANOMALY_BASELINE_MIN_RECORDS} historical performance records"
+            )
+        if not data.get('wait', False):
+            return {'success': True, 'training_job': job.info()}
+        
+        await asyncio.shield(job.task)
+        if job.status != 'completed':
+            raise HTTPException(status_code=500, detail=f"Baseline training failed: {job.error}")
+        return {'success': True, 'baseline': job.result, 'model_version': job.version}
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Baseline training failed: {str(e)}")
 
 async def calculate_overall_capacity_gap(staffing_recommendations: List[Dict], db_manager) -> Dict:
     """Calculate overall staffing capacity gap from recommendations"""
@@ -1676,7 +1876,8 @@ async def calculate_overall_capacity_gap(staffing_recommendations: List[Dict], d
 async def forecast_client_load(client_id: int = None, forecast_days: int = 30, current_user = Depends(get_current_active_user)):
     """Real ARS client load forecasting and capacity planning"""
     try:
-        from ars_forecasting import generate_client_forecast, calculate_staffing_requirements, aggregate_client_forecasts
+        from ars_forecasting import (generate_client_forecast, calculate_staffing_requirements,
+                                     forecast_clients, ForecastAggregator)
         
         db = await get_db_manager()
         
@@ -1705,30 +1906,50 @@ async def forecast_client_load(client_id: int = None, forecast_days: int = 30, c
                 }
             clients[client_id_key]['data'].append(record)
         
-        # Generate forecast for each client
-        for client_id_key, client_info in clients.items():
+        aggregator = ForecastAggregator()
+        timed_out_clients = []
+        failed_clients = []
+        agents = await db.get_agent_performance_metrics()
+        
+        async def merge_client_forecast(client_id_key, client_forecast):
+            client_forecasts[client_id_key] = client_forecast
+            aggregator.add(client_forecast)
+            
+            # Calculate staffing needs
+            staffing_reco = await calculate_staffing_requirements(
+                client_forecast, 
+                clients[client_id_key]['name'],
+                db,
+                agents=agents
+            )
+            staffing_recommendations.extend(staffing_reco)
+        
+        if len(clients) == 1:
+            # Single client: fit in a thread, no process pool start-up
+            client_id_key, client_info = next(iter(clients.items()))
             try:
                 client_forecast = await generate_client_forecast(
                     client_info['data'], 
                     forecast_days, 
-                    client_info['name']
-                )
-                client_forecasts[client_id_key] = client_forecast
-                
-                # Calculate staffing needs
-                staffing_reco = await calculate_staffing_requirements(
-                    client_forecast, 
                     client_info['name'],
-                    db
+                    client_id=client_id_key
                 )
-                staffing_recommendations.extend(staffing_reco)
-                
+                await merge_client_forecast(client_id_key, client_forecast)
             except Exception as e:
                 logger.error(f"Forecast failed for client {client_id_key}: {e}")
-                continue
+                failed_clients.append({'client_id': client_id_key, 'error': str(e)})
+        else:
+            # Fan clients out to the process pool and merge results as they finish
+            async for client_id_key, status, value in forecast_clients(clients, forecast_days):
+                if status == 'ok':
+                    await merge_client_forecast(client_id_key, value)
+                elif status == 'timeout':
+                    timed_out_clients.append({'client_id': client_id_key, 'client_name': clients[client_id_key]['name']})
+                else:
+                    failed_clients.append({'client_id': client_id_key, 'error': value})
         
         # Aggregate results
-        total_forecast = aggregate_client_forecasts(client_forecasts)
+        total_forecast = aggregator.result()
         
         # Calculate overall capacity gap using local function
         overall_capacity = await calculate_overall_capacity_gap(staffing_recommendations, db)
@@ -1739,6 +1960,9 @@ async def forecast_client_load(client_id: int = None, forecast_days: int = 30, c
             'staffing_recommendations': staffing_recommendations,
             'capacity_analysis': overall_capacity,
             'forecast_period_days': forecast_days,
+            'partial': bool(timed_out_clients or failed_clients),
+            'timed_out_clients': timed_out_clients,
+            'failed_clients': failed_clients,
             'generated_at': datetime.now().isoformat()
         }
         
@@ -1872,7 +2096,11 @@ async def save_model(data: Dict = Body(...), current_user = Depends(get_current_
 @log_endpoint_call("document_classification_train")
 @save_ai_response("document_classification_train")
 async def train_document_classifier(data: Dict = Body(...), current_user = Depends(get_current_active_user)):
-    """Train document classification model with REAL bordereau data from database"""
+    """Train document classification model with REAL bordereau data from database
+    
+    Training runs as a background job that publishes a new model version; pass
+    {"wait": true} to answer with the trained model's performance instead of the job.
+    """
     try:
         db = await get_db_manager()
         bordereaux = await db.get_bordereaux_for_training(limit=1000)
@@ -1889,16 +2117,32 @@ async def train_document_classifier(data: Dict = Body(...), current_user = Depen
         
         logger.info(f"Training with {len(documents)} bordereaux, statuses: {set(labels)}")
         
-        result = document_classifier.train_ensemble_model(documents, labels)
+        job = model_serving.start_training('document_classifier', train_document_classifier_model, documents, labels)
+        if not data.get('wait', False):
+            return {
+                'success': True,
+                'training_job': job.info(),
+                'training_data_count': len(documents),
+                'unique_statuses': list(set(labels)),
+                'summary': f"Training started with {len(documents)} real bordereaux (job {job.id})"
+            }
+        
+        await asyncio.shield(job.task)
+        if job.status != 'completed':
+            raise HTTPException(status_code=500, detail=f"Training failed: {job.error}")
         
         return {
             'success': True,
-            'model_performance': result,
+            'model_performance': job.result,
+            'model_version': job.version,
             'training_data_count': len(documents),
             'unique_statuses': list(set(labels)),
             'summary': f"Trained with {len(documents)} real bordereaux"
         }
         
+    except HTTPException:
+        raise
+        
     except Exception as e:
         logger.error(f"Training failed: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Training failed: {str(e)}")
@@ -1938,8 +2182,11 @@ async def classify_documents(data: Dict = Body(...), current_user = Depends(get_
             document_ids = [f"doc_{i}" for i in range(len(documents))]
             actual_statuses = [None] * len(documents)
         
+        # One model version for the whole request, even if a newer one is swapped in meanwhile
+        classifier = document_classifier.current
+        
         # Train model if not trained
-        if document_classifier.model is None:
+        if classifier.model is None:
             logger.info("Model not trained. Training with database data...")
             training_bordereaux = await db.get_bordereaux_for_training(limit=1000)
             
@@ -1953,13 +2200,19 @@ async def classify_documents(data: Dict = Body(...), current_user = Depends(get_
             training_labels = [b['status'] for b in training_bordereaux]
             
             logger.info(f"Training model with {len(training_docs)} documents, statuses: {set(training_labels)}")
-            training_result = document_classifier.train_ensemble_model(training_docs, training_labels)
-            logger.info(f"Model trained successfully: {training_result}")
+            job = model_serving.start_training(
+                'document_classifier', train_document_classifier_model, training_docs, training_labels
+            )
+            await asyncio.shield(job.task)
+            if job.status != 'completed':
+                raise HTTPException(status_code=500, detail=f"Training failed: {job.error}")
+            classifier = document_classifier.current
+            logger.info(f"Model trained successfully: {job.result}")
         
         logger.info(f"Classifying {len(documents)} documents from ars_db")
         
         # Classify documents
-        results = document_classifier.batch_classify(documents)
+        results = classifier.batch_classify(documents)
         
         # Enhance results with database context
         enhanced_results = []
@@ -2006,7 +2259,7 @@ async def classify_documents(data: Dict = Body(...), current_user = Depends(get_
 @app.post("/sla_breach_prediction/train")
 @log_endpoint_call("sla_breach_prediction_train")
 async def train_sla_predictor(data: Dict = Body(...), current_user = Depends(get_current_active_user)):
-    """Train SLA breach prediction model"""
+    """Train SLA breach prediction model as a background job; {"wait": true} waits for it"""
     try:
         training_data = data.get('training_data', [])
         labels = data.get('labels', [])
@@ -2017,14 +2270,27 @@ async def train_sla_predictor(data: Dict = Body(...), current_user = Depends(get
         if len(training_data) < 50:
             raise HTTPException(status_code=400, detail="Need at least 50 training samples")
         
-        result = sla_predictor.train_sla_predictor(training_data, labels)
+        job = model_serving.start_training('sla_predictor', train_sla_predictor_model, training_data, labels)
+        if not data.get('wait', False):
+            return {
+                'success': True,
+                'training_job': job.info(),
+                'summary': f"Training SLA predictor with {len(training_data)} samples (job {job.id})"
+            }
+        
+        await asyncio.shield(job.task)
+        if job.status != 'completed':
+            raise HTTPException(status_code=500, detail=f"SLA predictor training failed: {job.error}")
         
         return {
             'success': True,
-            'model_performance': result,
+            'model_performance': job.result,
+            'model_version': job.version,
             'summary': f"Trained SLA predictor with {len(training_data)} samples"
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"SLA predictor training failed: {str(e)}")
 
@@ -2038,7 +2304,7 @@ async def predict_sla_breach_advanced(data: Dict = Body(...), current_user = Dep
         if not item_data:
             raise HTTPException(status_code=400, detail="Item data required")
         
-        result = sla_predictor.predict_sla_breach(item_data)
+        result = sla_predictor.current.predict_sla_breach(item_data)
         
         return {
             'prediction': result,
@@ -2048,6 +2314,47 @@ async def predict_sla_breach_advanced(data: Dict = Body(...), current_user = Dep
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"SLA breach prediction failed: {str(e)}")
 
+@app.post("/sla_breach_prediction/predict_batch")
+@log_endpoint_call("sla_breach_prediction_predict_batch")
+async def predict_sla_breach_batch(data: Dict = Body(...), current_user = Depends(get_current_active_user)):
+    """SLA breach prediction for many items in one call
+    
+    Scores data['items'], or every open item from get_sla_items when data['from_db'] is
+    true. Items without valid dates get an error record; the rest are predicted.
+    """
+    try:
+        predictor, version = sla_predictor.current, sla_predictor.version
+        if predictor.model is None:
+            raise HTTPException(status_code=400, detail="SLA predictor not trained yet")
+        
+        if data.get('from_db', False):
+            db = await get_db_manager()
+            items = await db.get_sla_items()
+        else:
+            items = data.get('items', [])
+        
+        if not items:
+            return {'predictions': [], 'summary': {'total_items': 0}}
+        
+        chunk_size = int(data.get('chunk_size', SLA_PREDICT_CHUNK_SIZE))
+        predictions = await asyncio.to_thread(predictor.predict_batch, items, chunk_size)
+        
+        risk_counts = Counter(p['risk_level'] for p in predictions if 'risk_level' in p)
+        return {
+            'predictions': predictions,
+            'summary': {
+                'total_items': len(items),
+                'risk_levels': dict(risk_counts),
+                'errors': len(items) - sum(risk_counts.values()),
+                'model_version': version
+            }
+        }
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Batch SLA breach prediction failed: {str(e)}")
+
 # === PATTERN RECOGNITION ===
 @app.post("/pattern_recognition/recurring_issues")
 @log_endpoint_call("pattern_recognition_recurring")
@@ -2059,10 +2366,16 @@ async def detect_recurring_issues(data: Dict = Body(...), current_user = Depends
         if len(complaints) < 3:
             return {'recurring_groups': [], 'summary': 'Insufficient data for pattern detection'}
         
-        result = recurring_detector.detect_recurring_complaints(complaints)
+        # Featurize here (updates the shared IDF), cluster in a compute worker
+        features = await asyncio.to_thread(recurring_detector.featurize, complaints)
+        result = await compute_executor.run_method(
+            'pattern_recognition', 'recurring_detector', 'detect_recurring_complaints', complaints, features
+        )
         
         return result
         
+    except ComputeError as e:
+        raise compute_http_error(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Recurring issue detection failed: {str(e)}")
 
@@ -2080,7 +2393,9 @@ async def detect_process_anomalies(data: Dict = Body(...), current_user = Depend
         
         if detection_type == 'clustering':
             # Use advanced clustering for problematic processes
-            clustering_result = advanced_clustering.cluster_problematic_processes(process_data)
+            clustering_result = await compute_executor.run_method(
+                'advanced_clustering', 'advanced_clustering', 'cluster_problematic_processes', process_data
+            )
             
             # Save clustering analysis for learning
             db = await get_db_manager()
@@ -2123,9 +2438,13 @@ async def detect_process_anomalies(data: Dict = Body(...), current_user = Depend
         
         else:
             # Use pattern recognition for anomalies
-            result = recurring_detector.detect_process_anomalies(process_data)
+            result = await compute_executor.run_method(
+                'pattern_recognition', 'recurring_detector', 'detect_process_anomalies', process_data
+            )
             return result
         
+    except ComputeError as e:
+        raise compute_http_error(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Enhanced process analysis failed: {str(e)}")
 
@@ -2139,10 +2458,14 @@ async def analyze_temporal_patterns(data: Dict = Body(...), current_user = Depen
         if len(events) < 10:
             return {'patterns': [], 'summary': 'Insufficient data for temporal analysis'}
         
-        result = temporal_analyzer.analyze_temporal_patterns(events)
+        result = await compute_executor.run_method(
+            'pattern_recognition', 'temporal_analyzer', 'analyze_temporal_patterns', events
+        )
         
         return result
         
+    except ComputeError as e:
+        raise compute_http_error(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Temporal pattern analysis failed: {str(e)}")
 
@@ -2383,19 +2706,70 @@ async def analyze_ai_patterns(data: Dict = Body(...)):
         raise HTTPException(status_code=500, detail=f"AI analysis failed: {str(e)}")
 
 # === REAL ARS COMPLAINTS INTELLIGENCE ===
+# Most recent complaints that get auto-reply suggestions in aggregate mode
+COMPLAINTS_AUTO_REPLY_SAMPLE = 50
+# Largest page of complaints analysed in rows mode
+COMPLAINTS_MAX_PAGE_SIZE = 2000
+
 @app.post("/complaints_intelligence")
 @log_endpoint_call("complaints_intelligence")
-async def analyze_complaints_intelligence(period_days: int = 30, client_id: int = None, current_user = Depends(get_current_active_user)):
-    """Real ARS complaints intelligence with recurrence, correlation, and auto-replies"""
+async def analyze_complaints_intelligence(period_days: int = 30, client_id: str = None, statuses: str = None,
+                                          types: str = None, mode: str = 'rows', limit: int = 500,
+                                          cursor: str = None, current_user = Depends(get_current_active_user)):
+    """Real ARS complaints intelligence with recurrence, correlation, and auto-replies
+    
+    Period, client, status and type filters (statuses/types as comma-separated lists) run in SQL.
+    mode='rows' analyses one page of up to `limit` (at most COMPLAINTS_MAX_PAGE_SIZE) complaints and returns next_cursor for the
+    following page; mode='aggregate' computes the counts for the whole period in the database.
+    """
     try:
-        from ars_complaints_intelligence import generate_complaints_intelligence, filter_complaints_by_period
+        from ars_complaints_intelligence import (generate_complaints_intelligence,
+                                                 generate_complaints_intelligence_from_aggregates,
+                                                 CONTENT_CATEGORY_RULES)
+        
+        if mode not in ('rows', 'aggregate'):
+            raise HTTPException(status_code=400, detail="mode must be 'rows' or 'aggregate'")
+        if not 1 <= limit <= COMPLAINTS_MAX_PAGE_SIZE:
+            raise HTTPException(status_code=400, detail=f"limit must be between 1 and {COMPLAINTS_MAX_PAGE_SIZE}")
         
         db = await get_db_manager()
+        filters = {
+            'since': datetime.now() - timedelta(days=period_days),
+            'client_id': client_id,
+            'statuses': [s.strip() for s in statuses.split(',') if s.strip()] if statuses else None,
+            'types': [t.strip() for t in types.split(',') if t.strip()] if types else None
+        }
         
-        # Get real complaints data
-        complaints = await db.get_live_complaints(limit=500)
+        if mode == 'aggregate':
+            aggregates = await db.get_complaint_aggregates(content_rules=CONTENT_CATEGORY_RULES, **filters)
+            if not aggregates.get('total'):
+                return {
+                    'insights': {'message': 'No complaints data available'},
+                    'auto_replies': [],
+                    'correlations': [],
+                    'performance_ranking': []
+                }
+            recent = await db.query_complaints(limit=COMPLAINTS_AUTO_REPLY_SAMPLE, **filters)
+            intelligence_result = await generate_complaints_intelligence_from_aggregates(
+                aggregates, recent['complaints'], db, period_days
+            )
+            
+            # Learn from this analysis with ARS context
+            learning_engine.learn_from_interaction(
+                'complaints_intelligence',
+                {'complaints_count': aggregates['total'], 'period_days': period_days, 'mode': mode},
+                intelligence_result
+            )
+            return intelligence_result
         
-        if not complaints:
+        # Get real complaints data, filtered in SQL
+        try:
+            page = await db.query_complaints(limit=limit, cursor=cursor, **filters)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        filtered_complaints = page['complaints']
+        
+        if not filtered_complaints:
             return {
                 'insights': {'message': 'No complaints data available'},
                 'auto_replies': [],
@@ -2403,13 +2777,8 @@ async def analyze_complaints_intelligence(period_days: int = 30, client_id: int
                 'performance_ranking': []
             }
         
-        # Filter by period and client if specified
-        filtered_complaints = filter_complaints_by_period(complaints, period_days)
-        if client_id:
-            filtered_complaints = [c for c in filtered_complaints if c.get('client_id') == client_id]
-        
         # Generate comprehensive complaints intelligence
-        intelligence_result = await generate_complaints_intelligence(filtered_complaints, db)
+        intelligence_result = await generate_complaints_intelligence(filtered_complaints, db, period_days)
         
         # Learn from this analysis with ARS context
         learning_engine.learn_from_interaction(
@@ -2418,8 +2787,11 @@ async def analyze_complaints_intelligence(period_days: int = 30, client_id: int
             intelligence_result
         )
         
+        intelligence_result['next_cursor'] = page['next_cursor']
         return intelligence_result
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Complaints intelligence failed: {e}")
         raise HTTPException(status_code=500, detail=f"Complaints analysis failed: {str(e)}")
@@ -2443,8 +2815,7 @@ async def classify_claim(data: Dict = Body(...), current_user = Depends(get_curr
         db = await get_db_manager()
         complaint_context = None
         if complaint_id:
-            complaints = await db.get_live_complaints(limit=1000)
-            complaint_context = next((c for c in complaints if str(c['id']) == str(complaint_id)), None)
+            complaint_context = await db.get_complaint_by_id(complaint_id)
         
         # Enhanced ARS-specific classification
         classification_result = await classify_ars_complaint(text, complaint_context, metadata)
@@ -2462,7 +2833,7 @@ async def classify_claim(data: Dict = Body(...), current_user = Depends(get_curr
         
         # Enhance with ARS-specific learning
         from learning_engine import enhance_with_ars_learning
-        final_result = enhance_with_ars_learning('classify', enhanced_result, {'text': text})
+        final_result = await enhance_with_ars_learning('classify', enhanced_result, {'text': text})
         
         # Also apply adaptive learning
         try:
@@ -2476,6 +2847,62 @@ async def classify_claim(data: Dict = Body(...), current_user = Depends(get_curr
         raise HTTPException(status_code=500, detail=f"Classification failed: {str(e)}")
 
 # === SENTIMENT ANALYSIS ===
+SENTIMENT_POSITIVE_WORDS = [
+    'merci', 'excellent', 'parfait', 'satisfait', 'content', 'bien', 'bon', 
+    'réussi', 'super', 'formidable', 'bravo', 'félicitations', 'génial', 
+    'magnifique', 'parfaitement', 'impeccable', 'fantastique', 'remarquable',
+    'très bien', 'très bon', 'très satisfait'
+]
+
+SENTIMENT_NEGATIVE_WORDS = [
+    'problème', 'erreur', 'mauvais', 'insatisfait', 'déçu', 'retard', 'échec', 
+    'difficulté', 'souci', 'plainte', 'réclamation', 'catastrophe', 'horrible', 
+    'nul', 'décevant', 'inacceptable', 'frustrant', 'inadmissible',
+    'très mauvais', 'très déçu', 'très insatisfait'
+]
+
+sentiment_matcher = KeywordMatcher({
+    'positive': SENTIMENT_POSITIVE_WORDS,
+    'negative': SENTIMENT_NEGATIVE_WORDS
+})
+
+def score_sentiment(text: str, entities: List[tuple]) -> Dict[str, Any]:
+    """Keyword sentiment of one text, with the spaCy entities found in it"""
+    text_lower = text.lower()
+    hits = sentiment_matcher.match(text_lower)
+    positive_count = len(hits.get('positive', []))
+    negative_count = len(hits.get('negative', []))
+    
+    score = 0
+    if 'très bien' in text_lower or 'très bon' in text_lower: score += 2
+    if 'très mauvais' in text_lower or 'très déçu' in text_lower: score -= 2
+    if '!' in text: score += 1 if positive_count > negative_count else -1
+    if '?' in text: score -= 0.5
+    
+    final_score = positive_count - negative_count + score
+    
+    if final_score > 0:
+        sentiment = 'positive'
+        confidence = min(0.9, 0.5 + (final_score * 0.1))
+    elif final_score < 0:
+        sentiment = 'negative' 
+        confidence = min(0.9, 0.5 + (abs(final_score) * 0.1))
+    else:
+        sentiment = 'neutral'
+        confidence = 0.6
+    
+    return {
+        'sentiment': sentiment,
+        'confidence': float(confidence),
+        'score': float(final_score),
+        'analysis': {
+            'positive_indicators': positive_count,
+            'negative_indicators': negative_count,
+            'text_length': len(text),
+            'entities': [{'text': ent_text, 'label': label} for ent_text, label in entities]
+        }
+    }
+
 @app.post("/sentiment_analysis")
 @log_endpoint_call("sentiment_analysis")
 @save_ai_response("sentiment_analysis")
@@ -2487,61 +2914,33 @@ async def analyze_sentiment(data: Dict = Body(...), current_user = Depends(get_c
         if not text:
             raise HTTPException(status_code=400, detail="Text is required")
         
-        doc = nlp(text)
-        
-        positive_words = [
-            'merci', 'excellent', 'parfait', 'satisfait', 'content', 'bien', 'bon', 
-            'réussi', 'super', 'formidable', 'bravo', 'félicitations', 'génial', 
-            'magnifique', 'parfaitement', 'impeccable', 'fantastique', 'remarquable',
-            'très bien', 'très bon', 'très satisfait'
-        ]
-        
-        negative_words = [
-            'problème', 'erreur', 'mauvais', 'insatisfait', 'déçu', 'retard', 'échec', 
-            'difficulté', 'souci', 'plainte', 'réclamation', 'catastrophe', 'horrible', 
-            'nul', 'décevant', 'inacceptable', 'frustrant', 'inadmissible',
-            'très mauvais', 'très déçu', 'très insatisfait'
-        ]
-        
-        text_lower = text.lower()
-        positive_count = sum(1 for word in positive_words if word in text_lower)
-        negative_count = sum(1 for word in negative_words if word in text_lower)
-        
-        score = 0
-        if 'très bien' in text_lower or 'très bon' in text_lower: score += 2
-        if 'très mauvais' in text_lower or 'très déçu' in text_lower: score -= 2
-        if '!' in text: score += 1 if positive_count > negative_count else -1
-        if '?' in text: score -= 0.5
-        
-        final_score = positive_count - negative_count + score
-        
-        if final_score > 0:
-            sentiment = 'positive'
-            confidence = min(0.9, 0.5 + (final_score * 0.1))
-        elif final_score < 0:
-            sentiment = 'negative' 
-            confidence = min(0.9, 0.5 + (abs(final_score) * 0.1))
-        else:
-            sentiment = 'neutral'
-            confidence = 0.6
-        
-        entities = [{'text': ent.text, 'label': ent.label_} for ent in doc.ents]
-        
-        return {
-            'sentiment': sentiment,
-            'confidence': float(confidence),
-            'score': float(final_score),
-            'analysis': {
-                'positive_indicators': positive_count,
-                'negative_indicators': negative_count,
-                'text_length': len(text),
-                'entities': entities
-            }
-        }
+        entities = await nlp_service.entities(text)
+        return score_sentiment(text, entities)
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Sentiment analysis failed: {str(e)}")
 
+@app.post("/sentiment_analysis/batch")
+@log_endpoint_call("sentiment_analysis_batch")
+@save_ai_response("sentiment_analysis_batch")
+async def analyze_sentiment_batch(data: Dict = Body(...), current_user = Depends(get_current_active_user)):
+    """Sentiment of a list of texts; spaCy runs once per batch instead of once per text"""
+    texts = data.get('texts', [])
+    if not isinstance(texts, list) or not texts:
+        raise HTTPException(status_code=400, detail="texts must be a non-empty list")
+    texts = [str(text) if text is not None else '' for text in texts]
+    try:
+        entities = await nlp_service.entities_many(texts)
+        results = [score_sentiment(text, ents) for text, ents in zip(texts, entities)]
+    except Exception as e:
+        logger.error(f"Batch sentiment analysis failed: {e}")
+        raise HTTPException(status_code=500, detail=f"Batch sentiment analysis failed: {str(e)}")
+    return {
+        'results': results,
+        'count': len(results),
+        'summary': dict(Counter(r['sentiment'] for r in results))
+    }
+
 # === INTELLIGENT AUTOMATION ===
 @app.post("/smart_routing/build_profiles")
 @log_endpoint_call("smart_routing_build_profiles")
@@ -2867,7 +3266,7 @@ async def health_check():
         # Get learning stats safely
         learning_stats = {}
         try:
-            learning_stats = learning_engine.get_learning_stats()
+            learning_stats = await asyncio.to_thread(learning_engine.get_learning_stats)
         except Exception as e:
             logger.debug(f"Learning stats unavailable: {e}")
         
@@ -2881,7 +3280,9 @@ async def health_check():
         # Get generative AI stats safely
         gen_ai_stats = {}
         try:
-            gen_ai_stats = generative_ai.get_learning_stats()
+            # Not worth loading torch for a health check
+            if subsystems.is_loaded('generative_ai'):
+                gen_ai_stats = await asyncio.to_thread(generative_ai.get_learning_stats)
         except Exception as e:
             logger.debug(f"Generative AI stats unavailable: {e}")
         
@@ -2906,6 +3307,15 @@ async def health_check():
                 "learning_active": True
             },
             "generative_ai_status": gen_ai_stats,
+            "ai_output_writer": ai_output_writer.stats,
+            "forecast_cache": forecast_cache.info(),
+            "nlp_service": nlp_service.info(),
+            "text_featurizer": text_featurizer.info(),
+            "analyze_featurizer": analyze_featurizer.info(),
+            "worker": scheduler_lock.info(),
+            "subsystems": subsystems.info(),
+            "compute_executor": compute_executor.info(),
+            "served_models": model_serving.info(),
             "connection_fixes_applied": True
         }
     except Exception as e:
@@ -3279,7 +3689,9 @@ async def advanced_process_clustering(data: Dict = Body(...), current_user = Dep
         if len(process_data) < 3:
             raise HTTPException(status_code=400, detail="Need at least 3 processes for clustering")
         
-        result = advanced_clustering.cluster_problematic_processes(process_data)
+        result = await compute_executor.run_method(
+            'advanced_clustering', 'advanced_clustering', 'cluster_problematic_processes', process_data
+        )
         
         # Save result for learning
         db = await get_db_manager()
@@ -3292,6 +3704,8 @@ async def advanced_process_clustering(data: Dict = Body(...), current_user = Dep
         
         return result
         
+    except ComputeError as e:
+        raise compute_http_error(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Advanced clustering failed: {str(e)}")
 
@@ -3384,18 +3798,12 @@ async def generate_executive_report(data: Dict = Body(...), current_user = Depen
             'recommendations': []
         }
         
-        # Performance anomaly analysis
-        if performance_data:
-            perf_analysis = sophisticated_anomaly_detection.detect_performance_anomalies([
-                {
-                    'id': p['id'],
-                    'processing_time': p.get('avg_hours', 24),
-                    'throughput': p.get('total_bordereaux', 0),
-                    'error_rate': 1 - (p.get('sla_compliant', 0) / max(p.get('total_bordereaux', 1), 1)),
-                    'resource_utilization': 0.75,
-                    'sla_compliance': p.get('sla_compliant', 0) / max(p.get('total_bordereaux', 1), 1)
-                } for p in performance_data
-            ])
+        # Performance anomaly analysis, on the current window aggregated like the baseline's history
+        agent_windows = await db.get_agent_performance_windows(days=0, window_days=ANOMALY_BASELINE_WINDOW_DAYS)
+        if agent_windows:
+            perf_analysis = sophisticated_anomaly_detection.detect_performance_anomalies(
+                agent_windows, anomaly_baseline.current
+            )
             ai_insights['performance_anomalies'] = perf_analysis.get('anomalies', [])
         
         # Process clustering analysis
@@ -3506,10 +3914,10 @@ async def get_learning_insights(endpoint: str = None, current_user = Depends(get
         learning_insights = await db.get_continuous_learning_insights()
         
         # Get ARS-specific learning stats
-        ars_learning_stats = learning_engine.get_learning_stats()
+        ars_learning_stats = await asyncio.to_thread(learning_engine.get_learning_stats)
         
         # Get adaptive learning insights
-        adaptive_insights = adaptive_learning.get_learning_insights()
+        adaptive_insights = await asyncio.to_thread(adaptive_learning.get_learning_insights)
         
         return {
             'success': True,
@@ -3567,12 +3975,26 @@ async def get_saved_models(current_user = Depends(get_current_active_user)):
         return {
             'success': True,
             'models': models,
-            'total_models': len(models)
+            'total_models': len(models),
+            'loaded_in_worker': model_persistence.load_stats
         }
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Getting models failed: {str(e)}")
 
+@app.get("/learning/training_jobs/{job_id}")
+@log_endpoint_call("learning_training_job")
+async def get_training_job(job_id: str, current_user = Depends(get_current_active_user)):
+    """Status of a background training job
+    
+    Any worker can answer: job status is recorded in TRAINING_JOBS_DIR. The versions every
+    worker serves are in /health (served_models) and the registry in /learning/models.
+    """
+    job_info = model_serving.get_job(job_id)
+    if job_info is None:
+        raise HTTPException(status_code=404, detail=f"Training job {job_id} not found")
+    return {'success': True, 'training_job': job_info}
+
 @app.post("/learning/optimize")
 @log_endpoint_call("learning_optimize")
 async def optimize_learning(current_user = Depends(get_current_active_user)):
@@ -3589,21 +4011,85 @@ async def optimize_learning(current_user = Depends(get_current_active_user)):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Learning optimization failed: {str(e)}")
 
+# Jobs on in-process state run in every worker; the default schedule holds jobs on shared
+# state (database, model files), which only the elected worker runs
+worker_schedule = schedule.Scheduler()
+_scheduler_thread = None
+_app_loop = None
+
+def run_on_app_loop(coroutine_fn):
+    """Run an async job (database access, training jobs) from the scheduler thread"""
+    if _app_loop is None or _app_loop.is_closed():
+        return
+    future = asyncio.run_coroutine_threadsafe(coroutine_fn(), _app_loop)
+    future.add_done_callback(
+        lambda f: f.cancelled() or f.exception() is None
+        or logger.error(f"Scheduled job {coroutine_fn.__name__} failed: {f.exception()}")
+    )
+
+def start_leader_services():
+    """Services that must run once per deployment, started by the elected worker"""
+    try:
+        from ars_ocr_ged import start_ars_document_processing, stop_ars_document_processing
+        start_ars_document_processing()
+        atexit.register(stop_ars_document_processing)
+    except ImportError:
+        logger.warning("ARS document processing not available")
+    if anomaly_baseline.current is None:
+        run_on_app_loop(train_anomaly_baseline)
+
+def logged_job(job_fn):
+    """Wrap a scheduled job so a failure is logged and the job still runs at its next time"""
+    def run():
+        try:
+            job_fn()
+        except Exception as e:
+            logger.error(f"Scheduled job failed: {e}", exc_info=True)
+    return run
+
 # Background task scheduler with learning optimization
 def run_scheduler():
     import time
     while True:
-        schedule.run_pending()
-        time.sleep(60)  # Check every minute
+        try:
+            worker_schedule.run_pending()
+            if scheduler_lock.held:
+                schedule.run_pending()
+            elif scheduler_lock.try_acquire():
+                start_leader_services()
+                schedule.run_pending()
+        except Exception as e:
+            # Never let the thread die: the leader would keep the lock with no scheduler
+            logger.error(f"Scheduler iteration failed: {e}", exc_info=True)
+        # Every minute, or often enough for the model registry watch
+        time.sleep(min(60, MODEL_REFRESH_SECONDS))
+
+@app.on_event("startup")
+async def start_scheduler():
+    """Start this worker's scheduler thread (per process, so after any fork)"""
+    global _scheduler_thread, _app_loop
+    _app_loop = asyncio.get_running_loop()
+    if _scheduler_thread is None:
+        _scheduler_thread = threading.Thread(target=run_scheduler, name='scheduler', daemon=True)
+        _scheduler_thread.start()
+
+@app.on_event("shutdown")
+async def close_learning_store():
+    """Commit learning writes at shutdown; forked workers do not reliably reach atexit"""
+    learning_engine.close()
+    scheduler_lock.release()
 
 # Schedule periodic tasks for continuous learning
-schedule.every(10).minutes.do(lambda: logger.info("AI service health check"))
-schedule.every().hour.do(lambda: performance_analytics_ai.__class__.__name__ and logger.info("AI models active"))
-schedule.every(6).hours.do(lambda: adaptive_learning.optimize_learning_rate())
-schedule.every().day.do(lambda: model_persistence.cleanup_old_models())
+schedule.every(10).minutes.do(logged_job(lambda: logger.info("AI service health check")))
+schedule.every().hour.do(logged_job(lambda: performance_analytics_ai.__class__.__name__ and logger.info("AI models active")))
+worker_schedule.every(6).hours.do(logged_job(lambda: adaptive_learning.optimize_learning_rate()))
+schedule.every().day.do(logged_job(lambda: model_persistence.cleanup_old_models()))
+worker_schedule.every().day.do(logged_job(lambda: forecast_cache.evict_expired()))
+worker_schedule.every(MODEL_REFRESH_SECONDS).seconds.do(logged_job(lambda: model_serving.refresh()))
+worker_schedule.every(TEXT_FEATURIZER_SYNC_SECONDS).seconds.do(logged_job(lambda: text_featurizer.sync()))
+worker_schedule.every(TEXT_FEATURIZER_SYNC_SECONDS).seconds.do(logged_job(lambda: analyze_featurizer.sync()))
 # New learning tasks
-schedule.every(2).hours.do(lambda: learning_engine.process_feedback_batch())
-schedule.every().day.do(lambda: generative_ai.update_company_lexicon())
+schedule.every(6).hours.do(logged_job(lambda: run_on_app_loop(train_anomaly_baseline)))
 
 @app.post("/analytics/ai/reassign-suggestion")
 @log_endpoint_call("analytics_ai_reassign_suggestion")
@@ -4190,21 +4676,13 @@ if __name__ == "__main__":
     # Initialize learning system
     initialize_learning_system()
     
-    # Start ARS document processing
-    try:
-        from ars_ocr_ged import start_ars_document_processing, stop_ars_document_processing
-        start_ars_document_processing()
-        atexit.register(stop_ars_document_processing)
-    except ImportError:
-        logger.warning("ARS document processing not available")
-    
     # Register cleanup on exit
     atexit.register(cleanup_learning_system)
     
-    # Start scheduler in background thread
-    scheduler_thread = threading.Thread(target=run_scheduler, daemon=True)
-    scheduler_thread.start()
-    
+    # The scheduler and ARS document processing start with the app (start_scheduler);
+    # use serve.py to run several workers
     port = int(os.getenv('AI_SERVICE_PORT', 8002))
     logger.info(f"Starting ARS AI microservice with advanced analytics on port {port}")
-    uvicorn.run(app, host="0.0.0.0", port=port)
\ No newline at end of file
+    # Keep backend connections open between AI calls
+    keep_alive = int(os.getenv('AI_KEEP_ALIVE_TIMEOUT', 30))
+    uvicorn.run(app, host="0.0.0.0", port=port, timeout_keep_alive=keep_alive)
\ No newline at end of file
@@ -7,10 +7,54 @@ from typing import Dict, List, Any
 from datetime import datetime, timedelta
 from collections import defaultdict, Counter
 import logging
+from keyword_matcher import KeywordMatcher
 
 logger = logging.getLogger(__name__)
 
-async def generate_complaints_intelligence(complaints: List[Dict], db_manager) -> Dict:
+# Keyword rules, checked in this order (first matching category wins)
+CONTENT_CATEGORY_RULES = [
+    ('RIB_INVALIDE', ['rib', 'virement', 'paiement', 'remboursement']),
+    ('RETARD_VIREMENT', ['retard', 'délai', 'attente', 'lent']),
+    ('ERREUR_DOSSIER', ['erreur', 'incorrect', 'faux', 'mauvais']),
+    ('QUALITE_SERVICE', ['service', 'accueil', 'personnel']),
+    ('PROBLEME_TECHNIQUE', ['technique', 'site', 'application']),
+]
+
+CLASSIFY_CATEGORY_RULES = [
+    ('RIB_INVALIDE', 'Problème RIB/Virement', 0.85, ['rib', 'virement', 'paiement', 'remboursement', 'compte']),
+    ('RETARD_VIREMENT', 'Délai dépassé', 0.80, ['retard', 'délai', 'attente', 'lent', 'urgent']),
+    ('ERREUR_DOSSIER', 'Données incorrectes', 0.75, ['erreur', 'incorrect', 'faux', 'mauvais', 'mistake']),
+    ('QUALITE_SERVICE', 'Service client', 0.70, ['service', 'accueil', 'personnel', 'comportement']),
+    ('PROBLEME_TECHNIQUE', 'Problème technique', 0.75, ['site', 'application', 'technique', 'bug', 'connexion']),
+]
+
+PRIORITY_RULES = [
+    ('urgent', 9, ['urgent', 'immédiat', 'critique', 'grave', 'bloqué']),
+    ('high', 7, ['important', 'rapidement', 'vite', 'priorité']),
+    ('low', 3, ['quand possible', 'pas pressé', 'normal']),
+]
+
+ARS_POSITIVE_WORDS = ['merci', 'satisfait', 'content', 'bien', 'bon', 'parfait', 'excellent']
+ARS_NEGATIVE_WORDS = ['problème', 'mécontent', 'déçu', 'mauvais', 'insatisfait', 'erreur', 'retard']
+ARS_KEYWORDS = ['rib', 'virement', 'remboursement', 'délai', 'retard', 'erreur', 'dossier', 'client', 'service']
+
+def _build_complaint_matcher() -> KeywordMatcher:
+    """Compile every complaint keyword rule into one automaton, labelled by rule"""
+    matcher = KeywordMatcher()
+    for category, keywords in CONTENT_CATEGORY_RULES:
+        matcher.add_many(keywords, f'content:{category}')
+    for category, _, _, keywords in CLASSIFY_CATEGORY_RULES:
+        matcher.add_many(keywords, f'classify:{category}')
+    for priority, _, keywords in PRIORITY_RULES:
+        matcher.add_many(keywords, f'priority:{priority}')
+    matcher.add_many(ARS_POSITIVE_WORDS, 'sentiment:positive')
+    matcher.add_many(ARS_NEGATIVE_WORDS, 'sentiment:negative')
+    matcher.add_many(ARS_KEYWORDS, 'ars_keyword')
+    return matcher
+
+complaint_matcher = _build_complaint_matcher()
+
+async def generate_complaints_intelligence(complaints: List[Dict], db_manager, period_days: int = 30) -> Dict:
     """Generate comprehensive complaints intelligence for ARS"""
     try:
         # Classification and recurrence detection
@@ -40,7 +84,7 @@ async def generate_complaints_intelligence(complaints: List[Dict], db_manager) -
             'auto_replies': auto_reply_suggestions,
             'summary': {
                 'total_complaints': len(complaints),
-                'analysis_period': 'Last 30 days',
+                'analysis_period': f'Last {period_days} days',
                 'key_findings': generate_key_findings(classification_results, recurrence_analysis, anomaly_analysis)
             }
         }
@@ -49,6 +93,70 @@ async def generate_complaints_intelligence(complaints: List[Dict], db_manager) -
         logger.error(f"Complaints intelligence generation failed: {e}")
         return {'error': str(e)}
 
+async def generate_complaints_intelligence_from_aggregates(aggregates: Dict, recent_complaints: List[Dict],
+                                                           db_manager, period_days: int = 30) -> Dict:
+    """Same report as generate_complaints_intelligence, built from DatabaseManager.get_complaint_aggregates
+    
+    Counts cover the whole filtered period; auto-replies are suggested for recent_complaints only.
+    """
+    try:
+        def counts(name: str) -> Dict:
+            return {row['key']: row['count'] for row in aggregates.get(name, [])}
+        
+        classification_results = summarize_classification(
+            counts('categories'), counts('severity'), counts('department'), aggregates.get('total', 0)
+        )
+        recurrence_analysis = summarize_recurrence([
+            {
+                'type': row['key'],
+                'count': row['count'],
+                'avg_interval_days': row['avg_interval_days'],
+                'recent_occurrences': row['recent_count']
+            }
+            for row in aggregates.get('recurrence', [])
+        ])
+        anomaly_analysis = summarize_daily_anomalies(counts('daily'))
+        
+        process_correlations = defaultdict(dict)
+        for row in aggregates.get('type_process', []):
+            process_correlations[row['key']][row['process_id']] = row['count']
+        department_correlations = defaultdict(dict)
+        for row in aggregates.get('type_department', []):
+            department_correlations[row['key']][row['department']] = row['count']
+        correlation_analysis = summarize_correlations(process_correlations, department_correlations)
+        
+        agents = await db_manager.get_agent_performance_metrics()
+        performance_ranking = rank_handlers({
+            row['key']: {
+                'total_handled': row['count'],
+                'complaints_resolved': row['resolved_count'],
+                'avg_resolution_time': float(row['resolution_days'])
+            }
+            for row in aggregates.get('handlers', [])
+        }, agents)
+        
+        auto_reply_suggestions = await generate_auto_reply_suggestions(recent_complaints)
+        
+        return {
+            'insights': {
+                'classification_summary': classification_results,
+                'recurrence_analysis': recurrence_analysis,
+                'anomaly_detection': anomaly_analysis,
+                'correlation_analysis': correlation_analysis
+            },
+            'performance_ranking': performance_ranking,
+            'auto_replies': auto_reply_suggestions,
+            'summary': {
+                'total_complaints': aggregates.get('total', 0),
+                'analysis_period': f'Last {period_days} days',
+                'key_findings': generate_key_findings(classification_results, recurrence_analysis, anomaly_analysis)
+            }
+        }
+        
+    except Exception as e:
+        logger.error(f"Aggregate complaints intelligence generation failed: {e}")
+        return {'error': str(e)}
+
 def classify_ars_complaints(complaints: List[Dict]) -> Dict:
     """Classify complaints using ARS-specific categories"""
     try:
@@ -71,34 +179,32 @@ def classify_ars_complaints(complaints: List[Dict]) -> Dict:
             severity_distribution[severity] += 1
             department_distribution[department] += 1
         
-        return {
-            'top_categories': dict(Counter(categories).most_common(5)),
-            'severity_distribution': dict(severity_distribution),
-            'department_distribution': dict(department_distribution),
-            'total_classified': len(complaints)
-        }
+        return summarize_classification(categories, severity_distribution, department_distribution, len(complaints))
         
     except Exception as e:
         logger.error(f"Complaint classification failed: {e}")
         return {'error': str(e)}
 
-def classify_by_content(description: str) -> str:
+def summarize_classification(categories: Dict, severity_distribution: Dict, department_distribution: Dict,
+                             total: int) -> Dict:
+    """Classification summary from category / severity / department counts"""
+    return {
+        'top_categories': dict(Counter(categories).most_common(5)),
+        'severity_distribution': dict(severity_distribution),
+        'department_distribution': dict(department_distribution),
+        'total_classified': total
+    }
+
+def classify_by_content(description: str, hits: Dict[str, List[str]] = None) -> str:
     """Classify complaint by content analysis"""
-    description_lower = description.lower()
+    if hits is None:
+        hits = complaint_matcher.match(description.lower())
     
     # ARS-specific keywords
-    if any(word in description_lower for word in ['rib', 'virement', 'paiement', 'remboursement']):
-        return 'RIB_INVALIDE'
-    elif any(word in description_lower for word in ['retard', 'délai', 'attente', 'lent']):
-        return 'RETARD_VIREMENT'
-    elif any(word in description_lower for word in ['erreur', 'incorrect', 'faux', 'mauvais']):
-        return 'ERREUR_DOSSIER'
-    elif any(word in description_lower for word in ['service', 'accueil', 'personnel']):
-        return 'QUALITE_SERVICE'
-    elif any(word in description_lower for word in ['technique', 'site', 'application']):
-        return 'PROBLEME_TECHNIQUE'
-    else:
-        return 'AUTRE'
+    for category, _ in CONTENT_CATEGORY_RULES:
+        if f'content:{category}' in hits:
+            return category
+    return 'AUTRE'
 
 def detect_complaint_recurrence(complaints: List[Dict]) -> Dict:
     """Detect recurring complaint patterns"""
@@ -118,41 +224,52 @@ def detect_complaint_recurrence(complaints: List[Dict]) -> Dict:
             
             type_timeline[complaint_type].append(created_at)
         
-        # Analyze recurrence patterns
-        recurrent_types = []
+        # Per-type frequency stats
+        type_stats = []
         for complaint_type, timestamps in type_timeline.items():
-            if len(timestamps) >= 3:  # At least 3 occurrences
-                # Calculate frequency
-                timestamps.sort()
-                time_diffs = [(timestamps[i+1] - timestamps[i]).days for i in range(len(timestamps)-1)]
-                avg_interval = sum(time_diffs) / len(time_diffs) if time_diffs else 0
-                
-                # Determine trend
-                recent_count = len([t for t in timestamps if (datetime.now() - t).days <= 7])
-                total_count = len(timestamps)
-                trend = 'up' if recent_count > total_count * 0.3 else 'stable' if recent_count > total_count * 0.1 else 'down'
-                
-                recurrent_types.append({
-                    'type': complaint_type,
-                    'count': total_count,
-                    'avg_interval_days': round(avg_interval, 1),
-                    'trend': trend,
-                    'recent_occurrences': recent_count
-                })
-        
-        # Sort by count
-        recurrent_types.sort(key=lambda x: x['count'], reverse=True)
+            timestamps.sort()
+            time_diffs = [(timestamps[i+1] - timestamps[i]).days for i in range(len(timestamps)-1)]
+            type_stats.append({
+                'type': complaint_type,
+                'count': len(timestamps),
+                'avg_interval_days': sum(time_diffs) / len(time_diffs) if time_diffs else 0,
+                'recent_occurrences': len([t for t in timestamps if (datetime.now() - t).days <= 7])
+            })
         
-        return {
-            'top_recurrent_types': recurrent_types[:5],
-            'total_recurrent_patterns': len(recurrent_types),
-            'analysis_summary': f'Detected {len(recurrent_types)} recurring complaint patterns'
-        }
+        return summarize_recurrence(type_stats)
         
     except Exception as e:
         logger.error(f"Recurrence detection failed: {e}")
         return {'error': str(e)}
 
+def summarize_recurrence(type_stats: List[Dict]) -> Dict:
+    """Recurrence patterns from per-type count, mean interval and last-7-days count"""
+    # Analyze recurrence patterns
+    recurrent_types = []
+    for stats in type_stats:
+        if stats['count'] >= 3:  # At least 3 occurrences
+            # Determine trend
+            recent_count = stats['recent_occurrences']
+            total_count = stats['count']
+            trend = 'up' if recent_count > total_count * 0.3 else 'stable' if recent_count > total_count * 0.1 else 'down'
+            
+            recurrent_types.append({
+                'type': stats['type'],
+                'count': total_count,
+                'avg_interval_days': round(float(stats['avg_interval_days'] or 0), 1),
+                'trend': trend,
+                'recent_occurrences': recent_count
+            })
+    
+    # Sort by count
+    recurrent_types.sort(key=lambda x: x['count'], reverse=True)
+    
+    return {
+        'top_recurrent_types': recurrent_types[:5],
+        'total_recurrent_patterns': len(recurrent_types),
+        'analysis_summary': f'Detected {len(recurrent_types)} recurring complaint patterns'
+    }
+
 def detect_complaint_anomalies(complaints: List[Dict]) -> Dict:
     """Detect anomalies in complaint patterns"""
     try:
@@ -170,6 +287,15 @@ def detect_complaint_anomalies(complaints: List[Dict]) -> Dict:
             date_key = created_at.strftime('%Y-%m-%d')
             daily_counts[date_key] += 1
         
+        return summarize_daily_anomalies(daily_counts)
+        
+    except Exception as e:
+        logger.error(f"Anomaly detection failed: {e}")
+        return {'error': str(e)}
+
+def summarize_daily_anomalies(daily_counts: Dict[str, int]) -> Dict:
+    """Days whose complaint volume is more than 2 standard deviations above the mean"""
+    try:
         # Calculate statistics
         counts = list(daily_counts.values())
         if not counts:
@@ -226,6 +352,15 @@ async def analyze_complaint_correlations(complaints: List[Dict], db_manager) ->
             # Department correlation
             department_correlations[complaint_type][department] += 1
         
+        return summarize_correlations(process_correlations, department_correlations)
+        
+    except Exception as e:
+        logger.error(f"Correlation analysis failed: {e}")
+        return {'error': str(e)}
+
+def summarize_correlations(process_correlations: Dict[str, Dict], department_correlations: Dict[str, Dict]) -> Dict:
+    """Significant type/process and type/department correlations from pair counts"""
+    try:
         # Calculate significant correlations
         significant_correlations = []
         
@@ -304,6 +439,19 @@ async def rank_complaint_handling_performance(complaints: List[Dict], db_manager
                     resolution_time = (datetime.now() - created_at).days
                     handler_performance[assigned_to]['avg_resolution_time'] += resolution_time
         
+        return rank_handlers(handler_performance, agents)
+        
+    except Exception as e:
+        logger.error(f"Performance ranking failed: {e}")
+        return []
+
+def rank_handlers(handler_performance: Dict[Any, Dict], agents: List[Dict]) -> List[Dict]:
+    """Top 10 handlers by resolution rate and speed
+    
+    handler_performance values hold total_handled, complaints_resolved and
+    avg_resolution_time (summed days to resolution).
+    """
+    try:
         # Calculate final metrics and rank
         performance_ranking = []
         
@@ -428,44 +576,29 @@ async def classify_ars_complaint(text: str, complaint_context: Dict, metadata: D
                 category = existing_type
                 confidence = 0.9
         
+        # One pass over the text finds the keywords of every rule below
+        hits = complaint_matcher.match(text_lower)
+        
         # Content-based classification with ARS business rules
-        if any(word in text_lower for word in ['rib', 'virement', 'paiement', 'remboursement', 'compte']):
-            category = 'RIB_INVALIDE'
-            subcategory = 'Problème RIB/Virement'
-            confidence = 0.85
-        elif any(word in text_lower for word in ['retard', 'délai', 'attente', 'lent', 'urgent']):
-            category = 'RETARD_VIREMENT'
-            subcategory = 'Délai dépassé'
-            confidence = 0.80
-        elif any(word in text_lower for word in ['erreur', 'incorrect', 'faux', 'mauvais', 'mistake']):
-            category = 'ERREUR_DOSSIER'
-            subcategory = 'Données incorrectes'
-            confidence = 0.75
-        elif any(word in text_lower for word in ['service', 'accueil', 'personnel', 'comportement']):
-            category = 'QUALITE_SERVICE'
-            subcategory = 'Service client'
-            confidence = 0.70
-        elif any(word in text_lower for word in ['site', 'application', 'technique', 'bug', 'connexion']):
-            category = 'PROBLEME_TECHNIQUE'
-            subcategory = 'Problème technique'
-            confidence = 0.75
+        for rule_category, rule_subcategory, rule_confidence, _ in CLASSIFY_CATEGORY_RULES:
+            if f'classify:{rule_category}' in hits:
+                category = rule_category
+                subcategory = rule_subcategory
+                confidence = rule_confidence
+                break
         
         # Priority determination with ARS business rules
         priority = 'medium'
         urgency_score = 5
         
-        if any(word in text_lower for word in ['urgent', 'immédiat', 'critique', 'grave', 'bloqué']):
-            priority = 'urgent'
-            urgency_score = 9
-        elif any(word in text_lower for word in ['important', 'rapidement', 'vite', 'priorité']):
-            priority = 'high'
-            urgency_score = 7
-        elif any(word in text_lower for word in ['quand possible', 'pas pressé', 'normal']):
-            priority = 'low'
-            urgency_score = 3
+        for rule_priority, rule_urgency, _ in PRIORITY_RULES:
+            if f'priority:{rule_priority}' in hits:
+                priority = rule_priority
+                urgency_score = rule_urgency
+                break
         
         # Enhanced sentiment analysis
-        sentiment_score = calculate_ars_sentiment(text_lower)
+        sentiment_score = calculate_ars_sentiment(text_lower, hits)
         
         # Estimated resolution time based on ARS SLA
         resolution_time_hours = {
@@ -508,7 +641,7 @@ async def classify_ars_complaint(text: str, complaint_context: Dict, metadata: D
             'sentiment': sentiment_score['sentiment'],
             'sentimentScore': sentiment_score['score'],
             'urgencyScore': urgency_score,
-            'keywords': extract_ars_keywords(text_lower),
+            'keywords': extract_ars_keywords(text_lower, hits),
             'businessContext': {
                 'slaCategory': map_to_sla_category(category),
                 'escalationRequired': priority in ['urgent', 'high'] and category in ['RIB_INVALIDE', 'RETARD_VIREMENT'],
@@ -657,13 +790,13 @@ def calculate_simple_p_value(occurrences: int, total: int) -> float:
     else:
         return 0.2   # Not significant
 
-def calculate_ars_sentiment(text_lower: str) -> Dict:
+def calculate_ars_sentiment(text_lower: str, hits: Dict[str, List[str]] = None) -> Dict:
     """Calculate sentiment with ARS-specific context"""
-    positive_words = ['merci', 'satisfait', 'content', 'bien', 'bon', 'parfait', 'excellent']
-    negative_words = ['problème', 'mécontent', 'déçu', 'mauvais', 'insatisfait', 'erreur', 'retard']
+    if hits is None:
+        hits = complaint_matcher.match(text_lower)
     
-    pos_count = sum(1 for word in positive_words if word in text_lower)
-    neg_count = sum(1 for word in negative_words if word in text_lower)
+    pos_count = len(hits.get('sentiment:positive', []))
+    neg_count = len(hits.get('sentiment:negative', []))
     
     score = pos_count - neg_count
     
@@ -676,11 +809,12 @@ def calculate_ars_sentiment(text_lower: str) -> Dict:
     
     return {'sentiment': sentiment, 'score': score}
 
-def extract_ars_keywords(text_lower: str) -> List[str]:
+def extract_ars_keywords(text_lower: str, hits: Dict[str, List[str]] = None) -> List[str]:
     """Extract ARS-specific keywords"""
-    ars_keywords = ['rib', 'virement', 'remboursement', 'délai', 'retard', 'erreur', 'dossier', 'client', 'service']
+    if hits is None:
+        hits = complaint_matcher.match(text_lower)
     
-    found_keywords = [word for word in ars_keywords if word in text_lower]
+    found_keywords = hits.get('ars_keyword', [])
     
     # Add general keywords
     words = text_lower.split()
@@ -3,17 +3,109 @@ Real ARS Forecasting and Capacity Planning Module
 Transforms generic forecasting into ARS-specific business intelligence
 """
 
+import asyncio
+import multiprocessing
+import os
 import pandas as pd
 import numpy as np
-from prophet import Prophet
+from concurrent.futures import Executor, Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from datetime import datetime, timedelta
-from typing import Dict, List, Any
+from typing import Dict, List, Any, AsyncIterator, Optional, Tuple
 import logging
+from compute_executor import cpu_share
+from forecast_cache import forecast_cache
+from monitoring import time_stage
+from subsystems import subsystems
 
 logger = logging.getLogger(__name__)
 
-async def generate_client_forecast(historical_data: List[Dict], forecast_days: int, client_name: str) -> Dict:
-    """Generate forecast for a specific client using Prophet"""
+# Worker processes for multi-client forecasting (per uvicorn worker), and the per-client
+# time budget in seconds
+FORECAST_WORKERS = int(os.getenv('FORECAST_WORKERS', cpu_share()))
+FORECAST_JOB_TIMEOUT = float(os.getenv('FORECAST_JOB_TIMEOUT', 120))
+
+_forecast_pool: Optional[ProcessPoolExecutor] = None
+# One slot per pool worker, so a client's time budget starts when its fit can run
+_forecast_slots: Optional[asyncio.Semaphore] = None
+
+def get_forecast_pool() -> ProcessPoolExecutor:
+    """Process pool that fits client models, created on first use"""
+    global _forecast_pool
+    if _forecast_pool is None:
+        # spawn: workers must not inherit the event loop and scheduler threads
+        _forecast_pool = ProcessPoolExecutor(
+            max_workers=FORECAST_WORKERS,
+            mp_context=multiprocessing.get_context('spawn')
+        )
+        logger.info(f"Forecast process pool started with {FORECAST_WORKERS} workers")
+    return _forecast_pool
+
+def get_forecast_slots() -> asyncio.Semaphore:
+    global _forecast_slots
+    if _forecast_slots is None:
+        _forecast_slots = asyncio.Semaphore(FORECAST_WORKERS)
+    return _forecast_slots
+
+class _TrackedExecutor(Executor):
+    """Pool proxy that remembers the futures of one client's work"""
+
+    def __init__(self, pool: Executor):
+        self.pool = pool
+        self.futures: List[Future] = []
+
+    def submit(self, fn, /, *args, **kwargs) -> Future:
+        future = self.pool.submit(fn, *args, **kwargs)
+        self.futures.append(future)
+        return future
+
+def _release_when_done(slots: asyncio.Semaphore, futures: List[Future]):
+    """Give a slot back once the pool work left behind by a timed-out client has ended"""
+    loop = asyncio.get_running_loop()
+    remaining = [len(futures)]
+    
+    def done(_):
+        remaining[0] -= 1
+        if not remaining[0]:
+            try:
+                loop.call_soon_threadsafe(slots.release)
+            except RuntimeError:
+                pass  # loop already closed
+    
+    for future in futures:
+        future.add_done_callback(done)
+
+def shutdown_forecast_pool():
+    global _forecast_pool
+    if _forecast_pool is not None:
+        _forecast_pool.shutdown(wait=False, cancel_futures=True)
+        _forecast_pool = None
+
+# Prophet setup shared by every client model; part of the forecast cache key
+CLIENT_MODEL_CONFIG = ('client', 'yearly', 'weekly', 'cps=0.05', 'sps=10.0', 'monthly=30.5/5')
+
+def build_client_model():
+    """Unfitted Prophet model with the ARS client seasonalities"""
+    Prophet = subsystems.get('prophet').Prophet
+    model = Prophet(
+        yearly_seasonality=True,
+        weekly_seasonality=True,
+        daily_seasonality=False,
+        changepoint_prior_scale=0.05,
+        seasonality_prior_scale=10.0
+    )
+    
+    # Add custom seasonalities for ARS business patterns
+    model.add_seasonality(name='monthly', period=30.5, fourier_order=5)
+    return model
+
+async def generate_client_forecast(historical_data: List[Dict], forecast_days: int, client_name: str,
+                                   client_id: Any = None, executor=None) -> Dict:
+    """Generate forecast for a specific client using Prophet
+    
+    The fitted model is cached per client and only refit when new daily rows arrive;
+    refits run on executor (a thread by default, the forecast process pool for fan-out).
+    """
     try:
         # Prepare data for Prophet
         df_data = []
@@ -32,23 +124,12 @@ async def generate_client_forecast(historical_data: List[Dict], forecast_days: i
         df_complete = pd.DataFrame({'ds': date_range})
         df = df_complete.merge(df, on='ds', how='left').fillna(0)
         
-        # Create and fit Prophet model
-        model = Prophet(
-            yearly_seasonality=True,
-            weekly_seasonality=True,
-            daily_seasonality=False,
-            changepoint_prior_scale=0.05,
-            seasonality_prior_scale=10.0
-        )
-        
-        # Add custom seasonalities for ARS business patterns
-        model.add_seasonality(name='monthly', period=30.5, fourier_order=5)
-        
-        model.fit(df)
-        
-        # Create future dataframe
-        future = model.make_future_dataframe(periods=forecast_days)
-        forecast = model.predict(future)
+        # Fitted model and forecast come from the cache unless new daily rows arrived
+        cache_key = f"client:{client_id if client_id is not None else client_name}"
+        with time_stage('inference', model_type='prophet'):
+            model, forecast = await forecast_cache.forecast(
+                cache_key, df, CLIENT_MODEL_CONFIG, build_client_model, forecast_days, executor=executor
+            )
         
         # Extract forecast results
         forecast_results = []
@@ -84,11 +165,65 @@ async def generate_client_forecast(historical_data: List[Dict], forecast_days: i
         logger.error(f"Client forecast generation failed: {e}")
         raise
 
-async def calculate_staffing_requirements(client_forecast: Dict, client_name: str, db_manager) -> List[Dict]:
+async def forecast_clients(clients: Dict[Any, Dict], forecast_days: int,
+                           timeout: float = FORECAST_JOB_TIMEOUT) -> AsyncIterator[Tuple[Any, str, Any]]:
+    """Forecast every client on the process pool, yielding results as they finish
+    
+    clients maps client id -> {'name': ..., 'data': [...]}. Yields (client_id, status, value)
+    where status is 'ok' (value = forecast dict), 'timeout' or 'error' (value = message).
+    At most FORECAST_WORKERS clients run at once (across requests), and timeout counts
+    from when a client starts, not while it waits for a worker. A timed-out fit keeps
+    running in its worker until it ends; its result is discarded, and its slot is only
+    released then, so timed-out fits cannot push the pool past FORECAST_WORKERS.
+    """
+    pool = get_forecast_pool()
+    slots = get_forecast_slots()
+    
+    async def run(client_id, client_info):
+        executor = _TrackedExecutor(pool)
+        try:
+            await slots.acquire()
+            try:
+                forecast = await asyncio.wait_for(
+                    generate_client_forecast(client_info['data'], forecast_days, client_info['name'],
+                                             client_id=client_id, executor=executor),
+                    timeout=timeout
+                )
+            finally:
+                # On timeout or cancellation the fit may still be running in its worker
+                running = [future for future in executor.futures if not future.done()]
+                if running:
+                    _release_when_done(slots, running)
+                else:
+                    slots.release()
+            return client_id, 'ok', forecast
+        except asyncio.TimeoutError:
+            logger.warning(f"Forecast for client {client_id} timed out after {timeout}s")
+            return client_id, 'timeout', f"Timed out after {timeout}s"
+        except BrokenProcessPool as e:
+            # A worker died; drop the pool so the next request starts a fresh one
+            shutdown_forecast_pool()
+            logger.error(f"Forecast pool broken while forecasting client {client_id}: {e}")
+            return client_id, 'error', str(e)
+        except Exception as e:
+            logger.error(f"Forecast failed for client {client_id}: {e}")
+            return client_id, 'error', str(e)
+    
+    tasks = [asyncio.ensure_future(run(client_id, info)) for client_id, info in clients.items()]
+    try:
+        for finished in asyncio.as_completed(tasks):
+            yield await finished
+    finally:
+        for task in tasks:
+            task.cancel()
+
+async def calculate_staffing_requirements(client_forecast: Dict, client_name: str, db_manager,
+                                          agents: List[Dict] = None) -> List[Dict]:
     """Calculate staffing requirements based on forecast"""
     try:
         # Get current agent performance metrics
-        agents = await db_manager.get_agent_performance_metrics()
+        if agents is None:
+            agents = await db_manager.get_agent_performance_metrics()
         
         # Calculate average processing capacity per agent
         if agents:
@@ -124,32 +259,28 @@ async def calculate_staffing_requirements(client_forecast: Dict, client_name: st
         logger.error(f"Staffing calculation failed: {e}")
         return []
 
-def aggregate_client_forecasts(client_forecasts: Dict) -> Dict:
-    """Aggregate forecasts across all clients"""
-    try:
-        if not client_forecasts:
+class ForecastAggregator:
+    """Running per-date totals across client forecasts, merged as each client finishes"""
+    
+    def __init__(self):
+        self.client_count = 0
+        self._totals: Dict[str, List[int]] = {}
+    
+    def add(self, client_forecast: Dict):
+        self.client_count += 1
+        for day in client_forecast['forecast']:
+            totals = self._totals.setdefault(day['date'], [0, 0, 0])
+            totals[0] += day['predicted_bordereaux']
+            totals[1] += day['lower_bound']
+            totals[2] += day['upper_bound']
+    
+    def result(self) -> Dict:
+        if not self.client_count:
             return {'total_forecast': [], 'summary': 'No forecasts available'}
         
-        # Get all dates
-        all_dates = set()
-        for forecast in client_forecasts.values():
-            for day in forecast['forecast']:
-                all_dates.add(day['date'])
-        
-        # Aggregate by date
         total_forecast = []
-        for date in sorted(all_dates):
-            total_predicted = 0
-            total_lower = 0
-            total_upper = 0
-            
-            for forecast in client_forecasts.values():
-                day_data = next((d for d in forecast['forecast'] if d['date'] == date), None)
-                if day_data:
-                    total_predicted += day_data['predicted_bordereaux']
-                    total_lower += day_data['lower_bound']
-                    total_upper += day_data['upper_bound']
-            
+        for date in sorted(self._totals):
+            total_predicted, total_lower, total_upper = self._totals[date]
             total_forecast.append({
                 'date': date,
                 'total_predicted_bordereaux': total_predicted,
@@ -160,8 +291,16 @@ def aggregate_client_forecasts(client_forecasts: Dict) -> Dict:
         
         return {
             'total_forecast': total_forecast,
-            'summary': f'Aggregated forecast for {len(client_forecasts)} clients over {len(total_forecast)} days'
+            'summary': f'Aggregated forecast for {self.client_count} clients over {len(total_forecast)} days'
         }
+
+def aggregate_client_forecasts(client_forecasts: Dict) -> Dict:
+    """Aggregate forecasts across all clients"""
+    try:
+        aggregator = ForecastAggregator()
+        for forecast in client_forecasts.values():
+            aggregator.add(forecast)
+        return aggregator.result()
         
     except Exception as e:
         logger.error(f"Forecast aggregation failed: {e}")
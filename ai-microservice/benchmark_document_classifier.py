@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Document classifier benchmark
+Trains DocumentClassifier on synthetic bordereaux with the dense gradient boosting
+ensemble (train_ensemble_model) and the sparse linear model (train_sparse_model), each
+in a fresh interpreter, and reports fit time, peak memory growth during the fit,
+held-out accuracy and batch inference time. The texts follow the document_content
+built by get_bordereaux_for_training, minus the status itself (which would make every
+model exact), plus a short observation line.
+
+    python benchmark_document_classifier.py
+    python benchmark_document_classifier.py --sizes 1000,10000 --models sparse
+    python benchmark_document_classifier.py --ensemble-limit 100000   # slow: hours at 100k
+"""
+
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+
+MARKER = 'CLASSIFIER-RESULT '
+TRAINERS = {'ensemble': 'train_ensemble_model', 'sparse': 'train_sparse_model'}
+PREDICT_DOCS = 1000
+
+# status -> (settlement delays, closed share, BS count range, typical observations)
+STATUSES = {
+    'EN_ATTENTE': ([30, 45], 0.0, (1, 20), ['en attente de réception', 'dossier incomplet', 'relance client']),
+    'SCAN_EN_COURS': ([30], 0.0, (10, 80), ['numérisation en cours', 'lot scanné partiellement']),
+    'ASSIGNE': ([15, 30], 0.0, (5, 60), ['affecté au gestionnaire', 'en file de traitement']),
+    'EN_COURS': ([15, 30, 45], 0.0, (5, 120), ['traitement en cours', 'contrôle des BS', 'vérification des actes']),
+    'TRAITE': ([15, 30], 0.4, (5, 120), ['traitement terminé', 'prêt pour virement']),
+    'VIREMENT_EN_COURS': ([30], 0.5, (10, 150), ['ordre de virement émis', 'virement en attente de validation']),
+    'CLOTURE': ([15, 30, 45], 1.0, (1, 150), ['dossier clôturé', 'règlement effectué', 'archivé']),
+    'EN_DIFFICULTE': ([7, 15], 0.0, (50, 300), ['retard de traitement', 'réclamation client', 'pièces manquantes'])
+}
+SHARED_OBSERVATIONS = ['RAS', 'contrôle qualité', 'priorité normale', 'bordereau papier', 'envoi électronique']
+
+def make_bordereaux(n: int, seed: int = 42, label_noise: float = 0.1):
+    """n synthetic (document_content, status) pairs"""
+    rng = random.Random(seed)
+    statuses = list(STATUSES)
+    documents, labels = [], []
+    for i in range(n):
+        status = rng.choice(statuses)
+        delays, closed_share, bs_range, observations = STATUSES[status]
+        day, month = rng.randint(1, 28), rng.randint(1, 12)
+        dated = (f" Clôturé le {day:02d}/{month:02d}/2024" if rng.random() < closed_share
+                 else f" En cours depuis {day:02d}/{month:02d}/2024")
+        notes = rng.sample(observations, 1) + rng.sample(SHARED_OBSERVATIONS, 2)
+        documents.append(
+            f"Bordereau BR-2024-{i:06d} Client: Client {rng.randint(1, 60)} "
+            f"Nombre BS: {rng.randint(*bs_range)} Délai: {rng.choice(delays)} jours{dated} "
+            f"Observations: {', '.join(notes)}"
+        )
+        labels.append(rng.choice(statuses) if rng.random() < label_noise else status)
+    return documents, labels
+
+def measure(model: str, size: int):
+    """Child process: train one model on size documents, print one JSON result line"""
+    # A scratch featurizer, so the benchmark neither reads nor changes the service's IDF
+    os.environ['TEXT_FEATURIZER_NAME'] = 'benchmark_document_classifier'
+    import resource
+
+    from advanced_ml_models import DocumentClassifier
+    from subsystems import current_rss
+
+    documents, labels = make_bordereaux(size)
+    classifier = DocumentClassifier()
+    rss_before = current_rss()
+    start = time.perf_counter()
+    result = getattr(classifier, TRAINERS[model])(documents, labels)
+    fit_seconds = time.perf_counter() - start
+    # ru_maxrss is in KiB on Linux
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+    batch = documents[:PREDICT_DOCS]
+    start = time.perf_counter()
+    classifier.batch_classify(batch)
+    predict_seconds = time.perf_counter() - start
+
+    print(MARKER + json.dumps({
+        'fit_seconds': fit_seconds,
+        'peak_rss_delta_mb': (peak_rss - rss_before) / 2 ** 20 if rss_before else None,
+        'accuracy': result['accuracy'],
+        'feature_count': result['feature_count'],
+        'predict_ms_per_doc': predict_seconds * 1000 / len(batch)
+    }), flush=True)
+
+def run_child(model: str, size: int) -> dict:
+    output = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), '--child', model, str(size)],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True, check=True
+    ).stdout
+    line = next(line for line in output.splitlines() if line.startswith(MARKER))
+    return json.loads(line[len(MARKER):])
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default='1000,10000,100000', help='comma-separated bordereau counts')
+    parser.add_argument('--models', default='ensemble,sparse', help='comma-separated: ensemble, sparse')
+    parser.add_argument('--ensemble-limit', type=int, default=10000,
+                        help='skip the dense ensemble above this many documents')
+    parser.add_argument('--child', nargs=2, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child is not None:
+        measure(args.child[0], int(args.child[1]))
+        return
+
+    sizes = [int(size) for size in args.sizes.split(',')]
+    models = [model.strip() for model in args.models.split(',') if model.strip() in TRAINERS]
+
+    print(f"  {'model':<10} {'docs':>8} {'fit s':>9} {'peak MB':>9} {'accuracy':>9} {'features':>9} {'predict ms/doc':>15}")
+    for size in sizes:
+        for model in models:
+            if model == 'ensemble' and size > args.ensemble_limit:
+                print(f"  {model:<10} {size:>8}  skipped (above --ensemble-limit {args.ensemble_limit})")
+                continue
+            result = run_child(model, size)
+            peak = result['peak_rss_delta_mb']
+            print(f"  {model:<10} {size:>8} {result['fit_seconds']:>9.2f} "
+                  f"{peak if peak is not None else float('nan'):>9.1f} {result['accuracy']:>9.3f} "
+                  f"{result['feature_count']:>9} {result['predict_ms_per_doc']:>15.3f}", flush=True)
+
+if __name__ == "__main__":
+    main()
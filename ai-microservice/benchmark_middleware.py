@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+Middleware stack benchmark
+Measures requests/sec of a small JSON endpoint behind the former middleware stack (two
+BaseHTTPMiddleware layers, an @app.middleware("http") metrics layer and Connection: close)
+and behind the pure-ASGI ConnectionHandlingMiddleware with keep-alive.
+
+    python benchmark_middleware.py                      # in-process, middleware overhead only
+    python benchmark_middleware.py --server             # through a uvicorn process over TCP
+    python benchmark_middleware.py --requests 20000 --concurrency 100
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import socket
+import subprocess
+import sys
+import time
+
+import httpx
+from fastapi import Body, FastAPI, Request
+from fastapi.responses import JSONResponse
+from starlette.middleware.base import BaseHTTPMiddleware
+
+from connection_middleware import add_connection_middleware
+from monitoring import metrics_middleware
+
+# monitoring configures INFO logging; per-request client logs would dominate the timings
+logging.getLogger("httpx").setLevel(logging.WARNING)
+
+PAYLOAD = {"text": "Retard de remboursement pour le bordereau BR-2024-001", "client_id": "c-42"}
+
+class LegacyConnectionHandlingMiddleware(BaseHTTPMiddleware):
+    """Reference copy of the former connection middleware (timeout + Connection: close)"""
+
+    async def dispatch(self, request: Request, call_next):
+        try:
+            response = await asyncio.wait_for(call_next(request), timeout=60.0)
+            response.headers["Connection"] = "close"
+            response.headers["Cache-Control"] = "no-cache"
+            return response
+        except asyncio.TimeoutError:
+            return JSONResponse(status_code=408, content={"error": "Request timeout"})
+        except Exception as e:
+            return JSONResponse(status_code=500, content={"error": "Internal server error", "detail": str(e)})
+
+class LegacyResponseCleanupMiddleware(BaseHTTPMiddleware):
+    """Reference copy of the former response cleanup middleware"""
+
+    async def dispatch(self, request: Request, call_next):
+        try:
+            return await call_next(request)
+        except Exception:
+            return JSONResponse(status_code=500, content={"error": "Response processing error"},
+                                headers={"Connection": "close"})
+
+def build_app(stack: str) -> FastAPI:
+    app = FastAPI()
+
+    @app.post("/echo")
+    async def echo(data: dict = Body(...)):
+        return {"received": len(data.get("text", "")), "client_id": data.get("client_id")}
+
+    if stack == 'legacy':
+        app.add_middleware(LegacyConnectionHandlingMiddleware)
+        app.add_middleware(LegacyResponseCleanupMiddleware)
+        app.middleware("http")(metrics_middleware)
+    else:
+        app = add_connection_middleware(app)
+    return app
+
+async def run_load(client: httpx.AsyncClient, url: str, requests: int, concurrency: int) -> float:
+    """Requests/sec for `requests` POSTs issued by `concurrency` concurrent workers"""
+    remaining = [requests]
+
+    async def worker():
+        while remaining[0] > 0:
+            remaining[0] -= 1
+            response = await client.post(url, json=PAYLOAD)
+            response.raise_for_status()
+
+    # Warm-up (route compilation, connection pool)
+    for _ in range(min(50, requests)):
+        await client.post(url, json=PAYLOAD)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return requests / (time.perf_counter() - start)
+
+async def bench_in_process(stack: str, requests: int, concurrency: int) -> float:
+    transport = httpx.ASGITransport(app=build_app(stack))
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        return await run_load(client, "/echo", requests, concurrency)
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def serve(stack: str, port: int):
+    import uvicorn
+
+    uvicorn.run(build_app(stack), host="127.0.0.1", port=port, log_level="warning",
+                access_log=False, timeout_keep_alive=30)
+
+async def _raw_worker(port: int, request: bytes, remaining: list, stats: dict):
+    """HTTP/1.1 client loop on asyncio streams; reconnects only when the server closes"""
+    reader = writer = None
+    while remaining[0] > 0:
+        remaining[0] -= 1
+        if writer is None:
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            stats['connections'] += 1
+        writer.write(request)
+        head = await reader.readuntil(b"\r\n\r\n")
+        headers = head.lower()
+        length = int(headers.split(b"content-length:")[1].split(b"\r\n")[0])
+        await reader.readexactly(length)
+        if not head.startswith(b"HTTP/1.1 200"):
+            raise RuntimeError(head.split(b"\r\n")[0].decode())
+        if b"connection: close" in headers:
+            writer.close()
+            reader = writer = None
+    if writer is not None:
+        writer.close()
+
+async def bench_server(stack: str, requests: int, concurrency: int) -> float:
+    port = _free_port()
+    server = subprocess.Popen([sys.executable, os.path.abspath(__file__), '--serve', stack, '--port', str(port)])
+    try:
+        # Wait until the server accepts connections
+        deadline = time.time() + 30
+        while True:
+            try:
+                socket.create_connection(("127.0.0.1", port), timeout=1).close()
+                break
+            except OSError:
+                if time.time() > deadline or server.poll() is not None:
+                    raise RuntimeError(f"{stack} server did not start")
+                await asyncio.sleep(0.1)
+
+        body = json.dumps(PAYLOAD).encode()
+        request = (f"POST /echo HTTP/1.1\r\nHost: 127.0.0.1:{port}\r\nContent-Type: application/json\r\n"
+                   f"Content-Length: {len(body)}\r\n\r\n").encode() + body
+        stats = {'connections': 0}
+        await _raw_worker(port, request, [min(50, requests)], stats)  # warm-up
+        stats['connections'] = 0
+        remaining = [requests]
+        start = time.perf_counter()
+        await asyncio.gather(*(_raw_worker(port, request, remaining, stats) for _ in range(concurrency)))
+        rate = requests / (time.perf_counter() - start)
+        print(f"  {stack:<7} opened {stats['connections']} TCP connections")
+        return rate
+    finally:
+        server.terminate()
+        server.wait()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=5000)
+    parser.add_argument('--concurrency', type=int, default=50)
+    parser.add_argument('--server', action='store_true', help='run through a uvicorn process over TCP')
+    parser.add_argument('--serve', choices=['legacy', 'asgi'], help=argparse.SUPPRESS)
+    parser.add_argument('--port', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.serve, args.port)
+        return
+
+    bench = bench_server if args.server else bench_in_process
+    mode = 'uvicorn/TCP' if args.server else 'in-process ASGI'
+    print(f"{args.requests} requests, concurrency {args.concurrency}, {mode}")
+
+    results = {}
+    for stack in ('legacy', 'asgi'):
+        results[stack] = asyncio.run(bench(stack, args.requests, args.concurrency))
+        print(f"  {stack:<7} {results[stack]:>10.1f} req/s")
+    print(f"  speedup {results['asgi'] / results['legacy']:>10.2f}x")
+
+if __name__ == "__main__":
+    main()
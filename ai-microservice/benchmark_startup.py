@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Cold-start benchmark
+Starts fresh interpreters that import the app, then warm up a list of subsystems, and
+reports import time, resident memory and which heavy libraries got loaded. "lazy" is the
+default start (nothing warmed), "all" loads every registered subsystem like the former
+eager imports did; per-subsystem load time and RSS growth come from the registry.
+
+    python benchmark_startup.py
+    python benchmark_startup.py --runs 5 --warmup spacy,prophet
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+HEAVY_MODULES = ['torch', 'transformers', 'shap', 'prophet', 'spacy']
+MARKER = 'STARTUP-RESULT '
+
+def measure(warmup: str):
+    """Child process: import the app, warm up, print one JSON result line"""
+    start = time.perf_counter()
+    import ai_microservice  # noqa: F401
+    import_seconds = time.perf_counter() - start
+
+    from subsystems import current_rss, subsystems
+    rss_import = current_rss()
+    start = time.perf_counter()
+    subsystems.warmup(warmup)
+    warmup_seconds = time.perf_counter() - start
+    rss_warm = current_rss()
+
+    print(MARKER + json.dumps({
+        'import_seconds': import_seconds,
+        'warmup_seconds': warmup_seconds,
+        'rss_import_mb': rss_import / 2 ** 20 if rss_import else None,
+        'rss_warm_mb': rss_warm / 2 ** 20 if rss_warm else None,
+        'heavy_modules': [name for name in HEAVY_MODULES if name in sys.modules],
+        'subsystems': subsystems.info()['subsystems']
+    }), flush=True)
+
+def run_child(warmup: str) -> dict:
+    output = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), '--child', warmup],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True, check=True
+    ).stdout
+    line = next(line for line in output.splitlines() if line.startswith(MARKER))
+    return json.loads(line[len(MARKER):])
+
+def _median(results, key):
+    values = [result[key] for result in results if result[key] is not None]
+    return statistics.median(values) if values else float('nan')
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--warmup', help='extra comma-separated warm-up list to measure')
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child is not None:
+        measure(args.child)
+        return
+
+    modes = {'lazy': '', 'all': 'all'}
+    if args.warmup:
+        modes[args.warmup] = args.warmup
+
+    print(f"{args.runs} cold starts per mode (median)")
+    print(f"  {'mode':<20} {'import s':>9} {'warm-up s':>10} {'RSS MB':>8}  heavy libraries loaded")
+    last = {}
+    for mode, warmup in modes.items():
+        results = [run_child(warmup) for _ in range(args.runs)]
+        last[mode] = results[-1]
+        print(f"  {mode:<20} {_median(results, 'import_seconds'):>9.2f} {_median(results, 'warmup_seconds'):>10.2f} "
+              f"{_median(results, 'rss_warm_mb'):>8.1f}  {', '.join(results[-1]['heavy_modules']) or '-'}")
+
+    print("\nPer subsystem (mode all, last run; shared imports count toward the first loader)")
+    for name, info in last['all']['subsystems'].items():
+        if info['loaded']:
+            print(f"  {name:<16} {info['load_seconds']:>7.2f} s {info['rss_delta_mb']:>8.1f} MB")
+        else:
+            print(f"  {name:<16} failed: {info['error']}")
+
+if __name__ == "__main__":
+    main()
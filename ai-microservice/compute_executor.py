@@ -0,0 +1,292 @@
+"""
+CPU Compute Executor
+Runs CPU-bound model work (sklearn fits, clustering sweeps, outlier detection) in
+dedicated worker processes so the event loop keeps serving I/O-bound requests. Tasks
+have a timeout; when a task times out or its request is cancelled (e.g. by the
+ConnectionHandlingMiddleware timeout) the worker running it is terminated and replaced.
+The number of tasks in flight is capped, and queue depth is exported to Prometheus.
+"""
+
+import asyncio
+import atexit
+import importlib
+import multiprocessing
+import signal
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+import logging
+import os
+
+from monitoring import COMPUTE_INFLIGHT, COMPUTE_QUEUE_DEPTH, COMPUTE_TASK_DURATION, COMPUTE_TASKS, time_stage
+
+logger = logging.getLogger(__name__)
+
+# Uvicorn workers on this host, exported by serve.py. Each has its own pools, so pool
+# defaults are a per-worker share of the host's CPUs rather than the whole host.
+AI_WORKER_COUNT = max(1, int(os.getenv('AI_WORKER_COUNT', 1)))
+
+def cpu_share(fraction: float = 1.0) -> int:
+    """This worker's share of fraction x the host's CPUs, at least 1"""
+    return max(1, int((os.cpu_count() or 1) * fraction) // AI_WORKER_COUNT)
+
+COMPUTE_WORKERS = int(os.getenv('COMPUTE_WORKERS', cpu_share(0.5)))
+# Tasks queued or running beyond this (per uvicorn worker) are rejected straight away
+COMPUTE_MAX_INFLIGHT = int(os.getenv('COMPUTE_MAX_INFLIGHT', 4 * COMPUTE_WORKERS))
+# Seconds per task, queue wait included; below REQUEST_TIMEOUT so the endpoint can answer
+COMPUTE_TASK_TIMEOUT = float(os.getenv('COMPUTE_TASK_TIMEOUT', 50))
+
+class ComputeError(Exception):
+    """The task could not be run to completion by the executor"""
+    status_code = 503
+
+class ComputeRejected(ComputeError):
+    """Too many tasks in flight"""
+
+class ComputeTimeout(ComputeError):
+    status_code = 504
+
+class ComputeWorkerDied(ComputeError):
+    """The worker process exited while running the task (crash, out of memory)"""
+
+def call_global(module: str, instance: Optional[str], method: str, args: tuple, kwargs: Dict) -> Any:
+    """Call a method of a module-level engine inside the worker
+
+    The engine is the worker's own copy of the global (imported there), so only the
+    arguments and the result cross the process boundary.
+    """
+    target = importlib.import_module(module)
+    if instance:
+        target = getattr(target, instance)
+    return getattr(target, method)(*args, **kwargs)
+
+def _worker_main(conn):
+    """Worker process loop: run (fn, args) tasks until the pipe closes"""
+    # Ctrl+C goes to the whole process group; the parent decides when workers stop
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    while True:
+        try:
+            task = conn.recv()
+        except (EOFError, OSError):
+            return
+        if task is None:
+            return
+        fn, args = task
+        try:
+            reply = ('ok', fn(*args))
+        except Exception as e:
+            reply = ('error', e)
+        try:
+            conn.send(reply)
+        except Exception as e:
+            conn.send(('error', RuntimeError(f"Task result could not be sent back: {e}")))
+
+class _Worker:
+    """One worker process and the parent's end of its pipe"""
+
+    def __init__(self, context):
+        parent_conn, child_conn = context.Pipe()
+        self.process = context.Process(target=_worker_main, args=(child_conn,), name='compute-worker')
+        self.process.start()
+        child_conn.close()
+        self.conn = parent_conn
+
+    def alive(self) -> bool:
+        return self.process.is_alive()
+
+    def call(self, fn: Callable, args: tuple) -> Any:
+        """Run fn(*args) in the worker; blocks, so it is called from an I/O thread"""
+        try:
+            self.conn.send((fn, args))
+            status, value = self.conn.recv()
+        except (EOFError, OSError) as e:
+            raise ComputeWorkerDied(f"Compute worker {self.process.pid} exited: {e}") from None
+        if status == 'error':
+            raise value
+        return value
+
+    def kill(self):
+        """Terminate without waiting; the interrupted task's result is never read"""
+        try:
+            self.process.terminate()
+        except Exception as e:
+            logger.debug(f"Terminating compute worker failed: {e}")
+        self.conn.close()
+
+    def stop(self, timeout: float = 1.0):
+        try:
+            self.conn.send(None)
+        except Exception:
+            pass
+        self.process.join(timeout)
+        if self.process.is_alive():
+            self.process.terminate()
+            self.process.join(timeout)
+        self.conn.close()
+
+_OUTCOME_STATS = {'ok': 'completed', 'error': 'failed', 'timeout': 'timeouts', 'cancelled': 'cancelled'}
+
+class _Dispatch:
+    """Hand-off between a waiting request and the I/O thread driving its worker"""
+
+    def __init__(self, worker: Optional[_Worker]):
+        self.worker = worker
+        self.cancelled = False
+
+class ComputeExecutor:
+    """Pool of spawned worker processes with timeouts, cancellation and admission control
+
+    A free worker is taken from a slot queue (None slots start a new process on demand),
+    the task is sent over its pipe from an I/O thread, and the worker goes back to the
+    queue afterwards. Cancelling the awaiting coroutine terminates that worker, because a
+    running sklearn fit cannot be interrupted any other way.
+    """
+
+    def __init__(self, workers: int = COMPUTE_WORKERS, max_inflight: int = COMPUTE_MAX_INFLIGHT,
+                 timeout: float = COMPUTE_TASK_TIMEOUT):
+        self.workers = workers
+        self.max_inflight = max(max_inflight, workers)
+        self.timeout = timeout
+        # spawn: workers must not inherit the event loop, its threads or open connections
+        self._context = multiprocessing.get_context('spawn')
+        self._threads = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='compute-io')
+        self._slots = None
+        self._live = set()
+        self._live_lock = threading.Lock()
+        self._inflight = 0
+        self._waiting = 0
+        self.stats = {'completed': 0, 'failed': 0, 'timeouts': 0, 'cancelled': 0, 'rejected': 0,
+                      'workers_started': 0, 'workers_killed': 0}
+        atexit.register(self.shutdown)
+
+    def _ensure_slots(self):
+        if self._slots is None:
+            self._slots = asyncio.Queue()
+            for _ in range(self.workers):
+                self._slots.put_nowait(None)
+
+    def _update_gauges(self):
+        COMPUTE_QUEUE_DEPTH.set(self._waiting)
+        COMPUTE_INFLIGHT.set(self._inflight)
+
+    def _start_worker(self) -> _Worker:
+        worker = _Worker(self._context)
+        with self._live_lock:
+            self._live.add(worker)
+        self.stats['workers_started'] += 1
+        return worker
+
+    def _kill_worker(self, worker: _Worker):
+        """Terminate worker once; later calls for the same worker do nothing"""
+        with self._live_lock:
+            if worker not in self._live:
+                return
+            self._live.discard(worker)
+        worker.kill()
+        self.stats['workers_killed'] += 1
+
+    def _run_dispatch(self, dispatch: _Dispatch, fn: Callable, args: tuple) -> Any:
+        """I/O thread side: start a worker if the slot has none, then run the task"""
+        worker = dispatch.worker
+        if worker is None or not worker.alive():
+            if worker is not None:
+                self._kill_worker(worker)
+            worker = self._start_worker()
+            dispatch.worker = worker
+        if dispatch.cancelled:
+            # The request gave up while the worker was starting
+            self._kill_worker(worker)
+            dispatch.worker = None
+            return None
+        return worker.call(fn, args)
+
+    async def _execute(self, fn: Callable, args: tuple) -> Any:
+        self._waiting += 1
+        self._update_gauges()
+        try:
+            worker = await self._slots.get()
+        finally:
+            self._waiting -= 1
+            self._update_gauges()
+
+        dispatch = _Dispatch(worker)
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._threads, self._run_dispatch, dispatch, fn, args)
+        except (asyncio.CancelledError, ComputeWorkerDied):
+            # Cancelled (timeout, request gone) or crashed: the slot gets a fresh worker
+            dispatch.cancelled = True
+            worker = dispatch.worker
+            if worker is not None:
+                self._kill_worker(worker)
+                dispatch.worker = None
+            raise
+        finally:
+            self._slots.put_nowait(dispatch.worker)
+
+    async def run(self, fn: Callable, *args, timeout: Optional[float] = None,
+                  task_name: Optional[str] = None) -> Any:
+        """Result of fn(*args) computed in a worker process
+
+        fn and args must be picklable (module-level functions). Raises ComputeRejected
+        when max_inflight tasks are already queued or running, ComputeTimeout after
+        timeout seconds, and whatever fn raised otherwise.
+        """
+        name = task_name or getattr(fn, '__name__', 'task')
+        if self._inflight >= self.max_inflight:
+            self.stats['rejected'] += 1
+            COMPUTE_TASKS.labels(task=name, outcome='rejected').inc()
+            raise ComputeRejected(f"{self._inflight} compute tasks in flight (limit {self.max_inflight})")
+
+        self._ensure_slots()
+        timeout = self.timeout if timeout is None else timeout
+        self._inflight += 1
+        self._update_gauges()
+        start = time.perf_counter()
+        outcome = 'error'
+        try:
+            with time_stage('inference', model_type='sklearn'):
+                result = await asyncio.wait_for(self._execute(fn, args), timeout)
+            outcome = 'ok'
+            return result
+        except asyncio.TimeoutError:
+            outcome = 'timeout'
+            logger.warning(f"Compute task {name} timed out after {timeout}s, worker terminated")
+            raise ComputeTimeout(f"{name} did not finish within {timeout}s") from None
+        except asyncio.CancelledError:
+            outcome = 'cancelled'
+            raise
+        finally:
+            self._inflight -= 1
+            self._update_gauges()
+            self.stats[_OUTCOME_STATS[outcome]] += 1
+            COMPUTE_TASKS.labels(task=name, outcome=outcome).inc()
+            COMPUTE_TASK_DURATION.labels(task=name).observe(time.perf_counter() - start)
+
+    async def run_method(self, module: str, instance: Optional[str], method: str, *args,
+                         timeout: Optional[float] = None, **kwargs) -> Any:
+        """Run module.instance.method(*args, **kwargs) in a worker, on the worker's own engine"""
+        return await self.run(call_global, module, instance, method, args, kwargs,
+                              timeout=timeout, task_name=f"{instance or module}.{method}")
+
+    def shutdown(self):
+        """Stop every worker process"""
+        with self._live_lock:
+            workers, self._live = list(self._live), set()
+        for worker in workers:
+            worker.stop()
+
+    def info(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            'workers': self.workers,
+            'live_workers': len(self._live),
+            'inflight': self._inflight,
+            'queued': self._waiting,
+            'max_inflight': self.max_inflight,
+            'timeout': self.timeout
+        }
+
+# Global instance
+compute_executor = ComputeExecutor()
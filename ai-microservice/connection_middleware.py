@@ -1,86 +1,101 @@
 """
 Connection handling middleware for FastAPI to prevent H11 protocol errors
+Pure ASGI: request timeout, error mapping and Prometheus metrics in one pass, without the
+per-request task and body streams of BaseHTTPMiddleware. Connections stay keep-alive.
 """
 
 import asyncio
+import json
 import logging
-from fastapi import Request, Response
-from fastapi.responses import JSONResponse
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.types import ASGIApp
+import os
+import time
 import traceback
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from monitoring import begin_request, end_request, record_request
 
 logger = logging.getLogger(__name__)
 
-class ConnectionHandlingMiddleware(BaseHTTPMiddleware):
-    """Middleware to handle connection errors gracefully"""
-    
-    def __init__(self, app: ASGIApp):
-        super().__init__(app)
-    
-    async def dispatch(self, request: Request, call_next):
-        try:
-            # Set timeout for request processing
-            response = await asyncio.wait_for(
-                call_next(request), 
-                timeout=60.0  # 60 second timeout
-            )
-            
-            # Ensure proper headers are set
-            if not hasattr(response, 'headers'):
-                return response
-            
-            # Add connection handling headers
-            response.headers["Connection"] = "close"
-            response.headers["Cache-Control"] = "no-cache"
-            
-            return response
-            
-        except asyncio.TimeoutError:
-            logger.warning(f"Request timeout for {request.url}")
-            return JSONResponse(
-                status_code=408,
-                content={"error": "Request timeout", "detail": "Request took too long to process"}
-            )
-        except ConnectionError as e:
-            logger.error(f"Connection error for {request.url}: {e}")
-            return JSONResponse(
-                status_code=503,
-                content={"error": "Connection error", "detail": "Service temporarily unavailable"}
-            )
-        except Exception as e:
-            logger.error(f"Unexpected error for {request.url}: {e}")
-            logger.error(traceback.format_exc())
-            return JSONResponse(
-                status_code=500,
-                content={"error": "Internal server error", "detail": str(e)}
-            )
+# Seconds an endpoint may take to start its response
+REQUEST_TIMEOUT = float(os.getenv('REQUEST_TIMEOUT', 60.0))
+
+def _json_body(status_code: int, content: dict) -> tuple:
+    body = json.dumps(content).encode('utf-8')
+    headers = [
+        (b'content-type', b'application/json'),
+        (b'content-length', str(len(body)).encode('latin-1')),
+        (b'cache-control', b'no-cache'),
+    ]
+    return {'type': 'http.response.start', 'status': status_code, 'headers': headers}, \
+        {'type': 'http.response.body', 'body': body}
+
+class ConnectionHandlingMiddleware:
+    """Map timeouts and unhandled errors to JSON responses and record request metrics
+
+    The timeout covers the time until the response starts, like the former
+    BaseHTTPMiddleware version: streamed bodies are not cut off. Errors raised after the
+    response has started cannot be turned into a new response and are re-raised so the
+    server closes that connection.
+    """
+
+    def __init__(self, app: ASGIApp, timeout: float = REQUEST_TIMEOUT):
+        self.app = app
+        self.timeout = timeout
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        start_time = time.perf_counter()
+        state = {'status': 500, 'started': False}
+        deadline = None
+        token = begin_request(scope)
+
+        async def send_wrapper(message: Message):
+            if message['type'] == 'http.response.start':
+                state['status'] = message['status']
+                state['started'] = True
+                if deadline is not None:
+                    deadline.reschedule(None)
+                message.setdefault('headers', [])
+                headers = message['headers']
+                if not any(name.lower() == b'cache-control' for name, _ in headers):
+                    headers.append((b'cache-control', b'no-cache'))
+            await send(message)
 
-class ResponseCleanupMiddleware(BaseHTTPMiddleware):
-    """Middleware to ensure proper response cleanup"""
-    
-    async def dispatch(self, request: Request, call_next):
         try:
-            response = await call_next(request)
-            
-            # Ensure response is properly formed
-            if hasattr(response, 'status_code') and response.status_code >= 400:
-                # Log error responses
-                logger.warning(f"Error response {response.status_code} for {request.url}")
-            
-            return response
-            
+            if hasattr(asyncio, 'timeout'):
+                async with asyncio.timeout(self.timeout) as deadline:
+                    await self.app(scope, receive, send_wrapper)
+            else:
+                await asyncio.wait_for(self.app(scope, receive, send_wrapper), timeout=self.timeout)
         except Exception as e:
-            logger.error(f"Response cleanup error: {e}")
-            # Return a safe fallback response
-            return JSONResponse(
-                status_code=500,
-                content={"error": "Response processing error"},
-                headers={"Connection": "close"}
-            )
+            if state['started']:
+                raise
+            state['status'], content = self._error_content(scope, e)
+            start, body = _json_body(state['status'], content)
+            await send(start)
+            await send(body)
+        finally:
+            if state['status'] >= 400:
+                logger.warning(f"Error response {state['status']} for {scope.get('path')}")
+            record_request(scope, state['status'], time.perf_counter() - start_time)
+            end_request(token)
+
+    @staticmethod
+    def _error_content(scope: Scope, error: Exception) -> tuple:
+        if isinstance(error, asyncio.TimeoutError):
+            logger.warning(f"Request timeout for {scope.get('path')}")
+            return 408, {"error": "Request timeout", "detail": "Request took too long to process"}
+        if isinstance(error, ConnectionError):
+            logger.error(f"Connection error for {scope.get('path')}: {error}")
+            return 503, {"error": "Connection error", "detail": "Service temporarily unavailable"}
+        logger.error(f"Unexpected error for {scope.get('path')}: {error}")
+        logger.error(traceback.format_exc())
+        return 500, {"error": "Internal server error", "detail": str(error)}
 
 def add_connection_middleware(app):
     """Add connection handling middleware to FastAPI app"""
     app.add_middleware(ConnectionHandlingMiddleware)
-    app.add_middleware(ResponseCleanupMiddleware)
-    return app
\ No newline at end of file
+    return app
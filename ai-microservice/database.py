@@ -1,23 +1,220 @@
 import asyncpg
 import asyncio
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Iterable, Optional, Tuple
+from collections import OrderedDict
 from datetime import datetime
 import json
 import logging
 import os
+import time
 from functools import wraps
 
+from monitoring import clear_request_context, time_stage
+
 logger = logging.getLogger(__name__)
 
+# How long a loaded agent metrics snapshot is reused across requests (seconds)
+AGENT_METRICS_TTL = float(os.getenv('AGENT_METRICS_TTL', 30))
+
+# Recently looked-up complaints kept for /classify context (seconds, entries)
+COMPLAINT_CACHE_TTL = float(os.getenv('COMPLAINT_CACHE_TTL', 60))
+COMPLAINT_CACHE_SIZE = int(os.getenv('COMPLAINT_CACHE_SIZE', 1024))
+
+# Open bordereaux with SLA timing, shared by the list and streaming readers
+BORDEREAU_SLA_QUERY = """
+        SELECT b.id, b.reference, b."dateReception", b."dateCloture", b."delaiReglement",
+               b.statut, b."assignedToUserId", b."nombreBS", b.priority,
+               c.name as client_name,
+               u."fullName" as assigned_to_name,
+               CASE 
+                   WHEN b."dateCloture" IS NULL THEN 
+                       EXTRACT(EPOCH FROM (NOW() - b."dateReception"))/86400
+                   ELSE 
+                       EXTRACT(EPOCH FROM (b."dateCloture" - b."dateReception"))/86400
+               END as processing_days,
+               CASE 
+                   WHEN b."dateCloture" IS NULL THEN 
+                       b."delaiReglement" - EXTRACT(EPOCH FROM (NOW() - b."dateReception"))/86400
+                   ELSE 0
+               END as days_remaining
+        FROM "Bordereau" b
+        LEFT JOIN "Client" c ON b."clientId" = c.id
+        LEFT JOIN "User" u ON b."assignedToUserId" = u.id
+        WHERE b.statut NOT IN ('CLOTURE')
+        ORDER BY b."dateReception" DESC
+"""
+
+COMPLAINT_COLUMNS = """
+    r.id, r.description, r."createdAt" as "createdAt", r."createdAt" as created_at,
+    r.status, r."assignedToId" as team_id, r."assignedToId" as "assignedToId",
+    r."processId" as process_id, r."clientId" as client_id,
+    r.type, r.severity, r.department, r.priority,
+    c.name as client_name
+"""
+
+# Statuses counted as resolved by the complaint handling ranking
+RESOLVED_COMPLAINT_STATUSES = ['resolved', 'closed']
+
+def build_complaint_filters(since: datetime = None, until: datetime = None, client_id: str = None,
+                            statuses: List[str] = None, types: List[str] = None,
+                            params: List = None) -> Tuple[str, List]:
+    """WHERE clause and positional parameters for the Reclamation predicates"""
+    params = params if params is not None else []
+    clauses = []
+    if since is not None:
+        params.append(since)
+        clauses.append(f'r."createdAt" >= ${len(params)}')
+    if until is not None:
+        params.append(until)
+        clauses.append(f'r."createdAt" < ${len(params)}')
+    if client_id is not None:
+        params.append(str(client_id))
+        clauses.append(f'r."clientId" = ${len(params)}')
+    if statuses:
+        params.append(list(statuses))
+        clauses.append(f'r.status = ANY(${len(params)}::text[])')
+    if types:
+        params.append(list(types))
+        clauses.append(f'r.type = ANY(${len(params)}::text[])')
+    where = ('WHERE ' + ' AND '.join(clauses)) if clauses else ''
+    return where, params
+
+def encode_complaint_cursor(row: Dict) -> str:
+    """Keyset cursor for the page that follows row"""
+    return f"{row['createdAt'].isoformat()}|{row['id']}"
+
+def decode_complaint_cursor(cursor: str) -> Tuple[datetime, str]:
+    created_at, _, complaint_id = cursor.partition('|')
+    if not complaint_id:
+        raise ValueError(f"Invalid complaints cursor: {cursor}")
+    return datetime.fromisoformat(created_at), complaint_id
+
+class AgentMetricsSnapshot:
+    """Agent performance metrics loaded once and indexed by agent id"""
+    
+    def __init__(self, agents: List[Dict]):
+        self.agents = agents
+        self.by_id = {agent['id']: agent for agent in agents}
+        self.loaded_at = time.monotonic()
+    
+    def get(self, agent_id) -> Optional[Dict]:
+        return self.by_id.get(agent_id)
+    
+    def age(self) -> float:
+        return time.monotonic() - self.loaded_at
+
+class TTLCache:
+    """Small LRU cache whose entries expire after ttl seconds"""
+    
+    def __init__(self, ttl: float, max_size: int):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries: 'OrderedDict[Any, Tuple[float, Any]]' = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+    
+    def get(self, key) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None or time.monotonic() - entry[0] > self.ttl:
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+    
+    def put(self, key, value):
+        self._entries[key] = (time.monotonic(), value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+    
+    def invalidate(self, key=None):
+        if key is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(key, None)
+
+class InstrumentedConnection:
+    """asyncpg connection proxy that times every query as the db_query stage"""
+    
+    def __init__(self, conn):
+        self._conn = conn
+    
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+    
+    async def _timed(self, method, *args, **kwargs):
+        with time_stage('db_query'):
+            return await method(*args, **kwargs)
+    
+    def fetch(self, *args, **kwargs):
+        return self._timed(self._conn.fetch, *args, **kwargs)
+    
+    def fetchrow(self, *args, **kwargs):
+        return self._timed(self._conn.fetchrow, *args, **kwargs)
+    
+    def fetchval(self, *args, **kwargs):
+        return self._timed(self._conn.fetchval, *args, **kwargs)
+    
+    def execute(self, *args, **kwargs):
+        return self._timed(self._conn.execute, *args, **kwargs)
+    
+    def executemany(self, *args, **kwargs):
+        return self._timed(self._conn.executemany, *args, **kwargs)
+
+class _InstrumentedAcquire:
+    """Awaitable / async context manager like asyncpg's pool.acquire(), timing the wait"""
+    
+    def __init__(self, pool, timeout):
+        self._pool = pool
+        self._timeout = timeout
+        self._conn = None
+    
+    async def _acquire(self) -> InstrumentedConnection:
+        with time_stage('db_acquire'):
+            conn = await self._pool.acquire(timeout=self._timeout)
+        return InstrumentedConnection(conn)
+    
+    def __await__(self):
+        return self._acquire().__await__()
+    
+    async def __aenter__(self) -> InstrumentedConnection:
+        self._conn = await self._acquire()
+        return self._conn
+    
+    async def __aexit__(self, *exc_info):
+        conn, self._conn = self._conn, None
+        await self._pool.release(conn._conn)
+
+class InstrumentedPool:
+    """asyncpg pool wrapper: acquisition is timed as db_acquire, queries as db_query"""
+    
+    def __init__(self, pool):
+        self._pool = pool
+    
+    def __getattr__(self, name):
+        return getattr(self._pool, name)
+    
+    def acquire(self, *, timeout: float = None) -> _InstrumentedAcquire:
+        return _InstrumentedAcquire(self._pool, timeout)
+    
+    async def release(self, conn, *, timeout: float = None):
+        await self._pool.release(getattr(conn, '_conn', conn), timeout=timeout)
+
 class DatabaseManager:
     def __init__(self, connection_string: str):
         self.connection_string = connection_string
         self.pool = None
+        self._agent_snapshot = None
+        self._agent_snapshot_lock = asyncio.Lock()
+        self.complaint_cache = TTLCache(COMPLAINT_CACHE_TTL, COMPLAINT_CACHE_SIZE)
     
     async def initialize(self):
         """Initialize database connection pool with better error handling"""
         try:
-            self.pool = await asyncpg.create_pool(
+            pool = await asyncpg.create_pool(
                 self.connection_string,
                 min_size=2,
                 max_size=10,
@@ -29,6 +226,7 @@ class DatabaseManager:
                     'tcp_keepalives_count': '3'
                 }
             )
+            self.pool = InstrumentedPool(pool)
             logger.info("Database connection pool initialized")
         except Exception as e:
             logger.error(f"Failed to initialize database: {e}")
@@ -71,6 +269,182 @@ class DatabaseManager:
             logger.error(f"Error fetching complaints: {e}")
             return []
     
+    async def get_complaint_by_id(self, complaint_id: str) -> Optional[Dict]:
+        """One complaint by primary key, served from the complaint cache when recent"""
+        complaints = await self.get_complaints_by_ids([complaint_id])
+        return complaints.get(str(complaint_id))
+    
+    async def get_complaints_by_ids(self, complaint_ids: Iterable[str]) -> Dict[str, Dict]:
+        """Complaints by primary key as {id: complaint}; ids not found are left out
+        
+        Cached complaints are returned directly; the rest are fetched in one query.
+        """
+        found = {}
+        missing = []
+        for complaint_id in dict.fromkeys(str(i) for i in complaint_ids):
+            cached = self.complaint_cache.get(complaint_id)
+            if cached is not None:
+                found[complaint_id] = dict(cached)
+            else:
+                missing.append(complaint_id)
+        
+        if not missing:
+            return found
+        if not self.pool:
+            logger.warning("Database pool not available")
+            return found
+        
+        query = f"""
+        SELECT {COMPLAINT_COLUMNS}
+        FROM "Reclamation" r
+        LEFT JOIN "Client" c ON r."clientId" = c.id
+        WHERE r.id = ANY($1::text[])
+        """
+        try:
+            async with self.pool.acquire() as conn:
+                rows = await asyncio.wait_for(conn.fetch(query, missing), timeout=10)
+            for row in rows:
+                complaint = dict(row)
+                complaint_id = str(complaint['id'])
+                self.complaint_cache.put(complaint_id, complaint)
+                found[complaint_id] = dict(complaint)
+        except asyncio.TimeoutError:
+            logger.error("Complaint lookup timeout")
+        except Exception as e:
+            logger.error(f"Error fetching complaints by id: {e}")
+        return found
+    
+    async def query_complaints(self, since: datetime = None, until: datetime = None, client_id: str = None,
+                               statuses: List[str] = None, types: List[str] = None,
+                               limit: int = 500, cursor: str = None) -> Dict[str, Any]:
+        """One page of complaints matching the filters, newest first
+        
+        Pages are keyed on ("createdAt", id): pass the returned next_cursor to get the
+        following page. next_cursor is None on the last page.
+        """
+        if not self.pool:
+            logger.warning("Database pool not available")
+            return {'complaints': [], 'next_cursor': None}
+        
+        where, params = build_complaint_filters(since, until, client_id, statuses, types)
+        if cursor:
+            cursor_created_at, cursor_id = decode_complaint_cursor(cursor)
+            params.extend([cursor_created_at, cursor_id])
+            keyset = f'(r."createdAt", r.id) < (${len(params) - 1}, ${len(params)})'
+            where = f'{where} AND {keyset}' if where else f'WHERE {keyset}'
+        params.append(limit)
+        
+        query = f"""
+        SELECT {COMPLAINT_COLUMNS}
+        FROM "Reclamation" r
+        LEFT JOIN "Client" c ON r."clientId" = c.id
+        {where}
+        ORDER BY r."createdAt" DESC, r.id DESC
+        LIMIT ${len(params)}
+        """
+        try:
+            async with self.pool.acquire() as conn:
+                rows = await asyncio.wait_for(conn.fetch(query, *params), timeout=30)
+            complaints = [dict(row) for row in rows]
+            next_cursor = encode_complaint_cursor(complaints[-1]) if complaints and len(complaints) == limit else None
+            return {'complaints': complaints, 'next_cursor': next_cursor}
+        except asyncio.TimeoutError:
+            logger.error("Complaints query timeout")
+            return {'complaints': [], 'next_cursor': None}
+        except Exception as e:
+            logger.error(f"Error querying complaints: {e}")
+            return {'complaints': [], 'next_cursor': None}
+    
+    async def get_complaint_aggregates(self, since: datetime = None, until: datetime = None, client_id: str = None,
+                                       statuses: List[str] = None, types: List[str] = None,
+                                       content_rules: List[Tuple[str, List[str]]] = None,
+                                       now: datetime = None) -> Dict[str, Any]:
+        """Counts behind the complaints intelligence report, computed in SQL
+        
+        content_rules ([(category, keywords)], first match wins) classify complaints whose
+        type is empty or UNKNOWN, mirroring classify_by_content. Returns the total, per
+        classified-type / severity / department / day counts, per-type recurrence stats,
+        (type, process) and (type, department) pairs, and per-handler resolution stats.
+        """
+        empty = {'total': 0}
+        if not self.pool:
+            logger.warning("Database pool not available")
+            return empty
+        
+        now = now or datetime.now()
+        where, params = build_complaint_filters(since, until, client_id, statuses, types)
+        
+        # Content classification as a CASE over parameterised LIKE patterns
+        cases = []
+        for category, keywords in content_rules or []:
+            likes = []
+            for keyword in keywords:
+                params.append(f'%{keyword}%')
+                likes.append(f'LOWER(r.description) LIKE ${len(params)}')
+            params.append(category)
+            cases.append(f"WHEN {' OR '.join(likes)} THEN ${len(params)}::text")
+        content_type = f"CASE {' '.join(cases)} ELSE 'AUTRE' END" if cases else "'AUTRE'"
+        params.append(now)
+        now_param = f'${len(params)}::timestamp'
+        params.append(RESOLVED_COMPLAINT_STATUSES)
+        resolved_param = f'${len(params)}::text[]'
+        
+        # Every parameter is referenced here, so each query below can reuse the same list
+        filtered = f"""
+        WITH f AS (
+            SELECT r.type, r.severity, r.department, r."processId" as process_id,
+                   r."assignedToId" as assigned_to, r."createdAt" as created_at,
+                   CASE WHEN COALESCE(r.type, '') IN ('', 'UNKNOWN') THEN {content_type} ELSE r.type END as classified_type,
+                   ({now_param} - r."createdAt" < INTERVAL '8 days') as recent,
+                   (r.status = ANY({resolved_param})) as resolved,
+                   FLOOR(EXTRACT(EPOCH FROM {now_param} - r."createdAt") / 86400) as age_days
+            FROM "Reclamation" r
+            {where}
+        )
+        """
+        queries = {
+            'total': 'SELECT COUNT(*) as count FROM f',
+            'categories': 'SELECT classified_type as key, COUNT(*) as count FROM f GROUP BY 1',
+            'severity': 'SELECT severity as key, COUNT(*) as count FROM f GROUP BY 1',
+            'department': 'SELECT department as key, COUNT(*) as count FROM f GROUP BY 1',
+            'daily': "SELECT TO_CHAR(created_at, 'YYYY-MM-DD') as key, COUNT(*) as count FROM f GROUP BY 1",
+            'recurrence': """
+                SELECT type as key, COUNT(*) as count,
+                       AVG(gap_days) as avg_interval_days,
+                       COUNT(*) FILTER (WHERE recent) as recent_count
+                FROM (
+                    SELECT type, created_at, recent,
+                           FLOOR(EXTRACT(EPOCH FROM created_at - LAG(created_at) OVER (PARTITION BY type ORDER BY created_at)) / 86400) as gap_days
+                    FROM f
+                ) t
+                GROUP BY 1
+            """,
+            'type_process': 'SELECT type as key, process_id, COUNT(*) as count FROM f WHERE process_id IS NOT NULL GROUP BY 1, 2',
+            'type_department': 'SELECT type as key, department, COUNT(*) as count FROM f GROUP BY 1, 2',
+            'handlers': """
+                SELECT assigned_to as key, COUNT(*) as count,
+                       COUNT(*) FILTER (WHERE resolved) as resolved_count,
+                       COALESCE(SUM(age_days) FILTER (WHERE resolved), 0) as resolution_days
+                FROM f WHERE assigned_to IS NOT NULL GROUP BY 1
+            """
+        }
+        
+        try:
+            aggregates = {}
+            async with self.pool.acquire() as conn:
+                async with conn.transaction(readonly=True, isolation='repeatable_read'):
+                    for name, select in queries.items():
+                        rows = await asyncio.wait_for(conn.fetch(filtered + select, *params), timeout=60)
+                        aggregates[name] = [dict(row) for row in rows]
+            aggregates['total'] = aggregates['total'][0]['count'] if aggregates['total'] else 0
+            return aggregates
+        except asyncio.TimeoutError:
+            logger.error("Complaint aggregates query timeout")
+            return empty
+        except Exception as e:
+            logger.error(f"Error aggregating complaints: {e}")
+            return empty
+    
     async def get_agent_performance_metrics(self) -> List[Dict]:
         """Get real agent performance data for assignment AI"""
         query = """
@@ -122,29 +496,76 @@ class DatabaseManager:
             logger.error(f"Error fetching agent metrics: {e}")
             return []
     
+    async def get_agent_performance_windows(self, days: int = 90, window_days: int = 30,
+                                            limit: int = 50000) -> List[Dict]:
+        """Per-agent performance over rolling window_days windows ending on each of the last days
+        
+        Fields are computed as the backend computes the records it sends to /anomaly_detection,
+        as of each window end, over the bordereaux the agent handles that were created in the
+        window: throughput (count), processing_time (mean age in hours), resource_utilization
+        (throughput / capacity, at most 1) and sla_compliance (share not older than their
+        settlement delay). days=0 gives only the current window. Past windows use today's
+        handler of each bordereau, the only assignment kept.
+        """
+        query = """
+        WITH agents AS (
+            SELECT id, capacity FROM "User"
+            WHERE role IN ('GESTIONNAIRE', 'CHEF_EQUIPE') AND active = true
+        ), window_ends AS (
+            SELECT generate_series(NOW() - INTERVAL '1 day' * $1, NOW(), INTERVAL '1 day') AS window_end
+        )
+        SELECT a.id as agent_id, w.window_end,
+               COUNT(b.id) as throughput,
+               AVG(EXTRACT(EPOCH FROM (w.window_end - b."createdAt"))/3600) as processing_time,
+               LEAST(1.0, COUNT(b.id)::float / COALESCE(NULLIF(a.capacity, 0), 20)) as resource_utilization,
+               AVG(CASE WHEN EXTRACT(EPOCH FROM (w.window_end - b."createdAt"))/86400 <= b."delaiReglement"
+                        THEN 1.0 ELSE 0.0 END) as sla_compliance
+        FROM agents a
+        CROSS JOIN window_ends w
+        LEFT JOIN "Bordereau" b ON b."currentHandlerId" = a.id
+             AND b."createdAt" > w.window_end - INTERVAL '1 day' * $2
+             AND b."createdAt" <= w.window_end
+        GROUP BY a.id, w.window_end
+        ORDER BY w.window_end DESC
+        LIMIT $3
+        """
+        if not self.pool:
+            return []
+        try:
+            async with self.pool.acquire() as conn:
+                rows = await conn.fetch(query, days, window_days, limit)
+                return [{
+                    'id': row['agent_id'],
+                    'window_end': row['window_end'].isoformat(),
+                    'processing_time': float(row['processing_time'] or 0),
+                    'throughput': int(row['throughput'] or 0),
+                    'resource_utilization': float(row['resource_utilization'] or 0),
+                    'sla_compliance': float(row['sla_compliance']) if row['sla_compliance'] is not None else 1.0
+                } for row in rows]
+        except Exception as e:
+            logger.error(f"Error fetching agent performance windows: {e}")
+            return []
+    
+    async def get_agent_metrics_snapshot(self, max_age: float = None) -> AgentMetricsSnapshot:
+        """Get a shared agent metrics snapshot, reloading it at most once per TTL"""
+        max_age = AGENT_METRICS_TTL if max_age is None else max_age
+        snapshot = self._agent_snapshot
+        if snapshot is not None and snapshot.age() < max_age:
+            return snapshot
+        
+        # Concurrent requests wait for a single reload instead of each running the aggregate
+        async with self._agent_snapshot_lock:
+            snapshot = self._agent_snapshot
+            if snapshot is None or snapshot.age() >= max_age:
+                snapshot = AgentMetricsSnapshot(await self.get_agent_performance_metrics())
+                # Empty results usually mean the DB is down - don't pin them for a whole TTL
+                if snapshot.agents:
+                    self._agent_snapshot = snapshot
+            return snapshot
+    
     async def get_bordereau_with_sla_data(self, limit: int = 100) -> List[Dict]:
         """Get bordereaux with real SLA calculation data"""
-        query = """
-        SELECT b.id, b.reference, b."dateReception", b."dateCloture", b."delaiReglement",
-               b.statut, b."assignedToUserId", b."nombreBS", b.priority,
-               c.name as client_name,
-               u."fullName" as assigned_to_name,
-               CASE 
-                   WHEN b."dateCloture" IS NULL THEN 
-                       EXTRACT(EPOCH FROM (NOW() - b."dateReception"))/86400
-                   ELSE 
-                       EXTRACT(EPOCH FROM (b."dateCloture" - b."dateReception"))/86400
-               END as processing_days,
-               CASE 
-                   WHEN b."dateCloture" IS NULL THEN 
-                       b."delaiReglement" - EXTRACT(EPOCH FROM (NOW() - b."dateReception"))/86400
-                   ELSE 0
-               END as days_remaining
-        FROM "Bordereau" b
-        LEFT JOIN "Client" c ON b."clientId" = c.id
-        LEFT JOIN "User" u ON b."assignedToUserId" = u.id
-        WHERE b.statut NOT IN ('CLOTURE')
-        ORDER BY b."dateReception" DESC
+        query = BORDEREAU_SLA_QUERY + """
         LIMIT $1
         """
         try:
@@ -155,6 +576,31 @@ class DatabaseManager:
             logger.error(f"Error fetching bordereau SLA data: {e}")
             return []
     
+    async def iter_bordereau_with_sla_data(self, chunk_size: int = 500):
+        """Stream every open bordereau with SLA data in chunks from a server-side cursor
+        
+        Unlike the list methods, errors are logged and re-raised so a streaming caller
+        can tell a truncated result from a complete one.
+        """
+        if not self.pool:
+            logger.warning("Database pool not available")
+            return
+        try:
+            async with self.pool.acquire() as conn:
+                # asyncpg cursors only live inside a transaction
+                async with conn.transaction(readonly=True):
+                    chunk = []
+                    async for row in conn.cursor(BORDEREAU_SLA_QUERY, prefetch=chunk_size):
+                        chunk.append(dict(row))
+                        if len(chunk) >= chunk_size:
+                            yield chunk
+                            chunk = []
+                    if chunk:
+                        yield chunk
+        except Exception as e:
+            logger.error(f"Error streaming bordereau SLA data: {e}")
+            raise
+    
     async def get_client_historical_data(self, client_id: int = None, days: int = 90) -> List[Dict]:
         """Get historical data for forecasting"""
         try:
@@ -635,6 +1081,142 @@ async def get_db_manager():
         await db_manager.initialize()
     return db_manager
 
+# Write-behind settings for AI output persistence
+AI_OUTPUT_QUEUE_SIZE = int(os.getenv('AI_OUTPUT_QUEUE_SIZE', 5000))
+AI_OUTPUT_BATCH_SIZE = int(os.getenv('AI_OUTPUT_BATCH_SIZE', 200))
+AI_OUTPUT_FLUSH_INTERVAL = float(os.getenv('AI_OUTPUT_FLUSH_INTERVAL', 2.0))
+# Queued by drain() to stop the writer task after it has flushed
+_STOP_WRITER = object()
+
+class AIOutputWriter:
+    """Bounded write-behind queue that persists AI outputs in batches
+    
+    Requests only enqueue rows; a background task flushes them to "AiOutput" and
+    "AILearning" with executemany when a batch fills up or the flush interval expires.
+    When the queue is full new rows are dropped and counted instead of slowing requests.
+    """
+    
+    def __init__(self, max_queue: int = AI_OUTPUT_QUEUE_SIZE, batch_size: int = AI_OUTPUT_BATCH_SIZE,
+                 flush_interval: float = AI_OUTPUT_FLUSH_INTERVAL):
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue = None
+        self._task = None
+        self.stats = {'queued': 0, 'written': 0, 'dropped': 0, 'failed': 0, 'batches': 0}
+    
+    def _ensure_started(self):
+        if self._task is None or self._task.done():
+            if self.queue is None:
+                self.queue = asyncio.Queue(maxsize=self.max_queue)
+            self._task = asyncio.get_running_loop().create_task(self._run())
+    
+    def submit(self, endpoint: str, input_data: Dict, result: Dict, user_id: str, confidence: float = None) -> bool:
+        """Enqueue one AI output without waiting for the database"""
+        self._ensure_started()
+        try:
+            self.queue.put_nowait((endpoint, input_data, result, user_id, confidence, datetime.utcnow()))
+            self.stats['queued'] += 1
+            return True
+        except asyncio.QueueFull:
+            self.stats['dropped'] += 1
+            if self.stats['dropped'] % 100 == 1:
+                logger.warning(f"AI output queue full, {self.stats['dropped']} outputs dropped so far")
+            return False
+    
+    async def _run(self):
+        clear_request_context()
+        while True:
+            item = await self.queue.get()
+            if item is _STOP_WRITER:
+                return
+            batch = [item]
+            stopping = False
+            deadline = asyncio.get_running_loop().time() + self.flush_interval
+            while len(batch) < self.batch_size:
+                timeout = deadline - asyncio.get_running_loop().time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self.queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if item is _STOP_WRITER:
+                    stopping = True
+                    break
+                batch.append(item)
+            # Flush what was collected before honouring a stop, so drain() loses nothing
+            await self._flush(batch)
+            if stopping:
+                return
+    
+    async def drain(self):
+        """Flush everything still queued (used on shutdown)"""
+        if self.queue is None:
+            return
+        if self._task is not None and not self._task.done():
+            # The sentinel queues behind pending rows; the writer flushes them and its batch, then exits
+            await self.queue.put(_STOP_WRITER)
+            await self._task
+        self._task = None
+        while not self.queue.empty():
+            batch = []
+            while not self.queue.empty() and len(batch) < self.batch_size:
+                batch.append(self.queue.get_nowait())
+            await self._flush(batch)
+    
+    async def _flush(self, batch: List[tuple]):
+        output_rows = []
+        learning_rows = []
+        for endpoint, input_data, result, user_id, confidence, created_at in batch:
+            try:
+                input_json = json.dumps(input_data)
+                result_json = json.dumps(result)
+                expected_json = json.dumps(result.get('expected', {}) if isinstance(result, dict) else {})
+            except (TypeError, ValueError) as e:
+                logger.debug(f"AI output for {endpoint} not serializable: {e}")
+                self.stats['failed'] += 1
+                continue
+            output_rows.append((endpoint, input_json, result_json, user_id, confidence, created_at))
+            learning_rows.append((endpoint, input_json, expected_json, result_json, confidence or 0.0, user_id, created_at))
+        
+        if not output_rows:
+            return
+        try:
+            db = await get_db_manager()
+            if not db.pool:
+                self.stats['failed'] += len(output_rows)
+                return
+            async with db.pool.acquire() as conn:
+                table_exists = await conn.fetchval("""
+                SELECT EXISTS (
+                    SELECT FROM information_schema.tables 
+                    WHERE table_name = 'AiOutput'
+                )
+                """)
+                if not table_exists:
+                    logger.info(f"AI outputs logged: {len(output_rows)} (AiOutput table missing)")
+                    return
+                await conn.executemany("""
+                INSERT INTO "AiOutput" (endpoint, "inputData", result, "userId", confidence, "createdAt")
+                VALUES ($1, $2, $3, $4, $5, $6)
+                """, output_rows)
+                try:
+                    await conn.executemany("""
+                    INSERT INTO "AILearning" ("analysisType", "inputPattern", "expectedOutput", "actualOutput", "accuracy", "userId", "createdAt")
+                    VALUES ($1, $2, $3, $4, $5, $6, $7)
+                    """, learning_rows)
+                except Exception as e:
+                    logger.debug(f"Learning data save failed: {e}")
+            self.stats['written'] += len(output_rows)
+            self.stats['batches'] += 1
+            logger.debug(f"AI output batch saved: {len(output_rows)} rows")
+        except Exception as e:
+            self.stats['failed'] += len(output_rows)
+            logger.debug(f"AI output batch save failed: {e}")
+
+ai_output_writer = AIOutputWriter()
+
 async def save_ai_output_global(endpoint: str, input_data: Dict, result: Dict, user_id: str, confidence: float = None):
     """Global function to save AI outputs from anywhere"""
     try:
@@ -0,0 +1,226 @@
+"""
+Prophet Forecast Model Cache
+Keeps fitted Prophet models per series (client, trend feed) so forecasts are only refit
+when new daily rows arrive, warm-starts refits from the previous parameters and runs
+fits off the event loop - in a thread, or in a process pool for multi-client runs.
+"""
+
+import asyncio
+import hashlib
+import time
+from collections import OrderedDict
+from concurrent.futures import Executor
+from typing import Any, Callable, Dict, Optional, Tuple
+import logging
+import os
+
+import numpy as np
+import pandas as pd
+
+from monitoring import FORECAST_CACHE_EVENTS
+
+logger = logging.getLogger(__name__)
+
+# A fitted model is reused until new daily rows arrive or it is older than this (nightly refit)
+FORECAST_MODEL_MAX_AGE = float(os.getenv('FORECAST_MODEL_MAX_AGE', 24 * 3600))
+FORECAST_CACHE_MAX_MODELS = int(os.getenv('FORECAST_CACHE_MAX_MODELS', 256))
+FORECAST_WARM_START = os.getenv('FORECAST_WARM_START', 'true').lower() == 'true'
+
+def data_fingerprint(df: pd.DataFrame) -> str:
+    """Stable hash of a Prophet training frame (ds, y)"""
+    hashed = pd.util.hash_pandas_object(df[['ds', 'y']], index=False).values
+    return hashlib.sha1(hashed.tobytes()).hexdigest()
+
+def stan_init(model) -> Dict[str, Any]:
+    """Fitted parameters of a Prophet model, in the form accepted by fit(init=...)"""
+    params = {}
+    for name in ['k', 'm', 'sigma_obs']:
+        params[name] = model.params[name][0][0]
+    for name in ['delta', 'beta']:
+        params[name] = model.params[name][0]
+    return params
+
+def expected_changepoints(n_rows: int, n_changepoints: int = 25, changepoint_range: float = 0.8) -> int:
+    """Number of changepoints Prophet will use for n_rows of history"""
+    history_size = int(np.floor(n_rows * changepoint_range))
+    return max(0, min(n_changepoints, history_size - 1))
+
+def fit_prophet(build_model: Callable[[], Any], df: pd.DataFrame, periods: int,
+                init: Optional[Dict] = None, keep_model: bool = True) -> Dict[str, Any]:
+    """Fit a Prophet model and predict periods days ahead
+    
+    Picklable when build_model is a module-level function, so it can run in a worker
+    process; keep_model=False then returns only plain data (fitted models do not pickle
+    reliably), which is enough to warm-start the next refit.
+    """
+    start = time.time()
+    model = build_model()
+    if init is not None:
+        model.fit(df, init=init)
+    else:
+        model.fit(df)
+    future = model.make_future_dataframe(periods=periods)
+    forecast = model.predict(future)
+    return {
+        'model': model if keep_model else None,
+        'forecast': forecast,
+        'params': stan_init(model),
+        'n_changepoints': model.n_changepoints,
+        'fit_seconds': time.time() - start
+    }
+
+class ForecastEntry:
+    """One fitted model (or its parameters) and the forecasts computed from it"""
+
+    def __init__(self, fit: Dict[str, Any], config: Tuple, fingerprint: str, n_rows: int, last_ds):
+        self.model = fit['model']
+        self.params = fit['params']
+        self.n_changepoints = fit['n_changepoints']
+        self.config = config
+        self.fingerprint = fingerprint
+        self.n_rows = n_rows
+        self.last_ds = last_ds
+        self.fitted_at = time.time()
+        self.forecasts: Dict[int, pd.DataFrame] = {}
+
+    def age(self) -> float:
+        return time.time() - self.fitted_at
+
+class ForecastModelCache:
+    """LRU cache of fitted Prophet models keyed by series
+
+    A lookup is served from the cached model while the series has the same model
+    configuration, the same number of daily rows and the same last day, and the model
+    is younger than max_age. Same-day updates (today's partial count) are served from
+    the cached forecast until new daily rows arrive or the nightly refit is due. Refits
+    start from the previous parameters when the parameter shapes still match.
+    Series whose key does not identify them (allow_stale=False) are only served when
+    the data itself is unchanged.
+    """
+
+    def __init__(self, max_models: int = FORECAST_CACHE_MAX_MODELS, max_age: float = FORECAST_MODEL_MAX_AGE,
+                 warm_start: bool = FORECAST_WARM_START):
+        self.max_models = max_models
+        self.max_age = max_age
+        self.warm_start = warm_start
+        self._entries: 'OrderedDict[str, ForecastEntry]' = OrderedDict()
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self.stats = {
+            'hits': 0,
+            'misses': 0,
+            'forecast_hits': 0,
+            'stale_served': 0,
+            'warm_starts': 0,
+            'cold_fits': 0,
+            'evictions': 0,
+            'fit_seconds': 0.0
+        }
+
+    def _record(self, event: str):
+        self.stats[event] += 1
+        FORECAST_CACHE_EVENTS.labels(event=event).inc()
+
+    def _is_fresh(self, entry: Optional[ForecastEntry], config: Tuple, df: pd.DataFrame,
+                  fingerprint: str, allow_stale: bool) -> bool:
+        return (
+            entry is not None
+            and entry.config == config
+            and entry.n_rows == len(df)
+            and entry.last_ds == df['ds'].max()
+            and entry.age() < self.max_age
+            and (allow_stale or entry.fingerprint == fingerprint)
+        )
+
+    def _warm_start_params(self, entry: Optional[ForecastEntry], config: Tuple, n_rows: int) -> Optional[Dict]:
+        if not self.warm_start or entry is None or entry.config != config:
+            return None
+        # Warm start only works when delta/beta keep their shapes
+        if entry.n_changepoints != expected_changepoints(n_rows):
+            return None
+        return entry.params
+
+    @staticmethod
+    def _predict(model, periods: int) -> pd.DataFrame:
+        future = model.make_future_dataframe(periods=periods)
+        return model.predict(future)
+
+    async def forecast(self, key: str, df: pd.DataFrame, config: Tuple, build_model: Callable[[], Any],
+                       periods: int, executor: Optional[Executor] = None,
+                       allow_stale: bool = True) -> Tuple[Any, pd.DataFrame]:
+        """Fitted model and its predict() frame for df extended by periods days
+
+        build_model must return an unfitted Prophet configured as described by config
+        (any hashable description of the constructor arguments and seasonalities).
+        With a process executor the fit runs in a worker and the returned model is None.
+        allow_stale=False treats any change in the data as a miss; use it when key is not
+        an id of the series (same-day updates are then refitted too).
+        """
+        lock = self._locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            loop = asyncio.get_running_loop()
+            entry = self._entries.get(key)
+            fingerprint = data_fingerprint(df)
+            fresh = self._is_fresh(entry, config, df, fingerprint, allow_stale)
+
+            if fresh and periods in entry.forecasts:
+                self._record('hits')
+                self._record('forecast_hits')
+                if entry.fingerprint != fingerprint:
+                    self._record('stale_served')
+                self._entries.move_to_end(key)
+                return entry.model, entry.forecasts[periods]
+
+            if fresh and entry.model is not None:
+                # New horizon on a cached in-process model: predict only
+                self._record('hits')
+                forecast = await loop.run_in_executor(None, self._predict, entry.model, periods)
+                entry.forecasts[periods] = forecast
+                self._entries.move_to_end(key)
+                return entry.model, forecast
+
+            self._record('misses')
+            init = self._warm_start_params(entry, config, len(df))
+            self._record('warm_starts' if init is not None else 'cold_fits')
+            fit = await loop.run_in_executor(
+                executor, fit_prophet, build_model, df, periods, init, executor is None
+            )
+            self.stats['fit_seconds'] += fit['fit_seconds']
+            entry = ForecastEntry(fit, config, fingerprint, len(df), df['ds'].max())
+            entry.forecasts[periods] = fit['forecast']
+            self._store(key, entry)
+            return entry.model, fit['forecast']
+
+    def _store(self, key: str, entry: ForecastEntry):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_models:
+            evicted_key, _ = self._entries.popitem(last=False)
+            self._locks.pop(evicted_key, None)
+            self._record('evictions')
+
+    def evict_expired(self) -> int:
+        """Drop models past max_age; returns how many were removed"""
+        expired = [key for key, entry in self._entries.items() if entry.age() >= self.max_age]
+        for key in expired:
+            self._entries.pop(key, None)
+        if expired:
+            logger.info(f"Evicted {len(expired)} expired forecast models")
+        return len(expired)
+
+    def invalidate(self, key: Optional[str] = None):
+        """Forget one series, or every series when key is None"""
+        if key is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(key, None)
+
+    def info(self) -> Dict[str, Any]:
+        lookups = self.stats['hits'] + self.stats['misses']
+        return {
+            **self.stats,
+            'cached_models': len(self._entries),
+            'hit_rate': round(self.stats['hits'] / lookups, 3) if lookups else 0.0
+        }
+
+# Global instance
+forecast_cache = ForecastModelCache()
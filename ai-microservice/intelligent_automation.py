@@ -10,6 +10,8 @@ from datetime import datetime, timedelta
 from collections import defaultdict
 import json
 
+from monitoring import time_stage
+
 logger = logging.getLogger(__name__)
 
 class SmartRoutingEngine:
@@ -176,11 +178,17 @@ class SmartRoutingEngine:
             logger.error(f"Routing model training failed: {e}")
             raise
     
-    async def suggest_optimal_assignment(self, bordereau_data: Dict, db_manager, available_agents: List[str] = None) -> Dict[str, Any]:
-        """Suggest optimal bordereau assignment using real ARS data"""
+    async def suggest_optimal_assignment(self, bordereau_data: Dict, db_manager, available_agents: List[str] = None,
+                                         agents: List[Dict] = None) -> Dict[str, Any]:
+        """Suggest optimal bordereau assignment using real ARS data
+        
+        Callers scoring many bordereaux can pass preloaded `agents` metrics to avoid
+        re-running the agent aggregate query for each one.
+        """
         try:
             # Get real agent performance data
-            agents = await db_manager.get_agent_performance_metrics()
+            if agents is None:
+                agents = await db_manager.get_agent_performance_metrics()
             if not agents:
                 return {
                     'bordereau_id': bordereau_data.get('id', 'unknown'),
@@ -201,42 +209,8 @@ class SmartRoutingEngine:
                 }
             
             # Calculate assignment scores based on real ARS factors
-            assignment_scores = []
-            
-            for agent in agents:
-                if available_agents and agent['username'] not in available_agents:
-                    continue
-                
-                # Real ARS scoring factors
-                rendement_score = self._calculate_rendement_score(agent)
-                disponibilite_score = self._calculate_disponibilite_score(agent)
-                complexite_match = self._calculate_complexite_match(agent, bordereau_data)
-                sla_urgency = self._calculate_sla_urgency(bordereau_data)
-                
-                # Combined ARS assignment score
-                total_score = (
-                    rendement_score * 0.3 +
-                    disponibilite_score * 0.3 +
-                    complexite_match * 0.25 +
-                    sla_urgency * 0.15
-                )
-                
-                # Predict completion time
-                estimated_hours = self._estimate_completion_time(agent, bordereau_data)
-                
-                assignment_scores.append({
-                    'agent_id': agent['id'],
-                    'agent_name': f"{agent.get('firstName', 'Agent')} {agent.get('lastName', 'ARS')}",
-                    'username': agent.get('username', 'agent@ars.com'),
-                    'role': agent.get('role', 'GESTIONNAIRE'),
-                    'total_score': float(total_score),
-                    'rendement_score': float(rendement_score),
-                    'disponibilite_score': float(disponibilite_score),
-                    'complexite_match': float(complexite_match),
-                    'estimated_completion_hours': float(estimated_hours),
-                    'confidence': 'high' if total_score > 0.8 else 'medium' if total_score > 0.6 else 'low',
-                    'reason_codes': self._generate_ars_reason_codes(agent, bordereau_data, total_score)
-                })
+            with time_stage('inference', model_type='rules'):
+                assignment_scores = self._score_agents(agents, bordereau_data, available_agents)
             
             # Sort by total score
             assignment_scores.sort(key=lambda x: x['total_score'], reverse=True)
@@ -259,6 +233,45 @@ class SmartRoutingEngine:
                 'assignment_reasoning': ['Erreur système - Impossible de générer une assignation']
             }
     
+    def _score_agents(self, agents: List[Dict], bordereau_data: Dict, available_agents: List[str] = None) -> List[Dict]:
+        """Assignment score of every eligible agent for one bordereau"""
+        assignment_scores = []
+        for agent in agents:
+            if available_agents and agent['username'] not in available_agents:
+                continue
+            
+            # Real ARS scoring factors
+            rendement_score = self._calculate_rendement_score(agent)
+            disponibilite_score = self._calculate_disponibilite_score(agent)
+            complexite_match = self._calculate_complexite_match(agent, bordereau_data)
+            sla_urgency = self._calculate_sla_urgency(bordereau_data)
+            
+            # Combined ARS assignment score
+            total_score = (
+                rendement_score * 0.3 +
+                disponibilite_score * 0.3 +
+                complexite_match * 0.25 +
+                sla_urgency * 0.15
+            )
+            
+            # Predict completion time
+            estimated_hours = self._estimate_completion_time(agent, bordereau_data)
+            
+            assignment_scores.append({
+                'agent_id': agent['id'],
+                'agent_name': f"{agent.get('firstName', 'Agent')} {agent.get('lastName', 'ARS')}",
+                'username': agent.get('username', 'agent@ars.com'),
+                'role': agent.get('role', 'GESTIONNAIRE'),
+                'total_score': float(total_score),
+                'rendement_score': float(rendement_score),
+                'disponibilite_score': float(disponibilite_score),
+                'complexite_match': float(complexite_match),
+                'estimated_completion_hours': float(estimated_hours),
+                'confidence': 'high' if total_score > 0.8 else 'medium' if total_score > 0.6 else 'low',
+                'reason_codes': self._generate_ars_reason_codes(agent, bordereau_data, total_score)
+            })
+        return assignment_scores
+    
     def _calculate_rendement_score(self, agent: Dict) -> float:
         """Calculate agent throughput score based on real performance"""
         total_bordereaux = agent.get('total_bordereaux', 0)
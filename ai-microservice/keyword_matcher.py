@@ -0,0 +1,272 @@
+"""
+Multi-pattern keyword matching for ARS text rules
+Aho–Corasick automaton: every keyword of every rule is found in one pass over the text,
+so matching cost depends on the text length and the hits, not on the number of keywords.
+"""
+
+from collections import deque
+from typing import Dict, Iterable, List, Optional, Tuple
+import logging
+import os
+import threading
+
+logger = logging.getLogger(__name__)
+
+class KeywordMatcher:
+    """Aho–Corasick matcher over labelled keywords
+
+    Matches have the same semantics as `keyword in text` (substring, case-sensitive), so
+    callers lower-case the text as before. A keyword can carry several labels (categories).
+    Keywords can be added at any time; failure links are rebuilt lazily on the next search.
+    """
+
+    def __init__(self, rules: Optional[Dict[str, Iterable[str]]] = None):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[int]] = [[]]
+        self._dict_link: List[int] = [-1]
+        self._patterns: List[str] = []
+        self._labels: List[set] = []
+        self._index: Dict[str, int] = {}
+        self._dirty = False
+        for label, keywords in (rules or {}).items():
+            self.add_many(keywords, label)
+
+    def __len__(self) -> int:
+        return len(self._patterns)
+
+    def __contains__(self, keyword: str) -> bool:
+        return keyword in self._index
+
+    def add(self, keyword: str, label: Optional[str] = None) -> bool:
+        """Add a keyword (optionally labelled); returns True if the keyword is new"""
+        if not keyword:
+            return False
+        pattern_id = self._index.get(keyword)
+        if pattern_id is not None:
+            if label is not None:
+                self._labels[pattern_id].add(label)
+            return False
+
+        node = 0
+        for char in keyword:
+            next_node = self._goto[node].get(char)
+            if next_node is None:
+                next_node = len(self._goto)
+                self._goto[node][char] = next_node
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+                self._dict_link.append(-1)
+            node = next_node
+
+        pattern_id = len(self._patterns)
+        self._patterns.append(keyword)
+        self._labels.append({label} if label is not None else set())
+        self._index[keyword] = pattern_id
+        self._out[node].append(pattern_id)
+        self._dirty = True
+        return True
+
+    def add_many(self, keywords: Iterable[str], label: Optional[str] = None) -> int:
+        """Add several keywords under one label; returns how many were new"""
+        return sum(1 for keyword in keywords if self.add(keyword, label))
+
+    def labels_of(self, keyword: str) -> set:
+        pattern_id = self._index.get(keyword)
+        return set(self._labels[pattern_id]) if pattern_id is not None else set()
+
+    def merged_with(self, keywords: Dict[str, set]) -> 'KeywordMatcher':
+        """A new, fully built matcher with this matcher's keywords followed by `keywords`
+
+        `keywords` maps each keyword to its label set. Label sets are shared with the
+        sources, so labels added while the merge is being built show up in the result.
+        """
+        merged = KeywordMatcher()
+        for source in (zip(self._patterns, self._labels), keywords.items()):
+            for keyword, labels in source:
+                if merged.add(keyword):
+                    merged._labels[merged._index[keyword]] = labels
+                else:
+                    merged._labels[merged._index[keyword]].update(labels)
+        merged._build()
+        return merged
+
+    def _build(self):
+        """Compute failure and output (dictionary suffix) links breadth-first"""
+        goto, fail, out, dict_link = self._goto, self._fail, self._out, self._dict_link
+        queue = deque()
+        for child in goto[0].values():
+            fail[child] = 0
+            dict_link[child] = -1
+            queue.append(child)
+
+        while queue:
+            node = queue.popleft()
+            for char, child in goto[node].items():
+                state = fail[node]
+                while state and char not in goto[state]:
+                    state = fail[state]
+                target = goto[state].get(char, 0)
+                fail[child] = target if target != child else 0
+                dict_link[child] = fail[child] if out[fail[child]] else dict_link[fail[child]]
+                queue.append(child)
+
+        self._dirty = False
+
+    def _iter_hits(self, text: str):
+        """Yield (end_index, pattern_id) for every occurrence in text"""
+        if self._dirty:
+            self._build()
+        goto, fail, out, dict_link = self._goto, self._fail, self._out, self._dict_link
+        node = 0
+        for position, char in enumerate(text):
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            hit_node = node if out[node] else dict_link[node]
+            while hit_node > 0:
+                for pattern_id in out[hit_node]:
+                    yield position, pattern_id
+                hit_node = dict_link[hit_node]
+
+    def find_all(self, text: str) -> List[Tuple[int, int, str, frozenset]]:
+        """Every occurrence as (start, end, keyword, labels)"""
+        hits = []
+        for end, pattern_id in self._iter_hits(text):
+            keyword = self._patterns[pattern_id]
+            hits.append((end - len(keyword) + 1, end + 1, keyword, frozenset(self._labels[pattern_id])))
+        return hits
+
+    def keywords_in(self, text: str) -> List[str]:
+        """Distinct keywords present in text, in the order they were added"""
+        found = {pattern_id for _, pattern_id in self._iter_hits(text)}
+        return [self._patterns[pattern_id] for pattern_id in sorted(found)]
+
+    def match(self, text: str) -> Dict[str, List[str]]:
+        """Distinct keywords present in text grouped by label, in the order they were added"""
+        found = {pattern_id for _, pattern_id in self._iter_hits(text)}
+        by_label: Dict[str, List[str]] = {}
+        for pattern_id in sorted(found):
+            for label in self._labels[pattern_id]:
+                by_label.setdefault(label, []).append(self._patterns[pattern_id])
+        return by_label
+
+
+class IncrementalKeywordMatcher:
+    """Keyword matcher for a vocabulary that keeps growing while it is being searched
+
+    Rebuilding one large automaton on every new keyword costs time proportional to the
+    whole vocabulary. New keywords are kept in a small `recent` set instead, searched with
+    plain substring tests; once it holds `merge_threshold` keywords it is frozen and merged
+    into the `base` automaton on a background thread, and the merged automaton replaces
+    the base when it is complete. Searches cover base, the batch being merged and recent.
+    """
+
+    def __init__(self, merge_threshold: int = 1000, base: Optional[KeywordMatcher] = None):
+        self.merge_threshold = merge_threshold
+        self._base = base if base is not None else KeywordMatcher()
+        self._base._build()
+        self._merging: Optional[Dict[str, set]] = None
+        self._recent: Dict[str, set] = {}
+        self._merge_thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self.stats = {'merges': 0, 'merge_failures': 0}
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._reset_after_fork)
+
+    def _reset_after_fork(self):
+        """The merge thread does not survive fork; the child restarts it on the next add"""
+        self._lock = threading.Lock()
+        self._merge_thread = None
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._base) + len(self._merging or {}) + len(self._recent)
+
+    def __contains__(self, keyword: str) -> bool:
+        with self._lock:
+            return self._find(keyword) is not None
+
+    def _find(self, keyword: str) -> Optional[set]:
+        """Label set of a known keyword, from whichever layer holds it (lock held)"""
+        if keyword in self._base:
+            return self._base._labels[self._base._index[keyword]]
+        for layer in (self._merging, self._recent):
+            if layer is not None and keyword in layer:
+                return layer[keyword]
+        return None
+
+    def add(self, keyword: str, label: Optional[str] = None) -> bool:
+        """Add a keyword (optionally labelled); returns True if the keyword is new"""
+        if not keyword:
+            return False
+        with self._lock:
+            labels = self._find(keyword)
+            if labels is not None:
+                if label is not None:
+                    labels.add(label)
+                return False
+            self._recent[keyword] = {label} if label is not None else set()
+            if len(self._recent) >= self.merge_threshold or (
+                    self._merging is not None and self._merge_thread is None):
+                self._start_merge()
+            return True
+
+    def add_many(self, keywords: Iterable[str], label: Optional[str] = None) -> int:
+        """Add several keywords under one label; returns how many were new"""
+        return sum(1 for keyword in keywords if self.add(keyword, label))
+
+    def labels_of(self, keyword: str) -> set:
+        with self._lock:
+            labels = self._find(keyword)
+            return set(labels) if labels is not None else set()
+
+    def _start_merge(self):
+        """Freeze recent and merge it into base off the calling thread (lock held)"""
+        if self._merge_thread is not None:
+            return  # one merge at a time; recent keeps growing until it finishes
+        if self._merging is None:
+            if not self._recent:
+                return
+            self._merging, self._recent = self._recent, {}
+        self._merge_thread = threading.Thread(
+            target=self._merge, args=(self._base, self._merging), name='keyword-merge', daemon=True)
+        self._merge_thread.start()
+
+    def _merge(self, base: KeywordMatcher, merging: Dict[str, set]):
+        try:
+            merged = base.merged_with(merging)
+        except Exception as e:
+            logger.error(f"Keyword matcher merge failed: {e}")
+            with self._lock:
+                self.stats['merge_failures'] += 1
+                self._merge_thread = None
+            return
+        with self._lock:
+            self._base, self._merging = merged, None
+            self._merge_thread = None
+            self.stats['merges'] += 1
+            if len(self._recent) >= self.merge_threshold:
+                self._start_merge()
+
+    def _hits(self, text: str) -> List[Tuple[str, set]]:
+        """(keyword, labels) of every distinct keyword in text, in the order they were added"""
+        with self._lock:
+            base = self._base
+            small = [(keyword, labels) for layer in (self._merging, self._recent) if layer
+                     for keyword, labels in layer.items() if keyword in text]
+        found = {pattern_id for _, pattern_id in base._iter_hits(text)}
+        return [(base._patterns[pattern_id], base._labels[pattern_id]) for pattern_id in sorted(found)] + small
+
+    def keywords_in(self, text: str) -> List[str]:
+        """Distinct keywords present in text, in the order they were added"""
+        return [keyword for keyword, _ in self._hits(text)]
+
+    def match(self, text: str) -> Dict[str, List[str]]:
+        """Distinct keywords present in text grouped by label, in the order they were added"""
+        by_label: Dict[str, List[str]] = {}
+        for keyword, labels in self._hits(text):
+            for label in tuple(labels):
+                by_label.setdefault(label, []).append(keyword)
+        return by_label
@@ -0,0 +1,70 @@
+"""
+Background job leader election
+Worker processes compete for an exclusive lock on a shared file; the holder runs the
+scheduled jobs and singleton services. The OS drops the lock when its holder exits, so
+another worker takes over on its next attempt.
+"""
+
+import os
+import tempfile
+import logging
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+logger = logging.getLogger(__name__)
+
+SCHEDULER_LOCK_FILE = os.getenv(
+    'SCHEDULER_LOCK_FILE', os.path.join(tempfile.gettempdir(), 'ars-ai-scheduler.lock')
+)
+
+class LeaderLock:
+    """Non-blocking, process-wide exclusive file lock
+
+    The lock belongs to the open file, which is never inherited by forked or spawned
+    workers: only the process that acquired it holds it.
+    """
+
+    def __init__(self, path: str = SCHEDULER_LOCK_FILE):
+        self.path = path
+        self._file = None
+
+    @property
+    def held(self) -> bool:
+        return self._file is not None
+
+    def try_acquire(self) -> bool:
+        """Take the lock if no other process holds it; True while this process holds it"""
+        if self._file is not None:
+            return True
+        try:
+            lock_file = open(self.path, 'a+')
+        except OSError as e:
+            logger.error(f"Cannot open scheduler lock {self.path}: {e}")
+            return False
+        try:
+            if fcntl is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            else:
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_NBLCK, 1)
+        except OSError:
+            lock_file.close()
+            return False
+        self._file = lock_file
+        logger.info(f"Worker {os.getpid()} elected to run background jobs")
+        return True
+
+    def release(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def info(self) -> dict:
+        return {'pid': os.getpid(), 'leader': self.held, 'lock_file': self.path}
+
+# Global instance
+scheduler_lock = LeaderLock()
@@ -7,127 +7,203 @@ from datetime import datetime, timedelta
 from typing import Dict, List, Any, Optional
 import logging
 from collections import defaultdict, Counter
+from concurrent.futures import ThreadPoolExecutor
+import atexit
 import os
+import threading
 from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.metrics.pairwise import cosine_similarity
 import joblib
+from learning_store import LearningStore
+from keyword_matcher import KeywordMatcher, IncrementalKeywordMatcher
+from monitoring import time_stage
 
 logger = logging.getLogger(__name__)
 
+# Lexicon term counts are accumulated in memory and written in one upsert batch
+LEXICON_FLUSH_INTERVAL = float(os.getenv('LEXICON_FLUSH_INTERVAL', 5.0))
+LEXICON_MAX_PENDING_TERMS = int(os.getenv('LEXICON_MAX_PENDING_TERMS', 20000))
+# Interactions waiting for term extraction before new ones are dropped
+LEXICON_EXTRACTION_BACKLOG = int(os.getenv('LEXICON_EXTRACTION_BACKLOG', 1000))
+# New lexicon terms are merged into the large keyword automaton in batches of this size
+LEXICON_MATCHER_MERGE_TERMS = int(os.getenv('LEXICON_MATCHER_MERGE_TERMS', 1000))
+
+# ARS business keywords
+ARS_KEYWORD_MATCHER = KeywordMatcher({'ars_business': [
+    'bordereau', 'rib', 'virement', 'remboursement', 'sla', 'délai',
+    'gestionnaire', 'chef équipe', 'réclamation', 'prestataire',
+    'tiers payant', 'santé', 'finance', 'scan', 'bo', 'bs',
+    'client', 'contrat', 'assurance', 'mutuelle', 'cpam', 'cnam'
+]})
+
 class LearningEngine:
     def __init__(self, db_path: str = "ai_learning.db"):
         self.db_path = db_path
+        self.store = LearningStore(db_path)
         self.company_lexicon = {}
+        self.lexicon_matcher = IncrementalKeywordMatcher(LEXICON_MATCHER_MERGE_TERMS)
+        self._lexicon_lock = threading.Lock()
+        self._pending_terms = Counter()
+        self._pending_categories = {}
+        self._lexicon_flush_timer = None
+        self._extraction_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='lexicon-extract')
+        self._extraction_backlog = 0
+        self._closed = False
+        self.lexicon_stats = {'extractions': 0, 'dropped_extractions': 0, 'flushes': 0, 'terms_flushed': 0}
         self.model_cache = {}
         self.performance_history = defaultdict(list)
         self._init_database()
         self._load_company_lexicon()
+        # Registered after the store, so pending terms are queued before its final commit
+        atexit.register(self.flush_lexicon)
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._reset_after_fork)
+    
+    def _reset_after_fork(self):
+        """Recreate the extraction thread and lexicon lock in a forked worker"""
+        self._lexicon_lock = threading.Lock()
+        self._lexicon_flush_timer = None
+        self._extraction_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='lexicon-extract')
+        self._extraction_backlog = 0
+        self._closed = False
+    
+    def close(self):
+        """Finish queued term extractions, queue pending lexicon counts and commit the store
+
+        Workers call this on shutdown (and the launcher before forking); once closed, the
+        atexit flush does nothing.
+        """
+        if self._closed:
+            return
+        self._extraction_executor.shutdown(wait=True)
+        self.flush_lexicon()
+        self._closed = True
+        self.store.close()
         
     def _init_database(self):
         """Initialize SQLite database for ARS learning data"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            # Company lexicon table
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS company_lexicon (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    term TEXT UNIQUE,
-                    category TEXT,
-                    frequency INTEGER DEFAULT 1,
-                    context TEXT,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            ''')
-            
-            # Learning data table
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS learning_data (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    endpoint TEXT,
-                    input_data TEXT,
-                    output_data TEXT,
-                    user_feedback TEXT,
-                    accuracy_score REAL,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            ''')
-            
-            # ARS SLA outcomes table
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS ars_sla_outcomes (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    bordereau_id TEXT,
-                    predicted_risk REAL,
-                    actual_breach BOOLEAN,
-                    accuracy REAL,
-                    timestamp TEXT,
-                    UNIQUE(bordereau_id, timestamp)
-                )
-            ''')
-            
-            # ARS assignment outcomes table
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS ars_assignment_outcomes (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    agent_id TEXT,
-                    assignment_success BOOLEAN,
-                    feedback_text TEXT,
-                    timestamp TEXT
-                )
-            ''')
-            
-            # ARS classification outcomes table
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS ars_classification_outcomes (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    predicted_category TEXT,
-                    correct_category TEXT,
-                    accuracy REAL,
-                    timestamp TEXT
-                )
-            ''')
-            
-            # ARS forecast outcomes table
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS ars_forecast_outcomes (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    forecast_date TEXT,
-                    predicted_volume INTEGER,
-                    actual_volume INTEGER,
-                    accuracy REAL,
-                    timestamp TEXT,
-                    UNIQUE(forecast_date)
-                )
-            ''')
-            
-            conn.commit()
-            conn.close()
+            self.store.run_sync(self._create_schema)
             logger.info("ARS learning database initialized successfully")
             
         except Exception as e:
             logger.error(f"Database initialization failed: {e}")
     
+    def _create_schema(self, conn: sqlite3.Connection):
+        """Create learning tables and the indexes used by the 30/60-day lookups"""
+        cursor = conn.cursor()
+        # Company lexicon table
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS company_lexicon (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                term TEXT UNIQUE,
+                category TEXT,
+                frequency INTEGER DEFAULT 1,
+                context TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        
+        # Learning data table
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS learning_data (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                endpoint TEXT,
+                input_data TEXT,
+                output_data TEXT,
+                user_feedback TEXT,
+                accuracy_score REAL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        
+        # ARS SLA outcomes table
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS ars_sla_outcomes (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                bordereau_id TEXT,
+                predicted_risk REAL,
+                actual_breach BOOLEAN,
+                accuracy REAL,
+                timestamp TEXT,
+                UNIQUE(bordereau_id, timestamp)
+            )
+        ''')
+        
+        # ARS assignment outcomes table
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS ars_assignment_outcomes (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                agent_id TEXT,
+                assignment_success BOOLEAN,
+                feedback_text TEXT,
+                timestamp TEXT
+            )
+        ''')
+        
+        # ARS classification outcomes table
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS ars_classification_outcomes (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                predicted_category TEXT,
+                correct_category TEXT,
+                accuracy REAL,
+                timestamp TEXT
+            )
+        ''')
+        
+        # ARS forecast outcomes table
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS ars_forecast_outcomes (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                forecast_date TEXT,
+                predicted_volume INTEGER,
+                actual_volume INTEGER,
+                accuracy REAL,
+                timestamp TEXT,
+                UNIQUE(forecast_date)
+            )
+        ''')
+        
+        # Indexes matching the timestamp > datetime('now', ...) lookups
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_sla_outcomes_timestamp
+            ON ars_sla_outcomes (timestamp)
+        ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_classification_outcomes_category_timestamp
+            ON ars_classification_outcomes (predicted_category, timestamp)
+        ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_assignment_outcomes_agent_timestamp
+            ON ars_assignment_outcomes (agent_id, timestamp)
+        ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_assignment_outcomes_timestamp
+            ON ars_assignment_outcomes (timestamp)
+        ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_lexicon_category
+            ON company_lexicon (category)
+        ''')
+
     def learn_from_interaction(self, endpoint: str, input_data: Dict, output_data: Dict, user_feedback: Optional[str] = None):
         """Learn from each API interaction with ARS business context"""
+        with time_stage('learning_write'):
+            self._learn_from_interaction(endpoint, input_data, output_data, user_feedback)
+    
+    def _learn_from_interaction(self, endpoint: str, input_data: Dict, output_data: Dict, user_feedback: Optional[str]):
         try:
-            # Extract and learn ARS-specific terms
-            self._extract_ars_terms(input_data, output_data)
+            # Extract and learn ARS-specific terms off the request path
+            self._queue_term_extraction(input_data, output_data)
             
-            # Store interaction data
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            cursor.execute('''
+            # Store interaction data (queued on the learning store writer thread)
+            self.store.execute('''
                 INSERT INTO learning_data (endpoint, input_data, output_data, user_feedback)
                 VALUES (?, ?, ?, ?)
             ''', (endpoint, json.dumps(input_data), json.dumps(output_data), user_feedback))
             
-            conn.commit()
-            conn.close()
-            
             # Learn ARS business patterns
             self._learn_ars_business_outcomes(endpoint, input_data, output_data, user_feedback)
             
@@ -137,19 +213,28 @@ class LearningEngine:
         except Exception as e:
             logger.error(f"Learning from interaction failed: {e}")
     
+    def _queue_term_extraction(self, input_data: Dict, output_data: Dict):
+        """Hand term extraction to the background thread, dropping it if the backlog is full"""
+        with self._lexicon_lock:
+            if self._extraction_backlog >= LEXICON_EXTRACTION_BACKLOG:
+                self.lexicon_stats['dropped_extractions'] += 1
+                return
+            self._extraction_backlog += 1
+        self._extraction_executor.submit(self._run_term_extraction, input_data, output_data)
+    
+    def _run_term_extraction(self, input_data: Dict, output_data: Dict):
+        try:
+            self._extract_ars_terms(input_data, output_data)
+        finally:
+            with self._lexicon_lock:
+                self._extraction_backlog -= 1
+                self.lexicon_stats['extractions'] += 1
+    
     def _extract_ars_terms(self, input_data: Dict, output_data: Dict):
         """Extract ARS-specific business terminology"""
         try:
             ars_terms = set()
             
-            # ARS business keywords
-            ars_keywords = [
-                'bordereau', 'rib', 'virement', 'remboursement', 'sla', 'délai',
-                'gestionnaire', 'chef équipe', 'réclamation', 'prestataire',
-                'tiers payant', 'santé', 'finance', 'scan', 'bo', 'bs',
-                'client', 'contrat', 'assurance', 'mutuelle', 'cpam', 'cnam'
-            ]
-            
             # Extract from all text fields
             all_text = []
             for data in [input_data, output_data]:
@@ -158,9 +243,7 @@ class LearningEngine:
             for text in all_text:
                 if text:
                     text_lower = text.lower()
-                    for keyword in ars_keywords:
-                        if keyword in text_lower:
-                            ars_terms.add(keyword)
+                    ars_terms.update(ARS_KEYWORD_MATCHER.keywords_in(text_lower))
                     
                     # Extract domain-specific terms
                     words = text_lower.split()
@@ -170,8 +253,7 @@ class LearningEngine:
                             ars_terms.add(word)
             
             # Store ARS terms
-            for term in ars_terms:
-                self._add_to_lexicon(term, 'ars_business')
+            self._add_terms_to_lexicon(ars_terms, 'ars_business')
                 
         except Exception as e:
             logger.error(f"ARS term extraction failed: {e}")
@@ -192,12 +274,10 @@ class LearningEngine:
     def _learn_ars_business_outcomes(self, endpoint: str, input_data: Dict, output_data: Dict, feedback: str):
         """Learn from ARS business outcomes"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
             # Learn SLA prediction accuracy
             if endpoint == 'sla_prediction' and feedback:
                 predictions = output_data.get('sla_predictions', [])
+                outcome_rows = []
                 for pred in predictions:
                     bordereau_id = pred.get('bordereau_id')
                     risk_score = pred.get('risk_score', 0)
@@ -205,12 +285,14 @@ class LearningEngine:
                     # Parse feedback for actual outcome
                     actual_breach = 'breach' in feedback.lower() or 'dépassé' in feedback.lower()
                     accuracy = 1.0 if (risk_score > 0.5) == actual_breach else 0.0
-                    
-                    cursor.execute('''
+                    outcome_rows.append((bordereau_id, risk_score, actual_breach, accuracy, datetime.now().isoformat()))
+                
+                if outcome_rows:
+                    self.store.executemany('''
                         INSERT OR REPLACE INTO ars_sla_outcomes
                         (bordereau_id, predicted_risk, actual_breach, accuracy, timestamp)
                         VALUES (?, ?, ?, ?, ?)
-                    ''', (bordereau_id, risk_score, actual_breach, accuracy, datetime.now().isoformat()))
+                    ''', outcome_rows)
             
             # Learn assignment success
             elif endpoint == 'smart_routing_suggest' and feedback:
@@ -218,7 +300,7 @@ class LearningEngine:
                 agent_id = assignment.get('agent_id')
                 success = 'success' in feedback.lower() or 'réussi' in feedback.lower()
                 
-                cursor.execute('''
+                self.store.execute('''
                     INSERT OR REPLACE INTO ars_assignment_outcomes
                     (agent_id, assignment_success, feedback_text, timestamp)
                     VALUES (?, ?, ?, ?)
@@ -231,15 +313,12 @@ class LearningEngine:
                 if correct_category:
                     accuracy = 1.0 if predicted_category == correct_category else 0.0
                     
-                    cursor.execute('''
+                    self.store.execute('''
                         INSERT INTO ars_classification_outcomes
                         (predicted_category, correct_category, accuracy, timestamp)
                         VALUES (?, ?, ?, ?)
                     ''', (predicted_category, correct_category, accuracy, datetime.now().isoformat()))
             
-            conn.commit()
-            conn.close()
-            
         except Exception as e:
             logger.error(f"ARS business outcome learning failed: {e}")
     
@@ -285,82 +364,98 @@ class LearningEngine:
     
     def _add_to_lexicon(self, term: str, category: str):
         """Add term to company lexicon"""
+        self._add_terms_to_lexicon([term], category)
+    
+    def _add_terms_to_lexicon(self, terms, category: str):
+        """Count terms in the in-memory lexicon now; the database is updated by flush_lexicon"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            # Check if term exists
-            cursor.execute('SELECT frequency FROM company_lexicon WHERE term = ?', (term,))
-            result = cursor.fetchone()
-            
-            if result:
-                # Update frequency
-                cursor.execute('''
-                    UPDATE company_lexicon 
-                    SET frequency = frequency + 1, updated_at = CURRENT_TIMESTAMP 
-                    WHERE term = ?
-                ''', (term,))
-            else:
-                # Insert new term
-                cursor.execute('''
-                    INSERT INTO company_lexicon (term, category, frequency)
-                    VALUES (?, ?, 1)
-                ''', (term, category))
-            
-            conn.commit()
-            conn.close()
-            
-            # Update in-memory lexicon
-            if term not in self.company_lexicon:
-                self.company_lexicon[term] = {'category': category, 'frequency': 1}
-            else:
-                self.company_lexicon[term]['frequency'] += 1
+            with self._lexicon_lock:
+                for term in terms:
+                    # Update in-memory lexicon
+                    if term not in self.company_lexicon:
+                        self.company_lexicon[term] = {'category': category, 'frequency': 1}
+                        self.lexicon_matcher.add(term, category)
+                    else:
+                        self.company_lexicon[term]['frequency'] += 1
+                    
+                    self._pending_terms[term] += 1
+                    self._pending_categories.setdefault(term, category)
+                
+                flush_now = len(self._pending_terms) >= LEXICON_MAX_PENDING_TERMS
+                if not flush_now and self._lexicon_flush_timer is None:
+                    self._lexicon_flush_timer = threading.Timer(LEXICON_FLUSH_INTERVAL, self.flush_lexicon)
+                    self._lexicon_flush_timer.daemon = True
+                    self._lexicon_flush_timer.start()
+            
+            if flush_now:
+                self.flush_lexicon()
                 
         except Exception as e:
             logger.error(f"Adding to lexicon failed: {e}")
     
+    def flush_lexicon(self) -> int:
+        """Write accumulated term counts in one upsert batch; returns the number of terms"""
+        with self._lexicon_lock:
+            if self._closed:
+                return 0
+            if self._lexicon_flush_timer is not None:
+                self._lexicon_flush_timer.cancel()
+                self._lexicon_flush_timer = None
+            pending, self._pending_terms = self._pending_terms, Counter()
+            categories, self._pending_categories = self._pending_categories, {}
+        
+        if not pending:
+            return 0
+        
+        try:
+            self.store.executemany('''
+                INSERT INTO company_lexicon (term, category, frequency)
+                VALUES (?, ?, ?)
+                ON CONFLICT(term) DO UPDATE SET
+                    frequency = frequency + excluded.frequency, updated_at = CURRENT_TIMESTAMP
+            ''', [(term, categories[term], count) for term, count in pending.items()])
+            self.lexicon_stats['flushes'] += 1
+            self.lexicon_stats['terms_flushed'] += len(pending)
+        except Exception as e:
+            logger.error(f"Lexicon flush failed: {e}")
+        return len(pending)
+    
     def _load_company_lexicon(self):
         """Load company lexicon from database"""
         try:
             if not os.path.exists(self.db_path):
                 return
-                
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
             
-            cursor.execute('SELECT term, category, frequency FROM company_lexicon')
-            results = cursor.fetchall()
+            results = self.store.fetchall_sync('SELECT term, category, frequency FROM company_lexicon')
             
+            matcher = KeywordMatcher()
             for term, category, frequency in results:
                 self.company_lexicon[term] = {
                     'category': category,
                     'frequency': frequency
                 }
+                matcher.add(term, category)
+            # Built once here; terms learned later are merged in the background
+            self.lexicon_matcher = IncrementalKeywordMatcher(LEXICON_MATCHER_MERGE_TERMS, base=matcher)
             
-            conn.close()
             logger.info(f"Loaded {len(self.company_lexicon)} terms from company lexicon")
             
         except Exception as e:
             logger.error(f"Loading lexicon failed: {e}")
     
-    def get_enhanced_ars_classification(self, text: str, base_classification: Dict) -> Dict:
+    async def get_enhanced_ars_classification(self, text: str, base_classification: Dict) -> Dict:
         """Enhance classification using ARS business learning"""
         try:
             enhanced = base_classification.copy()
             
-            # Get historical classification accuracy
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
             # Check historical accuracy for this category
             predicted_category = base_classification.get('category', 'UNKNOWN')
-            cursor.execute('''
+            result = await self.store.fetchone('''
                 SELECT AVG(accuracy), COUNT(*) 
                 FROM ars_classification_outcomes 
                 WHERE predicted_category = ? AND timestamp > datetime('now', '-30 days')
             ''', (predicted_category,))
             
-            result = cursor.fetchone()
             if result and result[1] > 0:  # Has historical data
                 avg_accuracy = result[0]
                 sample_count = result[1]
@@ -378,11 +473,7 @@ class LearningEngine:
             
             # Analyze ARS-specific terms
             text_lower = text.lower()
-            ars_terms_found = []
-            
-            for term, info in self.company_lexicon.items():
-                if info['category'] == 'ars_business' and term in text_lower:
-                    ars_terms_found.append(term)
+            ars_terms_found = self.lexicon_matcher.match(text_lower).get('ars_business', [])
             
             if ars_terms_found:
                 enhanced['ars_business_terms'] = ars_terms_found
@@ -392,29 +483,24 @@ class LearningEngine:
                 enhanced['confidence'] = min(100, 
                     enhanced.get('confidence', 70) + len(ars_terms_found) * 3)
             
-            conn.close()
             return enhanced
             
         except Exception as e:
             logger.error(f"Enhanced ARS classification failed: {e}")
             return base_classification
     
-    def get_adaptive_ars_sla_prediction(self, base_prediction: Dict, bordereau_data: Dict) -> Dict:
+    async def get_adaptive_ars_sla_prediction(self, base_prediction: Dict, bordereau_data: Dict) -> Dict:
         """Enhance SLA prediction using ARS historical outcomes"""
         try:
             enhanced = base_prediction.copy()
             
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
             # Get recent SLA prediction accuracy
-            cursor.execute('''
+            result = await self.store.fetchone('''
                 SELECT AVG(accuracy), COUNT(*) 
                 FROM ars_sla_outcomes 
                 WHERE timestamp > datetime('now', '-30 days')
             ''')
             
-            result = cursor.fetchone()
             if result and result[1] > 5:  # Need at least 5 samples
                 avg_accuracy = result[0]
                 sample_count = result[1]
@@ -445,13 +531,12 @@ class LearningEngine:
             # Get agent-specific performance if assigned
             assigned_agent = bordereau_data.get('assignedToUserId')
             if assigned_agent:
-                cursor.execute('''
+                agent_result = await self.store.fetchone('''
                     SELECT AVG(CASE WHEN assignment_success THEN 1.0 ELSE 0.0 END), COUNT(*)
                     FROM ars_assignment_outcomes 
                     WHERE agent_id = ? AND timestamp > datetime('now', '-60 days')
                 ''', (str(assigned_agent),))
                 
-                agent_result = cursor.fetchone()
                 if agent_result and agent_result[1] > 0:
                     agent_success_rate = agent_result[0]
                     
@@ -467,7 +552,6 @@ class LearningEngine:
                                     'adjustment_factor': round(agent_factor, 3)
                                 }
             
-            conn.close()
             return enhanced
             
         except Exception as e:
@@ -478,17 +562,18 @@ class LearningEngine:
     
     def record_ars_outcome(self, endpoint: str, prediction_data: Dict, actual_outcome: Dict):
         """Record actual ARS business outcomes for learning"""
+        with time_stage('learning_write'):
+            self._record_ars_outcome(endpoint, prediction_data, actual_outcome)
+    
+    def _record_ars_outcome(self, endpoint: str, prediction_data: Dict, actual_outcome: Dict):
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
             if endpoint == 'sla_prediction':
                 bordereau_id = actual_outcome.get('bordereau_id')
                 actual_breach = actual_outcome.get('sla_breached', False)
                 predicted_risk = prediction_data.get('risk_score', 0.5)
                 accuracy = 1.0 if (predicted_risk > 0.5) == actual_breach else 0.0
                 
-                cursor.execute('''
+                self.store.execute('''
                     INSERT OR REPLACE INTO ars_sla_outcomes
                     (bordereau_id, predicted_risk, actual_breach, accuracy, timestamp)
                     VALUES (?, ?, ?, ?, ?)
@@ -500,15 +585,12 @@ class LearningEngine:
                 predicted_volume = prediction_data.get('predicted_bordereaux', 0)
                 accuracy = 1.0 - abs(predicted_volume - actual_volume) / max(actual_volume, 1)
                 
-                cursor.execute('''
+                self.store.execute('''
                     INSERT OR REPLACE INTO ars_forecast_outcomes
                     (forecast_date, predicted_volume, actual_volume, accuracy, timestamp)
                     VALUES (?, ?, ?, ?, ?)
                 ''', (forecast_date, predicted_volume, actual_volume, max(0.0, accuracy), datetime.now().isoformat()))
             
-            conn.commit()
-            conn.close()
-            
         except Exception as e:
             logger.error(f"Recording ARS outcome failed: {e}")
     
@@ -528,24 +610,25 @@ class LearningEngine:
                     confidence = np.mean(scores) if scores else 0.0
             
             # Store performance data
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            cursor.execute('''
+            self.store.execute('''
                 INSERT INTO model_performance (model_name, accuracy, training_samples)
                 VALUES (?, ?, ?)
             ''', (endpoint, confidence, len(input_data) if isinstance(input_data, list) else 1))
             
-            conn.commit()
-            conn.close()
-            
         except Exception as e:
             logger.error(f"Updating model performance failed: {e}")
     
     def get_learning_stats(self) -> Dict:
         """Get comprehensive ARS learning statistics"""
         try:
-            conn = sqlite3.connect(self.db_path)
+            return self.store.run_sync(self._collect_learning_stats)
+        except Exception as e:
+            logger.error(f"Getting learning stats failed: {e}")
+            return {}
+    
+    def _collect_learning_stats(self, conn: sqlite3.Connection) -> Dict:
+        """Run the learning statistics queries on the learning store thread"""
+        try:
             cursor = conn.cursor()
             
             # Get lexicon stats
@@ -584,8 +667,6 @@ class LearningEngine:
             ''')
             classification_accuracy, classification_count = cursor.fetchone()
             
-            conn.close()
-            
             return {
                 'company_lexicon_size': lexicon_count or 0,
                 'ars_lexicon_size': ars_lexicon_count or 0,
@@ -608,7 +689,12 @@ class LearningEngine:
                         'status': 'excellent' if (classification_accuracy or 0) > 0.9 else 'good' if (classification_accuracy or 0) > 0.75 else 'needs_improvement'
                     }
                 },
-                'learning_quality': self._assess_learning_quality(sla_accuracy, assignment_success, classification_accuracy)
+                'learning_quality': self._assess_learning_quality(sla_accuracy, assignment_success, classification_accuracy),
+                'lexicon_ingestion': {
+                    **self.lexicon_stats,
+                    'pending_terms': len(self._pending_terms),
+                    'extraction_backlog': self._extraction_backlog
+                }
             }
             
         except Exception as e:
@@ -636,15 +722,15 @@ class LearningEngine:
 learning_engine = LearningEngine()
 
 # Enhanced learning methods for ARS
-def enhance_with_ars_learning(endpoint: str, base_result: Dict, context_data: Dict = None) -> Dict:
+async def enhance_with_ars_learning(endpoint: str, base_result: Dict, context_data: Dict = None) -> Dict:
     """Enhance any AI result with ARS-specific learning"""
     try:
         if endpoint == 'classify':
-            return learning_engine.get_enhanced_ars_classification(
+            return await learning_engine.get_enhanced_ars_classification(
                 context_data.get('text', ''), base_result
             )
         elif endpoint == 'sla_prediction':
-            return learning_engine.get_adaptive_ars_sla_prediction(
+            return await learning_engine.get_adaptive_ars_sla_prediction(
                 base_result, context_data or {}
             )
         else:
@@ -0,0 +1,162 @@
+"""
+SQLite persistence for the ARS learning engine
+One long-lived WAL connection owned by a single writer thread, with batched commits
+and an async API so request handlers never block the event loop on disk I/O.
+"""
+
+import asyncio
+import atexit
+import sqlite3
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, List, Optional, Sequence
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+# Commit once this many writes are pending, or after this many seconds
+LEARNING_COMMIT_BATCH_SIZE = int(os.getenv('LEARNING_COMMIT_BATCH_SIZE', 200))
+LEARNING_COMMIT_INTERVAL = float(os.getenv('LEARNING_COMMIT_INTERVAL', 1.0))
+
+class LearningStore:
+    """Serialized access to one SQLite database through a dedicated writer thread
+
+    Every statement runs on the same thread and connection, so SQLite never sees
+    concurrent writers. Writes return immediately and are committed in batches;
+    reads go through the same thread and therefore see pending writes.
+    """
+
+    def __init__(self, db_path: str, commit_batch_size: int = LEARNING_COMMIT_BATCH_SIZE,
+                 commit_interval: float = LEARNING_COMMIT_INTERVAL):
+        self.db_path = db_path
+        self.commit_batch_size = commit_batch_size
+        self.commit_interval = commit_interval
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='learning-store')
+        self._conn = None
+        self._pending_writes = 0
+        self._commit_timer = None
+        self._timer_lock = threading.Lock()
+        self.stats = {'writes': 0, 'commits': 0, 'reads': 0, 'errors': 0}
+        atexit.register(self.close)
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._reset_after_fork)
+
+    def _reset_after_fork(self):
+        """Give a forked worker its own writer thread and connection
+
+        Threads do not survive fork and an SQLite handle must not be used from two
+        processes, so the child starts a new executor and reconnects on first use.
+        Launchers close the store before forking, so nothing is left uncommitted.
+        """
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='learning-store')
+        self._conn = None
+        self._pending_writes = 0
+        self._commit_timer = None
+        self._timer_lock = threading.Lock()
+
+    # --- writer thread side -------------------------------------------------
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            conn = sqlite3.connect(self.db_path, check_same_thread=False, cached_statements=256)
+            conn.execute('PRAGMA journal_mode=WAL')
+            # WAL + NORMAL only fsyncs at checkpoints, not on every commit
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute('PRAGMA busy_timeout=5000')
+            self._conn = conn
+        return self._conn
+
+    def _commit(self):
+        if self._conn is not None and self._pending_writes:
+            self._conn.commit()
+            self._pending_writes = 0
+            self.stats['commits'] += 1
+
+    def _write(self, sql: str, params: Sequence, many: bool):
+        try:
+            conn = self._connection()
+            if many:
+                conn.executemany(sql, params)
+            else:
+                conn.execute(sql, params)
+            self._pending_writes += 1
+            self.stats['writes'] += 1
+            if self._pending_writes >= self.commit_batch_size:
+                self._commit()
+            else:
+                self._schedule_commit()
+        except Exception as e:
+            self.stats['errors'] += 1
+            logger.error(f"Learning store write failed: {e}")
+
+    def _read(self, sql: str, params: Sequence, fetch_all: bool):
+        self.stats['reads'] += 1
+        cursor = self._connection().execute(sql, params)
+        return cursor.fetchall() if fetch_all else cursor.fetchone()
+
+    def _call(self, fn: Callable[[sqlite3.Connection], Any]):
+        result = fn(self._connection())
+        self._pending_writes += 1
+        self._commit()
+        return result
+
+    def _schedule_commit(self):
+        with self._timer_lock:
+            if self._commit_timer is None:
+                self._commit_timer = threading.Timer(self.commit_interval, self._timed_commit)
+                self._commit_timer.daemon = True
+                self._commit_timer.start()
+
+    def _timed_commit(self):
+        with self._timer_lock:
+            self._commit_timer = None
+        try:
+            self._executor.submit(self._commit)
+        except RuntimeError:
+            pass  # executor already shut down
+
+    # --- public API ---------------------------------------------------------
+
+    def execute(self, sql: str, params: Sequence = ()) -> Future:
+        """Queue a write; it is committed with the next batch"""
+        return self._executor.submit(self._write, sql, params, False)
+
+    def executemany(self, sql: str, seq_of_params: List[Sequence]) -> Future:
+        """Queue a multi-row write as a single pending statement"""
+        return self._executor.submit(self._write, sql, seq_of_params, True)
+
+    async def fetchone(self, sql: str, params: Sequence = ()) -> Optional[tuple]:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self._read, sql, params, False)
+
+    async def fetchall(self, sql: str, params: Sequence = ()) -> List[tuple]:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self._read, sql, params, True)
+
+    def fetchone_sync(self, sql: str, params: Sequence = ()) -> Optional[tuple]:
+        """Blocking read for callers outside the event loop (scheduler, startup)"""
+        return self._executor.submit(self._read, sql, params, False).result()
+
+    def fetchall_sync(self, sql: str, params: Sequence = ()) -> List[tuple]:
+        return self._executor.submit(self._read, sql, params, True).result()
+
+    def run_sync(self, fn: Callable[[sqlite3.Connection], Any]) -> Any:
+        """Run fn(connection) on the writer thread and commit, e.g. for schema setup"""
+        return self._executor.submit(self._call, fn).result()
+
+    def flush(self):
+        """Commit pending writes now"""
+        self._executor.submit(self._commit).result()
+
+    def close(self):
+        try:
+            self._executor.submit(self._commit).result()
+        except RuntimeError:
+            return  # already closed
+        except Exception as e:
+            logger.error(f"Learning store final commit failed: {e}")
+        self._executor.shutdown(wait=True)
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
@@ -1,20 +1,39 @@
 import os
-import pickle
 import joblib
 import json
+import threading
+import time
 import numpy as np
+from contextlib import contextmanager
 from datetime import datetime
 from typing import Dict, Any, Optional
 import logging
 from sklearn.base import BaseEstimator
 import hashlib
 
+from subsystems import current_rss
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
 logger = logging.getLogger(__name__)
 
+# Served models map their arrays read-only from the artifact, so workers share one
+# page-cache copy; set to an empty string to load into private memory instead
+MODEL_MMAP_MODE = os.getenv('MODEL_MMAP_MODE', 'r') or None
+HASH_CHUNK_BYTES = 1 << 20
+
 class ModelPersistence:
     def __init__(self, models_dir: str = "models"):
         self.models_dir = models_dir
+        self.registry_path = os.path.join(models_dir, "model_registry.json")
         self.model_registry = {}
+        self.load_stats = {}
+        self._registry_stamp = None
+        self._thread_lock = threading.Lock()
         self._ensure_models_directory()
         self._load_model_registry()
     
@@ -27,63 +46,140 @@ class ModelPersistence:
         except Exception as e:
             logger.error(f"Failed to create models directory: {e}")
     
+    def _registry_file_stamp(self):
+        try:
+            stat = os.stat(self.registry_path)
+            return stat.st_mtime_ns, stat.st_size
+        except OSError:
+            return None
+    
     def _load_model_registry(self):
         """Load model registry from disk"""
         try:
-            registry_path = os.path.join(self.models_dir, "model_registry.json")
-            if os.path.exists(registry_path):
-                with open(registry_path, 'r') as f:
+            stamp = self._registry_file_stamp()
+            if stamp is not None:
+                with open(self.registry_path, 'r') as f:
                     self.model_registry = json.load(f)
+                self._registry_stamp = stamp
                 logger.info(f"Loaded model registry with {len(self.model_registry)} models")
         except Exception as e:
             logger.error(f"Failed to load model registry: {e}")
             self.model_registry = {}
     
+    def refresh_registry(self) -> bool:
+        """Re-read the registry if another process changed it; True when it was reloaded"""
+        stamp = self._registry_file_stamp()
+        if stamp is None or stamp == self._registry_stamp:
+            return False
+        self._load_model_registry()
+        return True
+    
+    @contextmanager
+    def _registry_lock(self):
+        """Serialise registry updates across threads and worker processes"""
+        with self._thread_lock, self._file_lock(self.registry_path + '.lock'):
+            yield
+    
+    @contextmanager
+    def update_lock(self, model_name: str):
+        """Serialise a load-modify-save of one model across worker processes"""
+        with self._file_lock(os.path.join(self.models_dir, f"{model_name}.lock")):
+            yield
+    
+    @contextmanager
+    def _file_lock(self, path: str):
+        """Exclusive lock on path; separate opens conflict, so it also excludes other threads"""
+        with open(path, 'a+') as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            else:
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+                else:
+                    lock_file.seek(0)
+                    msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+    
     def _save_model_registry(self):
-        """Save model registry to disk"""
+        """Save model registry to disk
+        
+        Written to a temporary file and renamed, so readers never see a partial registry.
+        Callers hold _registry_lock and have merged the on-disk entries first.
+        """
         try:
-            registry_path = os.path.join(self.models_dir, "model_registry.json")
-            with open(registry_path, 'w') as f:
+            tmp_path = f"{self.registry_path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w') as f:
                 json.dump(self.model_registry, f, indent=2, default=str)
+            os.replace(tmp_path, self.registry_path)
+            self._registry_stamp = self._registry_file_stamp()
         except Exception as e:
             logger.error(f"Failed to save model registry: {e}")
     
     def save_model(self, model_name: str, model: Any, metadata: Dict = None) -> bool:
-        """Save a model with metadata"""
+        """Save a model with metadata
+        
+        Each save of a name gets the next version number. The artifact it replaces is kept
+        until the save after, so processes still loading that version can finish.
+        """
         try:
-            # Generate model hash for versioning
-            model_hash = self._generate_model_hash(model)
             timestamp = datetime.now().isoformat()
             
-            # Create model filename
+            # Save model uncompressed, so its NumPy arrays can be memory-mapped at load
+            tmp_path = os.path.join(self.models_dir, f"{model_name}.{os.getpid()}.{threading.get_ident()}.tmp")
+            joblib.dump(model, tmp_path, compress=0)
+            
+            # Hash the written artifact for versioning and name the file after it
+            model_hash = self._hash_file(tmp_path)
             model_filename = f"{model_name}_{model_hash[:8]}.pkl"
             model_path = os.path.join(self.models_dir, model_filename)
+            os.replace(tmp_path, model_path)
             
-            # Save model
-            joblib.dump(model, model_path)
-            
-            # Update registry
-            self.model_registry[model_name] = {
-                'filename': model_filename,
-                'path': model_path,
-                'hash': model_hash,
-                'created_at': timestamp,
-                'metadata': metadata or {},
-                'size_bytes': os.path.getsize(model_path)
-            }
+            with self._registry_lock():
+                # Merge what other worker processes registered since we last read it
+                self._load_model_registry()
+                previous = self.model_registry.get(model_name) or {}
+                
+                # Update registry
+                self.model_registry[model_name] = {
+                    'filename': model_filename,
+                    'path': model_path,
+                    'hash': model_hash,
+                    'version': previous.get('version', 0) + 1,
+                    'previous_path': previous.get('path') if previous.get('path') != model_path else None,
+                    'created_at': timestamp,
+                    'metadata': metadata or {},
+                    'size_bytes': os.path.getsize(model_path)
+                }
+                
+                # Save registry
+                self._save_model_registry()
             
-            # Save registry
-            self._save_model_registry()
+            # Drop the artifact two versions back
+            stale = previous.get('previous_path')
+            if stale and stale != model_path and os.path.exists(stale):
+                try:
+                    os.remove(stale)
+                except OSError as e:  # still mapped by a process on Windows
+                    logger.warning(f"Could not remove old artifact {stale}: {e}")
             
-            logger.info(f"Saved model {model_name} to {model_path}")
+            logger.info(f"Saved model {model_name} version {self.model_registry[model_name]['version']} to {model_path}")
             return True
             
         except Exception as e:
             logger.error(f"Failed to save model {model_name}: {e}")
             return False
     
-    def load_model(self, model_name: str) -> Optional[Any]:
-        """Load a model by name"""
+    def load_model(self, model_name: str, mmap_mode: Optional[str] = MODEL_MMAP_MODE) -> Optional[Any]:
+        """Load a model by name
+        
+        With mmap_mode its arrays stay in the file's pages (read-only for 'r', copy on
+        write for 'c'), shared by every process that loads the same artifact. Load time
+        and resident memory growth are recorded in load_stats.
+        """
         try:
             if model_name not in self.model_registry:
                 logger.warning(f"Model {model_name} not found in registry")
@@ -96,8 +192,22 @@ class ModelPersistence:
                 logger.error(f"Model file not found: {model_path}")
                 return None
             
-            model = joblib.load(model_path)
-            logger.info(f"Loaded model {model_name} from {model_path}")
+            rss_before = current_rss()
+            start = time.perf_counter()
+            model = joblib.load(model_path, mmap_mode=mmap_mode)
+            load_seconds = time.perf_counter() - start
+            rss_after = current_rss()
+            
+            self.load_stats[model_name] = {
+                'path': model_path,
+                'version': model_info.get('version'),
+                'mmap_mode': mmap_mode,
+                'load_seconds': round(load_seconds, 4),
+                'size_mb': round(os.path.getsize(model_path) / 2 ** 20, 2),
+                'rss_delta_mb': round((rss_after - rss_before) / 2 ** 20, 2)
+                if rss_before is not None and rss_after is not None else None
+            }
+            logger.info(f"Loaded model {model_name} from {model_path} in {load_seconds:.3f}s")
             return model
             
         except Exception as e:
@@ -123,16 +233,17 @@ class ModelPersistence:
                 logger.warning(f"Model {model_name} not found")
                 return False
             
-            model_info = self.model_registry[model_name]
-            model_path = model_info['path']
-            
-            # Delete file
-            if os.path.exists(model_path):
-                os.remove(model_path)
+            with self._registry_lock():
+                self._load_model_registry()
+                model_info = self.model_registry.pop(model_name, None)
+                if model_info is None:
+                    return False
+                self._save_model_registry()
             
-            # Remove from registry
-            del self.model_registry[model_name]
-            self._save_model_registry()
+            # Delete files
+            for model_path in (model_info.get('path'), model_info.get('previous_path')):
+                if model_path and os.path.exists(model_path):
+                    os.remove(model_path)
             
             logger.info(f"Deleted model {model_name}")
             return True
@@ -141,23 +252,24 @@ class ModelPersistence:
             logger.error(f"Failed to delete model {model_name}: {e}")
             return False
     
-    def _generate_model_hash(self, model: Any) -> str:
-        """Generate a hash for the model"""
-        try:
-            # Convert model to bytes for hashing
-            model_bytes = pickle.dumps(model)
-            return hashlib.md5(model_bytes).hexdigest()
-        except Exception as e:
-            logger.error(f"Failed to generate model hash: {e}")
-            return datetime.now().strftime("%Y%m%d_%H%M%S")
+    def _hash_file(self, path: str) -> str:
+        """MD5 of an artifact, read in chunks instead of pickling the model a second time"""
+        digest = hashlib.md5()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(HASH_CHUNK_BYTES), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
     
     def save_vectorizer(self, name: str, vectorizer: Any) -> bool:
         """Save a vectorizer (TfidfVectorizer, etc.)"""
         return self.save_model(f"vectorizer_{name}", vectorizer, {"type": "vectorizer"})
     
     def load_vectorizer(self, name: str) -> Optional[Any]:
-        """Load a vectorizer"""
-        return self.load_model(f"vectorizer_{name}")
+        """Load a vectorizer
+        
+        Copy-on-write mapping: incremental featurizers update their arrays in place.
+        """
+        return self.load_model(f"vectorizer_{name}", mmap_mode='c' if MODEL_MMAP_MODE else None)
     
     def save_scaler(self, name: str, scaler: Any) -> bool:
         """Save a scaler (StandardScaler, etc.)"""
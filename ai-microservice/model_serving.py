@@ -0,0 +1,231 @@
+"""
+Hot-swappable Serving Models
+Trained classifiers and predictors are published as versioned artifacts through
+ModelPersistence. Every serving process watches model_registry.json and swaps to a newer
+version by replacing one reference, so no restart is needed and a request that already
+took the current model keeps using it until it finishes. Training runs as a background
+job on the compute executor; its status is recorded in a file any worker can read.
+"""
+
+import asyncio
+import json
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional
+import logging
+import os
+
+from advanced_ml_models import DocumentClassifier, SLABreachPredictor
+from compute_executor import compute_executor
+from model_persistence import model_persistence
+
+logger = logging.getLogger(__name__)
+
+# Seconds between checks of model_registry.json for versions published by other workers
+MODEL_REFRESH_SECONDS = int(os.getenv('MODEL_REFRESH_SECONDS', 15))
+# Training jobs get far longer than request-path compute tasks
+MODEL_TRAINING_TIMEOUT = float(os.getenv('MODEL_TRAINING_TIMEOUT', 1800))
+# Finished jobs remembered for status queries
+TRAINING_JOBS_KEPT = 50
+# Job status files, so a status poll can be answered by any worker, not just the one running the job
+TRAINING_JOBS_DIR = os.getenv('TRAINING_JOBS_DIR', os.path.join(model_persistence.models_dir, 'training_jobs'))
+
+class ServedModel:
+    """The current version of one named model in this process"""
+
+    def __init__(self, name: str, factory: Callable[[], Any]):
+        self.name = name
+        self._model = factory()  # untrained placeholder until a version is published
+        self.version = 0
+        self.loaded_at = None
+        self._refresh_lock = threading.Lock()
+
+    @property
+    def current(self) -> Any:
+        """The model to use for a whole request; take it once, then use the local reference"""
+        return self._model
+
+    def _swap(self, model: Any, version: int):
+        self._model = model
+        self.version = version
+        self.loaded_at = datetime.now().isoformat()
+        logger.info(f"Serving {self.name} version {version}")
+
+    def publish(self, model: Any, metadata: Optional[Dict] = None) -> int:
+        """Save model as the next version and serve it here; other workers pick it up on refresh"""
+        if not model_persistence.save_model(self.name, model, metadata):
+            raise RuntimeError(f"Saving {self.name} failed")
+        version = model_persistence.get_model_info(self.name)['version']
+        # Serve the mapped artifact like the other workers, rather than a private copy
+        model = model_persistence.load_model(self.name) or model
+        with self._refresh_lock:
+            if version > self.version:
+                self._swap(model, version)
+        return version
+
+    def refresh(self) -> bool:
+        """Load the registry's version if it is newer than the served one; True when swapped"""
+        with self._refresh_lock:
+            model_info = model_persistence.get_model_info(self.name)
+            version = (model_info or {}).get('version', 0)
+            if version <= self.version:
+                return False
+            model = model_persistence.load_model(self.name)
+            if model is None:
+                return False
+            self._swap(model, version)
+            return True
+
+    def info(self) -> Dict[str, Any]:
+        # Load time and memory when this version came from an artifact, not a local fit
+        return {'version': self.version, 'loaded_at': self.loaded_at,
+                'artifact_load': model_persistence.load_stats.get(self.name)}
+
+class TrainingJob:
+    """A background training run and its outcome"""
+
+    def __init__(self, model_name: str):
+        self.id = uuid.uuid4().hex[:12]
+        self.model_name = model_name
+        self.status = 'running'
+        self.started_at = datetime.now().isoformat()
+        self.finished_at = None
+        self.result = None
+        self.version = None
+        self.error = None
+        self.task = None
+
+    def info(self) -> Dict[str, Any]:
+        return {
+            'job_id': self.id,
+            'model': self.model_name,
+            'status': self.status,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+            'version': self.version,
+            'model_performance': self.result,
+            'error': self.error,
+            'worker_pid': os.getpid()
+        }
+
+class ModelServing:
+    """Named served models, their background training jobs and the registry watch"""
+
+    def __init__(self):
+        self._models: Dict[str, ServedModel] = {}
+        self._jobs: 'OrderedDict[str, TrainingJob]' = OrderedDict()
+        self._last_refresh = 0.0
+
+    def register(self, name: str, factory: Callable[[], Any]) -> ServedModel:
+        self._models[name] = self._models.get(name) or ServedModel(name, factory)
+        return self._models[name]
+
+    def refresh(self) -> Dict[str, bool]:
+        """Swap every model with a newer published version; returns name -> swapped"""
+        swapped = {}
+        try:
+            model_persistence.refresh_registry()
+            for name, served in self._models.items():
+                swapped[name] = served.refresh()
+        except Exception as e:
+            logger.error(f"Refreshing served models failed: {e}")
+        self._last_refresh = time.time()
+        return swapped
+
+    def start_training(self, name: str, train_fn: Callable, *args) -> TrainingJob:
+        """Run train_fn(*args) -> (result, model) in a compute worker, then publish the model
+
+        One job per model at a time: while one runs, it is returned instead of a new one.
+        """
+        for job in self._jobs.values():
+            if job.model_name == name and job.status == 'running':
+                return job
+        job = TrainingJob(name)
+        job.task = asyncio.get_running_loop().create_task(self._train(job, train_fn, args))
+        self._jobs[job.id] = job
+        self._record(job)
+        while len(self._jobs) > TRAINING_JOBS_KEPT:
+            oldest = next(iter(self._jobs.values()))
+            if oldest.status == 'running':
+                break
+            self._jobs.popitem(last=False)
+        return job
+
+    async def _train(self, job: TrainingJob, train_fn: Callable, args: tuple) -> TrainingJob:
+        served = self._models[job.model_name]
+        try:
+            result, model = await compute_executor.run(
+                train_fn, *args, timeout=MODEL_TRAINING_TIMEOUT, task_name=f"train_{job.model_name}"
+            )
+            job.version = await asyncio.to_thread(served.publish, model, {'performance': result})
+            job.result = result
+            job.status = 'completed'
+            logger.info(f"Training job {job.id} published {job.model_name} version {job.version}")
+        except Exception as e:
+            job.status = 'failed'
+            job.error = str(e)
+            logger.error(f"Training job {job.id} for {job.model_name} failed: {e}")
+        job.finished_at = datetime.now().isoformat()
+        await asyncio.to_thread(self._record, job)
+        return job
+
+    def _record(self, job: TrainingJob):
+        """Write the job's status file (atomically) and drop the oldest beyond TRAINING_JOBS_KEPT"""
+        try:
+            os.makedirs(TRAINING_JOBS_DIR, exist_ok=True)
+            path = os.path.join(TRAINING_JOBS_DIR, f"{job.id}.json")
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump(job.info(), f, default=str)
+            os.replace(tmp_path, path)
+            if job.status != 'running':
+                self._prune_records()
+        except Exception as e:
+            logger.error(f"Recording training job {job.id} failed: {e}")
+
+    def _prune_records(self):
+        records = []
+        for entry in os.scandir(TRAINING_JOBS_DIR):
+            try:
+                if entry.name.endswith('.json'):
+                    records.append((entry.stat().st_mtime, entry.path))
+            except FileNotFoundError:  # pruned by another worker meanwhile
+                pass
+        for _, path in sorted(records)[:-TRAINING_JOBS_KEPT]:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Status of a job started by any worker, None when unknown"""
+        job = self._jobs.get(job_id)
+        if job is not None:
+            return job.info()
+        if not job_id.isalnum():
+            return None
+        try:
+            with open(os.path.join(TRAINING_JOBS_DIR, f"{job_id}.json")) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.error(f"Reading training job {job_id} failed: {e}")
+            return None
+
+    def info(self) -> Dict[str, Any]:
+        return {
+            'models': {name: served.info() for name, served in self._models.items()},
+            'running_jobs': [job.id for job in self._jobs.values() if job.status == 'running'],
+            'last_refresh': datetime.fromtimestamp(self._last_refresh).isoformat() if self._last_refresh else None
+        }
+
+# Global instances
+model_serving = ModelServing()
+document_classifier = model_serving.register('document_classifier', DocumentClassifier)
+sla_predictor = model_serving.register('sla_predictor', SLABreachPredictor)
+# None until a PerformanceBaseline is published; anomaly detection then refits per request
+anomaly_baseline = model_serving.register('performance_anomaly_baseline', lambda: None)
@@ -1,12 +1,18 @@
+import asyncio
 import logging
+import os
 import time
+from contextlib import contextmanager
+from contextvars import ContextVar
 from functools import wraps
-from typing import Callable
+from typing import Callable, Optional
 import sentry_sdk
 from sentry_sdk.integrations.fastapi import FastApiIntegration
-from prometheus_client import Counter, Histogram, generate_latest, CONTENT_TYPE_LATEST
+from prometheus_client import Counter, Gauge, Histogram, CollectorRegistry, generate_latest, multiprocess, CONTENT_TYPE_LATEST
 from fastapi import Request, Response
-from fastapi.responses import PlainTextResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
+from fastapi.routing import APIRoute
+from starlette.routing import Match
 
 # Initialize Sentry - disabled for now
 # sentry_sdk.init(
@@ -41,6 +47,50 @@ ML_ERRORS = Counter(
     ['endpoint', 'error_type']
 )
 
+ENDPOINT_DURATION = Histogram(
+    'ml_endpoint_duration_seconds',
+    'AI endpoint handler duration in seconds',
+    ['endpoint']
+)
+
+# Where request time goes: db_acquire, db_query, inference, learning_write, serialization
+STAGE_DURATION = Histogram(
+    'request_stage_duration_seconds',
+    'Time spent in one stage of request handling, by route template',
+    ['stage', 'endpoint']
+)
+
+FORECAST_CACHE_EVENTS = Counter(
+    'forecast_cache_events_total',
+    'Forecast model cache lookups, fits and evictions',
+    ['event']
+)
+
+# CPU-bound work offloaded to compute_executor worker processes
+COMPUTE_QUEUE_DEPTH = Gauge(
+    'compute_queue_depth',
+    'Compute tasks waiting for a free worker process',
+    multiprocess_mode='livesum'
+)
+
+COMPUTE_INFLIGHT = Gauge(
+    'compute_tasks_inflight',
+    'Compute tasks queued or running',
+    multiprocess_mode='livesum'
+)
+
+COMPUTE_TASKS = Counter(
+    'compute_tasks_total',
+    'Compute tasks by outcome (ok, error, timeout, cancelled, rejected)',
+    ['task', 'outcome']
+)
+
+COMPUTE_TASK_DURATION = Histogram(
+    'compute_task_duration_seconds',
+    'Compute task time including the wait for a worker',
+    ['task']
+)
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -53,8 +103,131 @@ logging.basicConfig(
 
 logger = logging.getLogger(__name__)
 
-def log_endpoint_call(endpoint_name: str):
-    """Decorator to log endpoint calls"""
+# Label for requests that matched no route, so unknown paths cannot create new series
+UNMATCHED_ROUTE = '<unmatched>'
+
+# Per-request labels shared by the middleware, log_endpoint_call and time_stage
+_request_context: ContextVar[Optional[dict]] = ContextVar('request_context', default=None)
+
+def route_template(scope) -> str:
+    """Path template of the route that handled scope (e.g. /items/{id}), never the raw path"""
+    route = scope.get('route')
+    if route is not None and getattr(route, 'path', None):
+        return route.path
+    router = getattr(scope.get('app'), 'router', None)
+    for candidate in getattr(router, 'routes', []):
+        match, _ = candidate.matches(scope)
+        if match == Match.FULL:
+            return getattr(candidate, 'path', UNMATCHED_ROUTE)
+    return UNMATCHED_ROUTE
+
+def begin_request(scope):
+    """Open the timing context of one HTTP request; returns the token for end_request"""
+    return _request_context.set({'scope': scope, 'endpoint': None, 'model_type': None})
+
+def end_request(token):
+    _request_context.reset(token)
+
+def clear_request_context():
+    """Detach a long-lived task started from a request, so its stages count as background"""
+    _request_context.set(None)
+
+def current_endpoint() -> str:
+    """Route template of the request being handled, or 'background' outside requests"""
+    context = _request_context.get()
+    if context is None:
+        return 'background'
+    if context['endpoint'] is None:
+        # Resolved once routing has happened, then reused by every later stage
+        context['endpoint'] = route_template(context['scope'])
+    return context['endpoint']
+
+@contextmanager
+def time_stage(stage: str, model_type: str = None):
+    """Observe the duration of a block as one stage of the current request
+    
+    Use from the event loop (around the await), not inside executor threads, which do
+    not inherit the request context. model_type (for inference stages) becomes the
+    model_type label of the endpoint's prediction counter.
+    """
+    context = _request_context.get()
+    if model_type and context is not None:
+        context['model_type'] = model_type
+    start_time = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_DURATION.labels(stage=stage, endpoint=current_endpoint()).observe(time.perf_counter() - start_time)
+
+def timed_stage(stage: str, model_type: str = None):
+    """Decorator form of time_stage for sync and async functions"""
+    def decorator(func: Callable):
+        if asyncio.iscoroutinefunction(func):
+            @wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with time_stage(stage, model_type):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+        
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with time_stage(stage, model_type):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def _mark_serialization_start(func: Callable) -> Callable:
+    """Wrap an endpoint to record when it returned, i.e. when FastAPI starts encoding"""
+    def mark():
+        context = _request_context.get()
+        if context is not None:
+            context['serialization_start'] = time.perf_counter()
+    
+    if asyncio.iscoroutinefunction(func):
+        @wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            result = await func(*args, **kwargs)
+            mark()
+            return result
+        return async_wrapper
+    
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        result = func(*args, **kwargs)
+        mark()
+        return result
+    return wrapper
+
+class TimedRoute(APIRoute):
+    """APIRoute that lets TimedJSONResponse time jsonable_encoder and json.dumps together"""
+    
+    def __init__(self, path: str, endpoint: Callable, **kwargs):
+        super().__init__(path, _mark_serialization_start(endpoint), **kwargs)
+
+class TimedJSONResponse(JSONResponse):
+    """JSONResponse observed as the serialization stage
+
+    On a TimedRoute the stage runs from the endpoint's return (before FastAPI's
+    jsonable_encoder / response model step) to the end of rendering; otherwise it only
+    covers the final json.dumps.
+    """
+    
+    def render(self, content) -> bytes:
+        context = _request_context.get()
+        start = context.pop('serialization_start', None) if context is not None else None
+        if start is None:
+            with time_stage('serialization'):
+                return super().render(content)
+        body = super().render(content)
+        STAGE_DURATION.labels(stage='serialization', endpoint=current_endpoint()).observe(time.perf_counter() - start)
+        return body
+
+def log_endpoint_call(endpoint_name: str, model_type: str = None):
+    """Decorator to log endpoint calls
+    
+    model_type labels the prediction counter; when omitted it is taken from the inference
+    stage timed during the call ('none' if the endpoint timed none).
+    """
     def decorator(func: Callable):
         @wraps(func)
         async def wrapper(*args, **kwargs):
@@ -64,40 +237,56 @@ def log_endpoint_call(endpoint_name: str):
                 result = await func(*args, **kwargs) if asyncio.iscoroutinefunction(func) else func(*args, **kwargs)
                 duration = time.time() - start_time
                 logger.info(f"Completed {endpoint_name} in {duration:.2f}s")
-                ML_PREDICTIONS.labels(endpoint=endpoint_name, model_type="sklearn").inc()
+                ENDPOINT_DURATION.labels(endpoint=endpoint_name).observe(duration)
+                context = _request_context.get()
+                used_model = model_type or (context or {}).get('model_type') or 'none'
+                ML_PREDICTIONS.labels(endpoint=endpoint_name, model_type=used_model).inc()
                 return result
             except Exception as e:
                 duration = time.time() - start_time
                 logger.error(f"Error in {endpoint_name} after {duration:.2f}s: {str(e)}")
+                ENDPOINT_DURATION.labels(endpoint=endpoint_name).observe(duration)
                 ML_ERRORS.labels(endpoint=endpoint_name, error_type=type(e).__name__).inc()
                 # sentry_sdk.capture_exception(e)  # Disabled for now
                 raise
         return wrapper
     return decorator
 
-async def metrics_middleware(request: Request, call_next):
-    """Middleware to collect metrics"""
-    start_time = time.time()
-    
-    response = await call_next(request)
-    
-    duration = time.time() - start_time
+def record_request(scope, status_code: int, duration: float):
+    """Count one HTTP request and observe its duration (called by the ASGI middleware)
     
-    REQUEST_COUNT.labels(
-        method=request.method,
-        endpoint=request.url.path,
-        status_code=response.status_code
-    ).inc()
-    
-    REQUEST_DURATION.labels(
-        method=request.method,
-        endpoint=request.url.path
-    ).observe(duration)
+    Labelled by route template rather than raw path to keep the series count bounded.
+    """
+    method = scope.get('method', '')
+    context = _request_context.get()
+    endpoint = current_endpoint() if context is not None and context['scope'] is scope else route_template(scope)
+    REQUEST_COUNT.labels(method=method, endpoint=endpoint, status_code=status_code).inc()
+    REQUEST_DURATION.labels(method=method, endpoint=endpoint).observe(duration)
+
+async def metrics_middleware(request: Request, call_next):
+    """Middleware to collect metrics
     
-    return response
+    Kept for apps that do not use connection_middleware, which records the same metrics.
+    """
+    start_time = time.time()
+    token = begin_request(request.scope)
+    try:
+        response = await call_next(request)
+        record_request(request.scope, response.status_code, time.time() - start_time)
+        return response
+    finally:
+        end_request(token)
 
 def get_metrics():
-    """Get Prometheus metrics"""
+    """Get Prometheus metrics
+    
+    Under the multi-worker launcher every worker writes its samples to
+    PROMETHEUS_MULTIPROC_DIR, and whichever worker serves the scrape aggregates them.
+    """
+    if os.getenv('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return PlainTextResponse(generate_latest(registry), media_type=CONTENT_TYPE_LATEST)
     return PlainTextResponse(generate_latest(), media_type=CONTENT_TYPE_LATEST)
 
 import asyncio
\ No newline at end of file
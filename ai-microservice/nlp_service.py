@@ -0,0 +1,182 @@
+"""
+Batched spaCy Inference
+Loads the French pipeline with only the components entity extraction needs and
+micro-batches concurrent requests into nlp.pipe calls on a dedicated worker thread,
+so request handlers never run the model on the event loop.
+"""
+
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+import logging
+import os
+
+from monitoring import clear_request_context, time_stage
+
+logger = logging.getLogger(__name__)
+
+NLP_MODEL = os.getenv('NLP_MODEL', 'fr_core_news_sm')
+# A batch is sent to nlp.pipe when it holds this many texts, or this long after its first text
+NLP_BATCH_SIZE = int(os.getenv('NLP_BATCH_SIZE', 64))
+NLP_BATCH_WAIT_MS = float(os.getenv('NLP_BATCH_WAIT_MS', 5))
+NLP_MAX_QUEUE = int(os.getenv('NLP_MAX_QUEUE', 10000))
+
+# Entities are all the endpoints use; everything else is disabled after loading
+NLP_REQUIRED_COMPONENTS = ('ner',)
+
+Entity = Tuple[str, str]
+
+def load_entity_pipeline(model_name: str = NLP_MODEL):
+    """Load a spaCy pipeline with every component not needed for NER disabled
+
+    The shared tok2vec is kept only when the NER component listens to it; in the small
+    French model NER carries its own embedding layer, so it runs alone.
+    """
+    import spacy
+
+    nlp = spacy.load(model_name)
+    keep = set(NLP_REQUIRED_COMPONENTS)
+    for name in NLP_REQUIRED_COMPONENTS:
+        for upstream in nlp.pipe_names:
+            listeners = getattr(nlp.get_pipe(upstream), 'listening_components', [])
+            if name in listeners:
+                keep.add(upstream)
+    nlp.select_pipes(enable=[name for name in nlp.pipe_names if name in keep])
+    logger.info(f"Loaded {model_name} with components: {nlp.pipe_names}")
+    return nlp
+
+class NLPService:
+    """Micro-batching entity extractor in front of one spaCy pipeline
+
+    Callers await entities(text); texts arriving while a batch is being collected are
+    grouped and run through nlp.pipe in a single worker thread. Only plain
+    (text, label) tuples leave the worker, so Doc objects are never shared across threads.
+    """
+
+    def __init__(self, model_name: str = NLP_MODEL, batch_size: int = NLP_BATCH_SIZE,
+                 batch_wait: float = NLP_BATCH_WAIT_MS / 1000, max_queue: int = NLP_MAX_QUEUE):
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait
+        self.max_queue = max_queue
+        self.nlp = None
+        self.queue = None
+        self._task = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='nlp-pipe')
+        self.stats = {'texts': 0, 'batches': 0, 'max_batch': 0, 'rejected': 0, 'failed': 0, 'pipe_seconds': 0.0}
+
+    # --- worker thread side -------------------------------------------------
+
+    def _pipeline(self):
+        if self.nlp is None:
+            self.nlp = load_entity_pipeline(self.model_name)
+        return self.nlp
+
+    def _run_pipe(self, texts: List[str]) -> List[List[Entity]]:
+        nlp = self._pipeline()
+        start = time.time()
+        results = [
+            [(ent.text, ent.label_) for ent in doc.ents]
+            for doc in nlp.pipe(texts, batch_size=self.batch_size)
+        ]
+        self.stats['pipe_seconds'] += time.time() - start
+        return results
+
+    # --- event loop side ----------------------------------------------------
+
+    def _ensure_started(self):
+        if self._task is None or self._task.done():
+            if self.queue is None:
+                self.queue = asyncio.Queue(maxsize=self.max_queue)
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def _run(self):
+        clear_request_context()
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.batch_wait
+            while len(batch) < self.batch_size:
+                if not self.queue.empty():
+                    batch.append(self.queue.get_nowait())
+                    continue
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            await self._process(batch)
+
+    async def _process(self, batch: List[Tuple[str, asyncio.Future]]):
+        pending = [(text, future) for text, future in batch if not future.done()]
+        if not pending:
+            return
+        self.stats['batches'] += 1
+        self.stats['texts'] += len(pending)
+        self.stats['max_batch'] = max(self.stats['max_batch'], len(pending))
+        try:
+            loop = asyncio.get_running_loop()
+            results = await loop.run_in_executor(self._executor, self._run_pipe, [text for text, _ in pending])
+        except Exception as e:
+            self.stats['failed'] += len(pending)
+            logger.error(f"NLP batch of {len(pending)} texts failed: {e}")
+            for _, future in pending:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, future), entities in zip(pending, results):
+            if not future.done():
+                future.set_result(entities)
+
+    def _submit(self, text: str) -> asyncio.Future:
+        self._ensure_started()
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self.queue.put_nowait((text or '', future))
+        except asyncio.QueueFull:
+            self.stats['rejected'] += 1
+            future.set_exception(RuntimeError("NLP queue is full"))
+        return future
+
+    async def entities(self, text: str) -> List[Entity]:
+        """(text, label) of every entity spaCy finds in text"""
+        with time_stage('inference', model_type='spacy'):
+            return await self._submit(text)
+
+    async def entities_many(self, texts: List[str]) -> List[List[Entity]]:
+        """Entities for a list of texts, in input order; the texts share nlp.pipe batches"""
+        with time_stage('inference', model_type='spacy'):
+            futures = [self._submit(text) for text in texts]
+            return list(await asyncio.gather(*futures))
+
+    def load(self):
+        """Load the pipeline in the calling thread, e.g. in a launcher before it forks workers"""
+        return self._pipeline()
+
+    async def warmup(self):
+        """Load the pipeline in the worker thread ahead of the first request"""
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self._executor, self._pipeline)
+
+    def shutdown(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        self._executor.shutdown(wait=False)
+
+    def info(self) -> Dict:
+        batches = self.stats['batches']
+        return {
+            **self.stats,
+            'model': self.model_name,
+            'loaded': self.nlp is not None,
+            'components': list(self.nlp.pipe_names) if self.nlp is not None else [],
+            'queued': self.queue.qsize() if self.queue is not None else 0,
+            'avg_batch': round(self.stats['texts'] / batches, 2) if batches else 0.0
+        }
+
+# Global instance
+nlp_service = NLPService()
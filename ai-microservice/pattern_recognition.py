@@ -5,22 +5,113 @@ from sklearn.preprocessing import StandardScaler
 from sklearn.decomposition import PCA
 from sklearn.ensemble import IsolationForest
 from sklearn.neighbors import LocalOutlierFactor
-from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.metrics.pairwise import cosine_similarity
 from collections import Counter, defaultdict
 import logging
-from typing import Dict, List, Any, Tuple
+from typing import Dict, List, Any, Optional, Tuple
 from datetime import datetime, timedelta
+from scipy import sparse
+from scipy.sparse.csgraph import connected_components
 import re
+import os
+
+from monitoring import timed_stage
+from text_featurizer import text_featurizer
 
 logger = logging.getLogger(__name__)
 
+# Rows of the TF-IDF matrix compared per sparse product when building the neighbour graph
+RECURRING_BLOCK_SIZE = int(os.getenv('RECURRING_BLOCK_SIZE', 512))
+
+def sparse_similarity_join(tfidf_matrix, threshold: float,
+                           block_size: int = RECURRING_BLOCK_SIZE) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """All pairs i < j whose cosine similarity is >= threshold, as (rows, cols, similarities)
+    
+    Rows must be L2-normalised (as produced by text_featurizer). Each block of rows is multiplied
+    only against itself and the rows after it, and thresholded before the next block, so
+    memory stays proportional to block_size × n plus the emitted pairs.
+    """
+    X = sparse.csr_matrix(tfidf_matrix, dtype=np.float64)
+    n = X.shape[0]
+    rows, cols, similarities = [], [], []
+    
+    for start in range(0, n, block_size):
+        stop = min(start + block_size, n)
+        block = (X[start:stop] @ X[start:].T).tocoo()
+        row = block.row + start
+        col = block.col + start
+        keep = (col > row) & (block.data >= threshold)
+        rows.append(row[keep])
+        cols.append(col[keep])
+        similarities.append(block.data[keep])
+    
+    if not rows:
+        empty = np.array([], dtype=np.int64)
+        return empty, empty, np.array([], dtype=np.float64)
+    return np.concatenate(rows), np.concatenate(cols), np.concatenate(similarities)
+
+def similarity_clusters(n: int, rows: np.ndarray, cols: np.ndarray) -> List[List[int]]:
+    """Connected groups of rows linked by join pairs, largest first (singletons omitted)"""
+    if len(rows) == 0:
+        return []
+    graph = sparse.csr_matrix((np.ones(len(rows)), (rows, cols)), shape=(n, n))
+    _, labels = connected_components(graph, directed=False)
+    groups = defaultdict(list)
+    for index in np.unique(np.concatenate([rows, cols])):
+        groups[labels[index]].append(int(index))
+    return sorted(groups.values(), key=lambda group: (-len(group), group[0]))
+
 class RecurringIssueDetector:
     def __init__(self):
-        self.vectorizer = None
+        self.vectorizer = text_featurizer
         self.clusters = None
         self.cluster_model = None
         
+    @staticmethod
+    def cosine_radius_graph(tfidf_matrix, eps: float, block_size: int = RECURRING_BLOCK_SIZE) -> sparse.csr_matrix:
+        """Sparse cosine-distance graph keeping only pairs within eps
+        
+        Built from sparse_similarity_join, so memory follows the number of near pairs
+        instead of n². The diagonal is always stored (distance 0).
+        """
+        n = tfidf_matrix.shape[0]
+        upper_rows, upper_cols, similarities = sparse_similarity_join(tfidf_matrix, 1.0 - eps, block_size)
+        distances = np.maximum(0.0, 1.0 - similarities)
+        
+        diagonal = np.arange(n)
+        rows = np.concatenate([upper_rows, upper_cols, diagonal])
+        cols = np.concatenate([upper_cols, upper_rows, diagonal])
+        distances = np.concatenate([distances, distances, np.zeros(n)])
+        return sparse.csr_matrix((distances, (rows, cols)), shape=(n, n))
+    
+    @staticmethod
+    def cluster_similarity_scores(tfidf_matrix, clusters: np.ndarray) -> np.ndarray:
+        """Mean cosine similarity of each clustered row to the other rows of its cluster
+        
+        Uses per-cluster sums: x_i · (Σ_j x_j − x_i) / (|c| − 1), linear in the matrix size.
+        Noise rows (-1) and singleton clusters get 0.
+        """
+        X = sparse.csr_matrix(tfidf_matrix, dtype=np.float64)
+        scores = np.zeros(X.shape[0])
+        clustered = np.flatnonzero(clusters != -1)
+        if len(clustered) == 0:
+            return scores
+        
+        labels, member_index = np.unique(clusters[clustered], return_inverse=True)
+        membership = sparse.csr_matrix(
+            (np.ones(len(clustered)), (member_index, clustered)),
+            shape=(len(labels), X.shape[0])
+        )
+        cluster_sums = membership @ X
+        sizes = np.asarray(membership.sum(axis=1)).ravel()
+        
+        X_clustered = X[clustered]
+        to_cluster = np.asarray(X_clustered.multiply(cluster_sums[member_index]).sum(axis=1)).ravel()
+        self_similarity = np.asarray(X_clustered.multiply(X_clustered).sum(axis=1)).ravel()
+        others = sizes[member_index] - 1
+        scores[clustered] = np.where(others > 0, (to_cluster - self_similarity) / np.maximum(others, 1), 0.0)
+        return scores
+        
     def preprocess_text(self, text: str) -> str:
         """Preprocess text for pattern analysis"""
         if not text:
@@ -32,52 +123,41 @@ class RecurringIssueDetector:
         
         return text
     
-    def detect_recurring_complaints(self, complaints: List[Dict]) -> Dict[str, Any]:
-        """Detect recurring complaint patterns"""
+    def featurize(self, complaints: List[Dict]) -> Tuple[List[str], sparse.csr_matrix]:
+        """Preprocessed descriptions and their TF-IDF rows
+        
+        Hashed 1-3 gram TF-IDF from the shared featurizer, whose IDF is updated (never
+        refit). Runs in the serving process, so the featurizer statistics stay there.
+        """
+        descriptions = [self.preprocess_text(c.get('description', '')) for c in complaints]
+        return descriptions, text_featurizer.transform(descriptions, min_df=2, max_df=0.8)
+    
+    @timed_stage('inference', model_type='sklearn')
+    def detect_recurring_complaints(self, complaints: List[Dict],
+                                    features: Optional[Tuple[List[str], sparse.csr_matrix]] = None) -> Dict[str, Any]:
+        """Detect recurring complaint patterns
+        
+        features is featurize(complaints), passed in when clustering runs in a compute worker.
+        """
         try:
             if len(complaints) < 3:
                 return {'recurring_groups': [], 'summary': 'Insufficient data for pattern detection'}
             
-            # Extract and preprocess complaint descriptions
-            descriptions = [self.preprocess_text(c.get('description', '')) for c in complaints]
-            
-            # French stop words list
-            french_stop_words = [
-                'le', 'de', 'et', 'à', 'un', 'il', 'être', 'et', 'en', 'avoir', 'que', 'pour',
-                'dans', 'ce', 'son', 'une', 'sur', 'avec', 'ne', 'se', 'pas', 'tout', 'plus',
-                'par', 'grand', 'en', 'une', 'être', 'et', 'à', 'il', 'avoir', 'ne', 'je', 'son',
-                'que', 'se', 'qui', 'ce', 'dans', 'en', 'du', 'elle', 'au', 'de', 'le', 'un', 'à',
-                'être', 'et', 'en', 'avoir', 'que', 'pour', 'dans', 'ce', 'son', 'une', 'sur',
-                'avec', 'ne', 'se', 'pas', 'tout', 'plus', 'par', 'grand', 'en', 'une', 'être',
-                'et', 'à', 'il', 'avoir', 'ne', 'je', 'son', 'que', 'se', 'qui', 'ce', 'dans',
-                'en', 'du', 'elle', 'au', 'mais', 'ou', 'où', 'donc', 'or', 'ni', 'car', 'les',
-                'des', 'ces', 'ses', 'mes', 'tes', 'nos', 'vos', 'leurs', 'cette', 'celui',
-                'celle', 'ceux', 'celles', 'celui-ci', 'celui-là', 'celle-ci', 'celle-là'
-            ]
-            
-            # Vectorize descriptions
-            self.vectorizer = TfidfVectorizer(
-                max_features=1000,
-                ngram_range=(1, 3),
-                stop_words=french_stop_words,
-                min_df=2,
-                max_df=0.8
-            )
+            descriptions, tfidf_matrix = features if features is not None else self.featurize(complaints)
             
-            tfidf_matrix = self.vectorizer.fit_transform(descriptions)
+            # Sparse neighbour graph of complaints within cosine distance eps
+            eps = 0.3
+            distance_graph = self.cosine_radius_graph(tfidf_matrix, eps)
             
-            # Calculate similarity matrix
-            similarity_matrix = cosine_similarity(tfidf_matrix)
-            
-            # Find similar complaints using clustering
+            # Find similar complaints using clustering on the precomputed graph
             self.cluster_model = DBSCAN(
-                eps=0.3,
+                eps=eps,
                 min_samples=2,
-                metric='cosine'
+                metric='precomputed'
             )
             
-            # Use cosine distance directly
-            clusters = self.cluster_model.fit_predict(tfidf_matrix.toarray())
+            clusters = self.cluster_model.fit_predict(distance_graph)
+            similarity_scores = self.cluster_similarity_scores(tfidf_matrix, clusters)
             
             # Group complaints by clusters
             recurring_groups = defaultdict(list)
@@ -89,7 +169,7 @@ class RecurringIssueDetector:
                         'date': complaints[i].get('date', datetime.now().isoformat()),
                         'client': complaints[i].get('client', 'Unknown'),
                         'type': complaints[i].get('type', 'General'),
-                        'similarity_score': float(np.mean([similarity_matrix[i][j] for j in range(len(complaints)) if clusters[j] == cluster_id and i != j]))
+                        'similarity_score': float(similarity_scores[i])
                     })
             
             # Filter groups with at least 2 complaints
@@ -98,15 +178,10 @@ class RecurringIssueDetector:
             # Calculate pattern statistics
             pattern_stats = []
             for group_id, group_complaints in significant_groups.items():
-                # Extract common keywords
-                group_descriptions = [c['description'] for c in group_complaints]
-                group_tfidf = self.vectorizer.transform(group_descriptions)
-                feature_names = self.vectorizer.get_feature_names_out()
-                
-                # Get top keywords for this group
-                mean_tfidf = np.mean(group_tfidf.toarray(), axis=0)
-                top_indices = np.argsort(mean_tfidf)[-10:][::-1]
-                top_keywords = [feature_names[i] for i in top_indices if mean_tfidf[i] > 0]
+                # Get top keywords for this group from its mean TF-IDF row
+                group_rows = np.flatnonzero(clusters == group_id)
+                mean_tfidf = np.asarray(tfidf_matrix[group_rows].mean(axis=0)).ravel()
+                top_keywords = text_featurizer.top_terms([descriptions[i] for i in group_rows], mean_tfidf)
                 
                 # Calculate time pattern
                 dates = [datetime.fromisoformat(c['date']) for c in group_complaints]
@@ -138,6 +213,7 @@ class RecurringIssueDetector:
             logger.error(f"Recurring issue detection failed: {e}")
             raise
     
+    @timed_stage('inference', model_type='sklearn')
     def detect_process_anomalies(self, process_data: List[Dict]) -> Dict[str, Any]:
         """Detect anomalies in process execution"""
         try:
@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""
+Multi-worker launcher for the ARS AI microservice
+The master process imports the app and loads the shared models (the subsystems named
+in AI_WARMUP_SUBSYSTEMS, all by default; text featurizers; learning lexicon; published
+classifier versions) once, binds the listening socket, then forks the uvicorn workers,
+which share the loaded pages copy-on-write. Per-worker state - the asyncpg pool, SQLite
+connections, executors and the scheduler thread - is created in each worker after the
+fork; the scheduled jobs run in the one worker that wins the scheduler lock
+(leader_election). Dead workers are restarted.
+
+    python serve.py                        # AI_WORKERS workers on AI_SERVICE_PORT
+    python serve.py --workers 4 --port 8002
+
+Without os.fork (Windows) it falls back to uvicorn's spawned workers, which each load
+their own models.
+"""
+
+import argparse
+import gc
+import os
+import shutil
+import signal
+import tempfile
+import time
+import logging
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+AI_WORKERS = int(os.getenv('AI_WORKERS', os.cpu_count() or 1))
+AI_SERVICE_HOST = os.getenv('AI_SERVICE_HOST', '0.0.0.0')
+AI_SERVICE_PORT = int(os.getenv('AI_SERVICE_PORT', 8002))
+AI_KEEP_ALIVE_TIMEOUT = int(os.getenv('AI_KEEP_ALIVE_TIMEOUT', 30))
+# Subsystems loaded in the master; anything left out is loaded separately by every worker
+# that uses it, so list all the deployment needs
+PREFORK_WARMUP = os.getenv('AI_WARMUP_SUBSYSTEMS', 'all')
+# Seconds the master waits for workers to finish in-flight requests on shutdown
+AI_GRACEFUL_TIMEOUT = float(os.getenv('AI_GRACEFUL_TIMEOUT', 30))
+
+def setup_metrics_dir() -> str:
+    """Point prometheus_client at a fresh shared directory so /metrics covers every worker
+
+    Must run before anything imports prometheus_client.
+    """
+    metrics_dir = os.getenv('PROMETHEUS_MULTIPROC_DIR')
+    if metrics_dir:
+        os.makedirs(metrics_dir, exist_ok=True)
+        for name in os.listdir(metrics_dir):
+            if name.endswith('.db'):
+                os.remove(os.path.join(metrics_dir, name))
+    else:
+        metrics_dir = tempfile.mkdtemp(prefix='ars-ai-metrics-')
+        os.environ['PROMETHEUS_MULTIPROC_DIR'] = metrics_dir
+    return metrics_dir
+
+def preload():
+    """Import the app and load the models shared by all workers; returns the app"""
+    from ai_microservice import app
+    from learning_engine import learning_engine
+    from model_serving import model_serving
+    from startup_learning import initialize_learning_system
+    from subsystems import subsystems
+
+    initialize_learning_system()
+    logger.info(f"Preloaded subsystems: {subsystems.warmup(PREFORK_WARMUP)}")
+    model_serving.refresh()
+
+    # Workers reopen the learning database after the fork
+    learning_engine.close()
+    return app
+
+def run_worker(app, sock, worker_id: int) -> int:
+    """Serve app on the inherited socket until uvicorn stops; returns the exit code"""
+    import uvicorn
+
+    gc.enable()
+    logger.info(f"Worker {worker_id} started (pid {os.getpid()})")
+    config = uvicorn.Config(app, timeout_keep_alive=AI_KEEP_ALIVE_TIMEOUT)
+    try:
+        uvicorn.Server(config).run(sockets=[sock])
+        return 0
+    except Exception as e:
+        logger.error(f"Worker {worker_id} failed: {e}")
+        return 1
+
+class PreforkSupervisor:
+    """Forks the workers from the preloaded master and restarts the ones that die"""
+
+    def __init__(self, app, sock, workers: int):
+        self.app = app
+        self.sock = sock
+        self.workers = workers
+        self.children = {}  # pid -> worker id
+        self.stopping = False
+
+    def spawn(self, worker_id: int):
+        # Blocked across the fork, so a signal never runs the master's handler in a worker
+        blocked = {signal.SIGINT, signal.SIGTERM}
+        signal.pthread_sigmask(signal.SIG_BLOCK, blocked)
+        pid = os.fork()
+        if pid == 0:
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            signal.pthread_sigmask(signal.SIG_UNBLOCK, blocked)
+            code = 1
+            try:
+                code = run_worker(self.app, self.sock, worker_id)
+            finally:
+                # Skip the master's atexit handlers and finally blocks
+                logging.shutdown()
+                os._exit(code)
+        signal.pthread_sigmask(signal.SIG_UNBLOCK, blocked)
+        self.children[pid] = worker_id
+
+    def stop(self, signum=None, frame=None):
+        self.stopping = True
+        for pid in list(self.children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def run(self):
+        from prometheus_client import multiprocess  # after setup_metrics_dir
+
+        signal.signal(signal.SIGINT, self.stop)
+        signal.signal(signal.SIGTERM, self.stop)
+        # Objects loaded so far move to the permanent generation, so collections in the
+        # workers do not write to (and copy) the shared pages
+        gc.freeze()
+        for worker_id in range(self.workers):
+            self.spawn(worker_id)
+
+        deadline = None
+        while self.children:
+            if self.stopping and deadline is None:
+                deadline = time.monotonic() + AI_GRACEFUL_TIMEOUT
+            if deadline is not None and time.monotonic() > deadline:
+                logger.warning("Workers did not stop in time, killing them")
+                for pid in list(self.children):
+                    try:
+                        os.kill(pid, signal.SIGKILL)
+                    except ProcessLookupError:
+                        pass
+                deadline = float('inf')
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                break
+            if pid == 0:
+                time.sleep(0.2)
+                continue
+            worker_id = self.children.pop(pid, None)
+            if worker_id is None:
+                continue
+            # Drop the dead worker's live gauges (compute queue depth) from /metrics
+            multiprocess.mark_process_dead(pid)
+            if self.stopping:
+                logger.info(f"Worker {worker_id} (pid {pid}) stopped")
+            else:
+                logger.warning(f"Worker {worker_id} (pid {pid}) exited with status {status}, restarting")
+                time.sleep(1)
+                self.spawn(worker_id)
+
+def serve_forked(host: str, port: int, workers: int):
+    import uvicorn
+
+    gc.disable()  # until the fork, so loading leaves no freed holes in shared pages
+    metrics_dir = setup_metrics_dir()
+    app = preload()
+    sock = uvicorn.Config(app, host=host, port=port).bind_socket()
+    logger.info(f"Preloaded models in master (pid {os.getpid()}), starting {workers} workers on {host}:{port}")
+    try:
+        PreforkSupervisor(app, sock, workers).run()
+    finally:
+        sock.close()
+        shutil.rmtree(metrics_dir, ignore_errors=True)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, default=AI_WORKERS)
+    parser.add_argument('--host', default=AI_SERVICE_HOST)
+    parser.add_argument('--port', type=int, default=AI_SERVICE_PORT)
+    args = parser.parse_args()
+    workers = max(1, args.workers)
+    # Read when the app is imported: compute and forecast pools are sized per worker
+    os.environ['AI_WORKER_COUNT'] = str(workers)
+
+    if hasattr(os, 'fork'):
+        serve_forked(args.host, args.port, workers)
+        return
+
+    import uvicorn
+
+    logger.warning("os.fork is unavailable, starting spawned workers that load their own models")
+    setup_metrics_dir()
+    uvicorn.run('ai_microservice:app', host=args.host, port=args.port, workers=workers,
+                timeout_keep_alive=AI_KEEP_ALIVE_TIMEOUT)
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,94 @@
 import numpy as np
 import pandas as pd
+from datetime import datetime
 from sklearn.ensemble import IsolationForest
+from sklearn.kernel_approximation import Nystroem
+from sklearn.linear_model import SGDOneClassSVM
 from sklearn.neighbors import LocalOutlierFactor
+from sklearn.pipeline import make_pipeline
 from sklearn.svm import OneClassSVM
 from sklearn.preprocessing import StandardScaler
-from scipy import stats
 import logging
+import os
 
 logger = logging.getLogger(__name__)
 
+# History needed before a baseline is fitted (LOF uses 20 neighbours)
+ANOMALY_BASELINE_MIN_RECORDS = int(os.getenv('ANOMALY_BASELINE_MIN_RECORDS', 50))
+# Days of performance history the scheduled baseline is fitted on
+ANOMALY_BASELINE_DAYS = int(os.getenv('ANOMALY_BASELINE_DAYS', 90))
+# Per-agent aggregation window of the scored records (the backend sends 30-day aggregates)
+ANOMALY_BASELINE_WINDOW_DAYS = int(os.getenv('ANOMALY_BASELINE_WINDOW_DAYS', 30))
+# Kernel approximation size for the one-class SVM
+ANOMALY_BASELINE_SVM_COMPONENTS = 100
+
+# Performance record fields and their defaults, in feature order
+PERFORMANCE_FEATURE_DEFAULTS = {
+    'processing_time': 0,
+    'throughput': 0,
+    'error_rate': 0,
+    'resource_utilization': 0.5,
+    'sla_compliance': 1.0,
+    'queue_length': 0,
+    'response_time': 0
+}
+# Fields the history (database.get_agent_performance_windows) computes exactly as the
+# backend does for the records it scores; the others are placeholders or current-state only
+ANOMALY_BASELINE_FEATURES = ['processing_time', 'throughput', 'resource_utilization', 'sla_compliance']
+
+class PerformanceBaseline:
+    """Anomaly models fitted once on historical performance records, then used to score new ones
+
+    Scoring costs do not depend on how many records a request sends together: Isolation
+    Forest and LOF (novelty mode) score against the stored history, and the one-class
+    SVM is a linear SGD model on a Nystroem approximation of its RBF kernel instead of a
+    kernel SVM refitted on every call. The Z-score and IQR bounds come from the history.
+    Only the feature_names columns that vary in the history are used: a constant column
+    carries no baseline and would make every differing record an outlier.
+    """
+
+    def __init__(self, features: np.ndarray, feature_names: list, contamination: float = 0.1):
+        varying = features.std(axis=0) > 0
+        if not varying.any():
+            raise ValueError("Every baseline feature is constant in the history")
+        self.feature_names = [name for name, keep in zip(feature_names, varying) if keep]
+        features = features[:, varying]
+        self.scaler = StandardScaler().fit(features)
+        X = self.scaler.transform(features)
+        self.isolation_forest = IsolationForest(contamination=contamination, random_state=42).fit(X)
+        self.lof = LocalOutlierFactor(contamination=contamination, novelty=True).fit(X)
+        # gamma='scale' of the former OneClassSVM
+        gamma = 1.0 / (X.shape[1] * X.var()) if X.var() > 0 else 1.0
+        self.svm = make_pipeline(
+            Nystroem(gamma=gamma, n_components=min(ANOMALY_BASELINE_SVM_COMPONENTS, len(X)), random_state=42),
+            SGDOneClassSVM(nu=contamination, random_state=42)
+        ).fit(X)
+        self.mean = features.mean(axis=0)
+        self.std = features.std(axis=0)
+        self.q1, self.q3 = np.percentile(features, [25, 75], axis=0)
+        self.n_samples = len(features)
+        self.trained_at = datetime.now().isoformat()
+
+    def score(self, features_scaled: np.ndarray) -> dict:
+        """Per-algorithm predictions (-1 = anomaly) and scores for scaled features"""
+        return {
+            'isolation_forest': {
+                'predictions': self.isolation_forest.predict(features_scaled),
+                'scores': self.isolation_forest.score_samples(features_scaled)
+            },
+            'lof': {
+                'predictions': self.lof.predict(features_scaled),
+                'scores': self.lof.score_samples(features_scaled)
+            },
+            'svm': {
+                'predictions': self.svm.predict(features_scaled),
+                'scores': self.svm.score_samples(features_scaled)
+            }
+        }
+
+    def info(self) -> dict:
+        return {'n_samples': self.n_samples, 'trained_at': self.trained_at, 'features': self.feature_names}
+
 class SophisticatedAnomalyDetection:
     def __init__(self):
         self.models = {
@@ -18,9 +98,16 @@ class SophisticatedAnomalyDetection:
         }
         self.scaler = StandardScaler()
         
-    def detect_performance_anomalies(self, performance_data):
-        """Sophisticated anomaly detection for performance data"""
+    def detect_performance_anomalies(self, performance_data, baseline: 'PerformanceBaseline' = None):
+        """Sophisticated anomaly detection for performance data
+        
+        With a baseline the records are only scored against it, in any number; without
+        one the models are fitted on the records themselves, which needs at least 5.
+        """
         try:
+            if baseline is not None:
+                return self._score_against_baseline(performance_data, baseline)
+            
             if len(performance_data) < 5:
                 return {'anomalies': [], 'summary': 'Insufficient data for anomaly detection'}
             
@@ -74,56 +161,81 @@ class SophisticatedAnomalyDetection:
                 'total_records': len(performance_data),
                 'anomaly_count': len(final_anomalies),
                 'detection_methods': ['isolation_forest', 'lof', 'one_class_svm', 'statistical'],
-                'confidence_threshold': 0.7
+                'confidence_threshold': 0.7,
+                'scoring_mode': 'refit'
             }
             
         except Exception as e:
             logger.error(f"Sophisticated anomaly detection failed: {e}")
             return {'anomalies': [], 'error': str(e)}
     
-    def _extract_performance_features(self, performance_data):
-        """Extract numerical features for anomaly detection"""
+    def _score_against_baseline(self, performance_data, baseline: PerformanceBaseline):
+        if not performance_data:
+            return {'anomalies': [], 'summary': 'No performance data provided'}
+        
+        features = self._extract_performance_features(performance_data, baseline.feature_names)
+        anomaly_results = baseline.score(baseline.scaler.transform(features))
+        statistical_anomalies = self._statistical_anomaly_detection(
+            features, baseline.mean, baseline.std, baseline.q1, baseline.q3
+        )
+        ensemble_anomalies = self._ensemble_anomaly_detection(anomaly_results, performance_data)
+        final_anomalies = self._combine_anomaly_results(
+            ensemble_anomalies, statistical_anomalies, performance_data, features
+        )
+        
+        return {
+            'anomalies': final_anomalies,
+            'total_records': len(performance_data),
+            'anomaly_count': len(final_anomalies),
+            'detection_methods': ['isolation_forest', 'lof', 'one_class_svm_sgd', 'statistical'],
+            'confidence_threshold': 0.7,
+            'scoring_mode': 'baseline',
+            'baseline': baseline.info()
+        }
+    
+    def _extract_performance_features(self, performance_data, feature_names=None):
+        """Extract numerical features for anomaly detection (every field unless feature_names)"""
+        feature_names = feature_names or list(PERFORMANCE_FEATURE_DEFAULTS)
         features = []
         for record in performance_data:
-            feature_vector = [
-                record.get('processing_time', 0),
-                record.get('throughput', 0),
-                record.get('error_rate', 0),
-                record.get('resource_utilization', 0.5),
-                record.get('sla_compliance', 1.0),
-                record.get('queue_length', 0),
-                record.get('response_time', 0)
-            ]
+            feature_vector = [record.get(name, PERFORMANCE_FEATURE_DEFAULTS[name]) for name in feature_names]
             features.append(feature_vector)
-        return np.array(features)
+        return np.array(features, dtype=float).reshape(len(features), len(feature_names))
     
-    def _statistical_anomaly_detection(self, features):
-        """Statistical-based anomaly detection using Z-score and IQR"""
+    def _statistical_anomaly_detection(self, features, mean=None, std=None, q1=None, q3=None):
+        """Statistical-based anomaly detection using Z-score and IQR
+        
+        Column statistics come from the features themselves unless baseline ones are given;
+        baseline columns without spread (std or IQR of 0) are skipped by that test.
+        """
         anomalies = []
+        if mean is None:
+            mean, std = features.mean(axis=0), features.std(axis=0)
+            q1, q3 = np.percentile(features, [25, 75], axis=0)
+            z_columns = np.full(features.shape[1], len(features) > 3)
+            iqr_columns = np.ones(features.shape[1], dtype=bool)
+        else:
+            z_columns = std > 0
+            iqr_columns = q3 > q1
+        
+        # Z-score method (a constant column has no Z-score)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            z_scores = np.abs((features - mean) / std)
+        z_flags = (z_scores > 2.5) & z_columns
+        
+        # IQR method
+        iqr = q3 - q1
+        iqr_flags = ((features < q1 - 1.5 * iqr) | (features > q3 + 1.5 * iqr)) & iqr_columns
         
-        for i, feature_vector in enumerate(features):
-            is_anomaly = False
+        for i in np.flatnonzero(z_flags.any(axis=1) | iqr_flags.any(axis=1)).tolist():
             anomaly_reasons = []
-            
-            for j, value in enumerate(feature_vector):
-                # Z-score method
-                if len(features) > 3:
-                    z_score = np.abs(stats.zscore(features[:, j]))[i]
-                    if z_score > 2.5:
-                        is_anomaly = True
-                        anomaly_reasons.append(f'High Z-score ({z_score:.2f}) for feature {j}')
-                
-                # IQR method
-                q1, q3 = np.percentile(features[:, j], [25, 75])
-                iqr = q3 - q1
-                lower_bound = q1 - 1.5 * iqr
-                upper_bound = q3 + 1.5 * iqr
-                
-                if value < lower_bound or value > upper_bound:
-                    is_anomaly = True
+            for j in range(features.shape[1]):
+                if z_flags[i, j]:
+                    anomaly_reasons.append(f'High Z-score ({z_scores[i, j]:.2f}) for feature {j}')
+                if iqr_flags[i, j]:
                     anomaly_reasons.append(f'Outside IQR bounds for feature {j}')
             
-            if is_anomaly:
+            if anomaly_reasons:
                 anomalies.append({
                     'index': i,
                     'method': 'statistical',
@@ -176,14 +288,17 @@ class SophisticatedAnomalyDetection:
         for anomaly in statistical_anomalies:
             all_anomaly_indices.add(anomaly['index'])
         
+        ensemble_by_index = {a['index']: a for a in ensemble_anomalies}
+        statistical_by_index = {a['index']: a for a in statistical_anomalies}
+        
         # Create final anomaly records
         for idx in all_anomaly_indices:
             record = performance_data[idx]
             feature_vector = features[idx]
             
             # Find matching ensemble result
-            ensemble_match = next((a for a in ensemble_anomalies if a['index'] == idx), None)
-            statistical_match = next((a for a in statistical_anomalies if a['index'] == idx), None)
+            ensemble_match = ensemble_by_index.get(idx)
+            statistical_match = statistical_by_index.get(idx)
             
             # Determine severity
             severity = 'medium'
@@ -253,4 +368,34 @@ class SophisticatedAnomalyDetection:
         
         return actions if actions else ['Surveillance continue recommandée']
 
-sophisticated_anomaly_detection = SophisticatedAnomalyDetection()
\ No newline at end of file
+def score_feature_anomalies(features: np.ndarray, method: str = 'isolation_forest',
+                            contamination: float = 0.1):
+    """Standardise features and flag outliers; returns (labels, scores), -1 labels are anomalies
+
+    Module-level so /anomaly_detection can run it in a compute worker.
+    """
+    features_scaled = StandardScaler().fit_transform(features)
+    if method == 'isolation_forest':
+        detector = IsolationForest(contamination=contamination, random_state=42)
+        labels = detector.fit_predict(features_scaled)
+        return labels, detector.score_samples(features_scaled)
+    if method == 'lof':
+        detector = LocalOutlierFactor(contamination=contamination)
+        labels = detector.fit_predict(features_scaled)
+        return labels, detector.negative_outlier_factor_
+    raise ValueError("Method must be 'isolation_forest' or 'lof'")
+
+def fit_performance_baseline(performance_data, contamination: float = 0.1):
+    """Fit a PerformanceBaseline on historical records; returns (summary, baseline)
+
+    The records must be aggregated like the ones that will be scored (per agent over
+    ANOMALY_BASELINE_WINDOW_DAYS); only ANOMALY_BASELINE_FEATURES are used.
+    Module-level so the fit can run as a model_serving training job in a compute worker.
+    """
+    if len(performance_data) < ANOMALY_BASELINE_MIN_RECORDS:
+        raise ValueError(f"Need at least {ANOMALY_BASELINE_MIN_RECORDS} historical records, got {len(performance_data)}")
+    features = sophisticated_anomaly_detection._extract_performance_features(performance_data, ANOMALY_BASELINE_FEATURES)
+    baseline = PerformanceBaseline(features, ANOMALY_BASELINE_FEATURES, contamination)
+    return {**baseline.info(), 'contamination': contamination}, baseline
+
+sophisticated_anomaly_detection = SophisticatedAnomalyDetection()
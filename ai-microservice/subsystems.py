@@ -0,0 +1,161 @@
+"""
+Lazy Subsystem Registry
+Heavy libraries (spaCy, Prophet, SHAP, torch/transformers) and the engines built on them
+are imported and initialised on first use, or up front when named in AI_WARMUP_SUBSYSTEMS,
+so a restart only pays for what the deployment actually calls. Load time and resident
+memory growth are recorded per subsystem.
+"""
+
+import importlib
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, Optional, Union
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+# Comma-separated subsystem names loaded at startup, or "all"
+AI_WARMUP_SUBSYSTEMS = os.getenv('AI_WARMUP_SUBSYSTEMS', '')
+
+def current_rss() -> Optional[int]:
+    """Resident set size of this process in bytes, None when it cannot be read"""
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except Exception:
+        return None
+
+class Subsystem:
+    """One lazily imported module, or an attribute of it, plus an optional init step"""
+
+    def __init__(self, name: str, module: str, attr: Optional[str] = None,
+                 init: Optional[Callable[[Any], Any]] = None):
+        self.name = name
+        self.module = module
+        self.attr = attr
+        self.init = init
+        self.value = None
+        self.loaded = False
+        self.error = None
+        self.load_seconds = None
+        self.rss_delta = None
+
+    def info(self) -> Dict[str, Any]:
+        return {
+            'module': self.module + (f'.{self.attr}' if self.attr else ''),
+            'loaded': self.loaded,
+            'load_seconds': round(self.load_seconds, 3) if self.load_seconds is not None else None,
+            # Memory of imports shared with an earlier subsystem is counted there
+            'rss_delta_mb': round(self.rss_delta / 2 ** 20, 1) if self.rss_delta is not None else None,
+            'error': self.error
+        }
+
+class LazyEngine:
+    """Stands in for a subsystem's global instance; the first attribute access loads it"""
+
+    __slots__ = ('_registry', '_name')
+
+    def __init__(self, registry: 'SubsystemRegistry', name: str):
+        object.__setattr__(self, '_registry', registry)
+        object.__setattr__(self, '_name', name)
+
+    def __getattr__(self, attr):
+        return getattr(self._registry.get(self._name), attr)
+
+    def __setattr__(self, attr, value):
+        setattr(self._registry.get(self._name), attr, value)
+
+    def __repr__(self):
+        state = 'loaded' if self._registry.is_loaded(self._name) else 'not loaded'
+        return f"<lazy {self._name} ({state})>"
+
+class SubsystemRegistry:
+    """Named subsystems, each imported and initialised once, on first use or at warm-up"""
+
+    def __init__(self):
+        self._subsystems: Dict[str, Subsystem] = {}
+        # Reentrant: initialising one subsystem may load another
+        self._lock = threading.RLock()
+
+    def register(self, name: str, module: str, attr: Optional[str] = None,
+                 init: Optional[Callable[[Any], Any]] = None) -> LazyEngine:
+        """Declare a subsystem; returns a proxy to use in place of its global instance"""
+        self._subsystems[name] = Subsystem(name, module, attr, init)
+        return LazyEngine(self, name)
+
+    def is_loaded(self, name: str) -> bool:
+        return self._subsystems[name].loaded
+
+    def get(self, name: str) -> Any:
+        """The subsystem's module or instance, importing and initialising it if needed"""
+        subsystem = self._subsystems[name]
+        if subsystem.loaded:
+            return subsystem.value
+        with self._lock:
+            if subsystem.loaded:
+                return subsystem.value
+            rss_before = current_rss()
+            start = time.perf_counter()
+            try:
+                value = importlib.import_module(subsystem.module)
+                if subsystem.attr:
+                    value = getattr(value, subsystem.attr)
+                if subsystem.init is not None:
+                    subsystem.init(value)
+            except Exception as e:
+                subsystem.error = str(e)
+                logger.error(f"Loading subsystem {name} failed: {e}")
+                raise
+            subsystem.load_seconds = time.perf_counter() - start
+            rss_after = current_rss()
+            if rss_before is not None and rss_after is not None:
+                subsystem.rss_delta = rss_after - rss_before
+            subsystem.value = value
+            subsystem.error = None
+            subsystem.loaded = True
+            logger.info(f"Loaded subsystem {name} in {subsystem.load_seconds:.2f}s")
+            return value
+
+    def warmup(self, names: Union[str, Iterable[str], None] = AI_WARMUP_SUBSYSTEMS) -> Dict[str, bool]:
+        """Load the named subsystems ("all" for every one); returns name -> loaded"""
+        if isinstance(names, str):
+            names = list(self._subsystems) if names.strip() == 'all' else [
+                name.strip() for name in names.split(',') if name.strip()
+            ]
+        results = {}
+        for name in names or []:
+            if name not in self._subsystems:
+                logger.warning(f"Unknown subsystem in warm-up list: {name}")
+                results[name] = False
+                continue
+            try:
+                self.get(name)
+                results[name] = True
+            except Exception:
+                results[name] = False
+        return results
+
+    def info(self) -> Dict[str, Any]:
+        rss = current_rss()
+        return {
+            'rss_mb': round(rss / 2 ** 20, 1) if rss is not None else None,
+            'subsystems': {name: subsystem.info() for name, subsystem in self._subsystems.items()}
+        }
+
+# Global instance
+subsystems = SubsystemRegistry()
+
+def _load_nlp_pipeline(service):
+    service.load()
+
+subsystems.register('spacy', 'nlp_service', 'nlp_service', init=_load_nlp_pipeline)
+subsystems.register('prophet', 'prophet')
+# Engines whose modules pull in SHAP and torch/transformers at import
+explainer = subsystems.register('explainer', 'explainable_ai', 'explainer')
+generative_ai = subsystems.register('generative_ai', 'generative_ai', 'generative_ai')
@@ -0,0 +1,105 @@
+import numpy as np
+import pytest
+
+from sophisticated_anomaly_detection import (
+    SophisticatedAnomalyDetection, fit_performance_baseline, ANOMALY_BASELINE_FEATURES
+)
+
+N_AGENTS = 40
+HISTORY_DAYS = 90
+WINDOW_DAYS = 30
+
+def simulate_bordereaux(seed=0):
+    """Creation day (days before now) and settlement delay of each agent's bordereaux"""
+    rng = np.random.default_rng(seed)
+    agents = []
+    for _ in range(N_AGENTS):
+        rate = rng.uniform(0.2, 0.8)  # bordereaux per day
+        created = rng.uniform(0, HISTORY_DAYS + WINDOW_DAYS, rng.poisson(rate * (HISTORY_DAYS + WINDOW_DAYS)))
+        delays = rng.choice([15, 30, 45], len(created))
+        agents.append((created, delays))
+    return agents
+
+def window_record(agent_id, created, delays, end, capacity=20):
+    """One agent's window ending `end` days ago, computed like get_agent_performance_windows"""
+    in_window = (created >= end) & (created < end + WINDOW_DAYS)
+    ages = created[in_window] - end
+    count = int(in_window.sum())
+    return {
+        'id': agent_id,
+        'processing_time': float(ages.mean() * 24) if count else 0.0,
+        'throughput': count,
+        'resource_utilization': min(1.0, count / capacity),
+        'sla_compliance': float((ages <= delays[in_window]).mean()) if count else 1.0
+    }
+
+def production_records(agents, seed=1):
+    """The current window as the backend sends it, with its placeholder fields"""
+    rng = np.random.default_rng(seed)
+    records = []
+    for i, (created, delays) in enumerate(agents):
+        record = window_record(f'agent_{i}', created, delays, 0)
+        record.update({
+            'error_rate': rng.random() * 0.1,
+            'queue_length': int(rng.integers(0, 5)),
+            'response_time': 24
+        })
+        records.append(record)
+    return records
+
+@pytest.fixture(scope='module')
+def agents():
+    return simulate_bordereaux()
+
+@pytest.fixture(scope='module')
+def baseline(agents):
+    history = [
+        window_record(f'agent_{i}', created, delays, end)
+        for i, (created, delays) in enumerate(agents)
+        for end in range(1, HISTORY_DAYS + 1)
+    ]
+    _, baseline = fit_performance_baseline(history)
+    return baseline
+
+class TestPerformanceBaseline:
+    def test_uses_only_history_features(self, baseline):
+        assert set(baseline.feature_names) <= set(ANOMALY_BASELINE_FEATURES)
+        assert 'response_time' not in baseline.feature_names
+
+    def test_production_records_are_not_all_anomalous(self, agents, baseline):
+        detector = SophisticatedAnomalyDetection()
+        records = production_records(agents)
+        scored = detector.detect_performance_anomalies(records, baseline)
+        refit = detector.detect_performance_anomalies(records)
+
+        assert scored['scoring_mode'] == 'baseline'
+        assert scored['anomaly_count'] <= len(records) // 4
+        high = [a for a in scored['anomalies'] if a['severity'] == 'high']
+        assert len(high) <= max(4, 2 * sum(a['severity'] == 'high' for a in refit['anomalies']))
+
+    def test_deviating_agent_is_flagged(self, agents, baseline):
+        records = production_records(agents)
+        records[0].update({'processing_time': 2000.0, 'throughput': 60, 'resource_utilization': 1.0,
+                           'sla_compliance': 0.0})
+        scored = SophisticatedAnomalyDetection().detect_performance_anomalies(records, baseline)
+        assert 'agent_0' in [a['record_id'] for a in scored['anomalies']]
+
+    def test_constant_history_columns_are_dropped(self):
+        rng = np.random.default_rng(2)
+        history = [{'processing_time': float(t), 'throughput': int(n), 'resource_utilization': 0.5,
+                    'sla_compliance': 1.0} for t, n in zip(rng.normal(300, 50, 200), rng.poisson(10, 200))]
+        _, baseline = fit_performance_baseline(history)
+        assert baseline.feature_names == ['processing_time', 'throughput']
+
+        records = [{'id': i, 'processing_time': 300.0, 'throughput': 10, 'resource_utilization': 0.9,
+                    'sla_compliance': 0.7} for i in range(10)]
+        scored = SophisticatedAnomalyDetection().detect_performance_anomalies(records, baseline)
+        assert scored['anomaly_count'] == 0
+
+class TestStatisticalDetection:
+    def test_zero_spread_baseline_columns_are_skipped(self):
+        features = np.array([[1.0, 5.0], [1.2, 9.0]])
+        mean, std = np.array([1.0, 3.0]), np.array([0.2, 0.0])
+        q1, q3 = np.array([0.9, 3.0]), np.array([1.1, 3.0])
+        anomalies = SophisticatedAnomalyDetection()._statistical_anomaly_detection(features, mean, std, q1, q3)
+        assert all('feature 1' not in reason for a in anomalies for reason in a['reasons'])
@@ -0,0 +1,283 @@
+"""
+Persistent Incremental Text Featurizer
+Hashing-based 1-3 gram term features with document frequencies that are updated as new
+complaints arrive, so requests only hash and weight their texts instead of fitting a
+TfidfVectorizer per call. Every worker merges its new documents into the statistics
+saved through ModelPersistence.
+"""
+
+import hashlib
+import threading
+from itertools import islice
+from typing import Dict, Iterable, List, Optional, Sequence
+import logging
+import os
+
+import numpy as np
+from scipy import sparse
+from sklearn.feature_extraction import FeatureHasher
+from sklearn.feature_extraction.text import HashingVectorizer
+from sklearn.preprocessing import normalize
+
+from model_persistence import model_persistence
+
+logger = logging.getLogger(__name__)
+
+TEXT_FEATURIZER_NAME = os.getenv('TEXT_FEATURIZER_NAME', 'text_features')
+# Hash space size; collisions merge n-grams, so keep it well above the expected vocabulary
+TEXT_FEATURIZER_N_FEATURES = int(os.getenv('TEXT_FEATURIZER_N_FEATURES', 2 ** 20))
+# Document hashes remembered for deduplication; the oldest are forgotten past this
+TEXT_FEATURIZER_SEEN_MAX = int(os.getenv('TEXT_FEATURIZER_SEEN_MAX', 1_000_000))
+# Seconds between merges of each worker's new documents into the saved statistics
+TEXT_FEATURIZER_SYNC_SECONDS = int(os.getenv('TEXT_FEATURIZER_SYNC_SECONDS', 300))
+# Unigram, no-stop-word view used by /analyze, whose similarity threshold was set for
+# a default TfidfVectorizer
+ANALYZE_FEATURIZER_NAME = os.getenv('ANALYZE_FEATURIZER_NAME', 'analyze_text_features')
+
+# French stop words shared by the complaint text pipelines (the token pattern splits
+# hyphenated forms like celui-ci, so only their parts could ever match)
+FRENCH_STOP_WORDS = [
+    'le', 'de', 'et', 'à', 'un', 'il', 'être', 'en', 'avoir', 'que', 'pour',
+    'dans', 'ce', 'son', 'une', 'sur', 'avec', 'ne', 'se', 'pas', 'tout', 'plus',
+    'par', 'grand', 'je', 'qui', 'du', 'elle', 'au', 'mais', 'ou', 'où', 'donc',
+    'or', 'ni', 'car', 'les', 'des', 'ces', 'ses', 'mes', 'tes', 'nos', 'vos',
+    'leurs', 'cette', 'celui', 'celle', 'ceux', 'celles'
+]
+
+def document_key(text: str) -> int:
+    """64-bit hash identifying a document, used to count each text once in the IDF"""
+    return int.from_bytes(hashlib.blake2b(text.encode('utf-8'), digest_size=8).digest(), 'little')
+
+class IncrementalTextFeaturizer:
+    """TF-IDF over hashed n-grams with incrementally maintained document frequencies
+
+    Term counts come from a stateless HashingVectorizer, so there is no vocabulary to fit.
+    partial_fit adds unseen documents to the document-frequency table; transform applies
+    the current smoothed IDF (same formula as TfidfVectorizer) and L2-normalises rows.
+    Documents are deduplicated by content hash, so a corpus that comes back on every
+    request is only counted once (the last max_seen hashes are remembered). Each process
+    keeps the documents it added since its last sync, which merges them into the saved
+    statistics shared by all workers.
+    """
+
+    def __init__(self, name: str = TEXT_FEATURIZER_NAME, n_features: int = TEXT_FEATURIZER_N_FEATURES,
+                 ngram_range: tuple = (1, 3), stop_words: Optional[List[str]] = None,
+                 max_seen: int = TEXT_FEATURIZER_SEEN_MAX):
+        self.name = name
+        self.max_seen = max_seen
+        self.n_features = n_features
+        self.ngram_range = ngram_range
+        self.stop_words = stop_words
+        self.hasher = HashingVectorizer(
+            n_features=n_features,
+            ngram_range=ngram_range,
+            stop_words=stop_words,
+            alternate_sign=False,
+            norm=None,
+            dtype=np.float64
+        )
+        self.doc_freq = np.zeros(n_features, dtype=np.int32)
+        self.n_docs = 0
+        self._seen = {}  # document hash -> None, in insertion order
+        self._idf = None
+        self._pending = []  # (document hashes, count rows) added since the last sync
+        self._synced_version = None
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state.pop('_lock', None)
+        state['_idf'] = None
+        state['_pending'] = []
+        state['_synced_version'] = None
+        return state
+
+    def __setstate__(self, state):
+        state.pop('_dirty', None)
+        self.__dict__.update(state)
+        self.__dict__.setdefault('max_seen', TEXT_FEATURIZER_SEEN_MAX)
+        self.__dict__.setdefault('_pending', [])
+        self.__dict__.setdefault('_synced_version', None)
+        if isinstance(self._seen, np.ndarray):
+            self._seen = dict.fromkeys(self._seen.tolist())
+        self._lock = threading.Lock()
+
+    def same_layout(self, other) -> bool:
+        """Whether other is a featurizer hashing texts exactly like this one"""
+        return (
+            isinstance(other, IncrementalTextFeaturizer)
+            and other.n_features == self.n_features
+            and tuple(other.ngram_range) == tuple(self.ngram_range)
+            and other.stop_words == self.stop_words
+        )
+
+    def counts(self, texts: Sequence[str]) -> sparse.csr_matrix:
+        """Raw hashed n-gram counts, one row per text"""
+        X = self.hasher.transform([text or '' for text in texts])
+        X.sum_duplicates()
+        return X
+
+    def partial_fit(self, texts: Iterable[str], counts: Optional[sparse.csr_matrix] = None) -> int:
+        """Add the documents not seen before to the IDF statistics; returns how many were new"""
+        texts = [text or '' for text in texts]
+        if not texts:
+            return 0
+        keys = [document_key(text) for text in texts]
+        with self._lock:
+            new_keys = self._unseen(keys)
+            if not new_keys:
+                return 0
+            new_rows = list(new_keys.values())
+            X = counts[new_rows] if counts is not None else self.counts([texts[i] for i in new_rows])
+            self._add(list(new_keys), X)
+            self._pending.append((list(new_keys), X))
+            return len(new_rows)
+
+    def _unseen(self, keys: Sequence[int]) -> Dict[int, int]:
+        """Hash -> first position, for the keys not counted yet"""
+        new_keys = {}
+        for i, key in enumerate(keys):
+            if key not in self._seen and key not in new_keys:
+                new_keys[key] = i
+        return new_keys
+
+    def _add(self, keys: List[int], X: sparse.csr_matrix):
+        """Count the rows of X (documents keys) into the statistics; the caller holds _lock"""
+        self.doc_freq += np.bincount(X.indices, minlength=self.n_features).astype(np.int32)
+        self.n_docs += len(keys)
+        self._seen.update(dict.fromkeys(keys))
+        overflow = len(self._seen) - self.max_seen
+        if overflow > 0:
+            for key in list(islice(self._seen, overflow)):
+                del self._seen[key]
+        self._idf = None
+
+    def _merge(self, pending: List[tuple]) -> int:
+        """Count the pending documents not counted yet; the caller holds _lock"""
+        added = 0
+        for keys, X in pending:
+            new_keys = self._unseen(keys)
+            if new_keys:
+                self._add(list(new_keys), X[list(new_keys.values())])
+                added += len(new_keys)
+        return added
+
+    def idf(self) -> np.ndarray:
+        """Smoothed IDF per hashed feature: ln((1 + n) / (1 + df)) + 1"""
+        idf = self._idf
+        if idf is None:
+            with self._lock:
+                idf = np.log((1.0 + self.n_docs) / (1.0 + self.doc_freq)) + 1.0
+                self._idf = idf
+        return idf
+
+    def feature_mask(self, min_df: int = 1, max_df: float = 1.0) -> Optional[np.ndarray]:
+        """Features kept by document-frequency bounds on the accumulated corpus (None = all)"""
+        if min_df <= 1 and max_df >= 1.0:
+            return None
+        return (self.doc_freq >= min_df) & (self.doc_freq <= max_df * max(self.n_docs, 1))
+
+    def transform(self, texts: Sequence[str], update: bool = True, min_df: int = 1,
+                  max_df: float = 1.0) -> sparse.csr_matrix:
+        """L2-normalised TF-IDF rows for texts
+
+        With update=True the texts are first added to the statistics, so a new corpus is
+        weighted like TfidfVectorizer would after fitting it; known texts change nothing.
+        """
+        X = self.counts(texts)
+        if update:
+            self.partial_fit(texts, counts=X)
+        weights = self.idf()
+        mask = self.feature_mask(min_df, max_df)
+        if mask is not None:
+            weights = weights * mask
+        X = X @ sparse.diags(weights)
+        X.eliminate_zeros()
+        return normalize(X, norm='l2', copy=False).tocsr()
+
+    def top_terms(self, texts: Sequence[str], weights: np.ndarray, top_n: int = 10) -> List[str]:
+        """n-grams of texts ranked by weights[hashed feature], heaviest first, zero weights dropped"""
+        analyzer = self.hasher.build_analyzer()
+        terms = list(dict.fromkeys(term for text in texts for term in analyzer(text or '')))
+        if not terms:
+            return []
+        indices = FeatureHasher(n_features=self.n_features, input_type='string',
+                                alternate_sign=False).transform([[term] for term in terms]).indices
+        term_weights = weights[indices]
+        order = np.argsort(-term_weights, kind='stable')[:top_n]
+        return [terms[i] for i in order if term_weights[i] > 0]
+
+    def sync(self) -> bool:
+        """Merge this process's new documents into the saved statistics and continue from them
+
+        Every worker calls it on its own schedule. Under a cross-process lock the saved
+        featurizer is loaded, the documents it has not counted yet (another worker may have)
+        are added and it is saved again; this process then adopts the merged statistics,
+        so all workers converge on the same IDF.
+        """
+        model_name = f"vectorizer_{self.name}"
+        with self._lock:
+            pending, self._pending = self._pending, []
+        try:
+            with model_persistence.update_lock(model_name):
+                model_persistence.refresh_registry()
+                version = (model_persistence.get_model_info(model_name) or {}).get('version')
+                if not pending and version is not None and version == self._synced_version:
+                    return True
+                saved = model_persistence.load_vectorizer(self.name) if version is not None else None
+                created = not self.same_layout(saved)
+                if created:
+                    saved = IncrementalTextFeaturizer(self.name, self.n_features, self.ngram_range,
+                                                      self.stop_words, self.max_seen)
+                with saved._lock:
+                    added = saved._merge(pending)
+                if added or created:
+                    if not model_persistence.save_vectorizer(self.name, saved):
+                        raise RuntimeError("saving the merged statistics failed")
+                    # Continue from the mapped artifact, like the other workers
+                    saved = model_persistence.load_vectorizer(self.name) or saved
+                    version = model_persistence.get_model_info(model_name)['version']
+        except Exception as e:
+            with self._lock:
+                self._pending = pending + self._pending
+            logger.error(f"Syncing text featurizer {self.name} failed: {e}")
+            return False
+
+        with self._lock:
+            self.doc_freq = saved.doc_freq
+            self.n_docs = saved.n_docs
+            self._seen = saved._seen
+            self._idf = None
+            self._synced_version = version
+            # Documents added while syncing stay pending for the next sync
+            self._merge(self._pending)
+        return True
+
+    def info(self) -> dict:
+        return {
+            'name': self.name,
+            'n_features': self.n_features,
+            'documents': int(self.n_docs),
+            'remembered_documents': len(self._seen),
+            'active_features': int(np.count_nonzero(self.doc_freq)),
+            'unsynced_documents': sum(len(keys) for keys, _ in self._pending),
+            'synced_version': self._synced_version
+        }
+
+def load_text_featurizer(name: str = TEXT_FEATURIZER_NAME, ngram_range: tuple = (1, 3),
+                         stop_words: Optional[List[str]] = FRENCH_STOP_WORDS) -> IncrementalTextFeaturizer:
+    """Featurizer saved under name, or a new one when none is saved or its layout changed"""
+    featurizer = IncrementalTextFeaturizer(name, ngram_range=ngram_range, stop_words=stop_words)
+    try:
+        saved = model_persistence.load_vectorizer(name)
+        if featurizer.same_layout(saved):
+            saved._synced_version = model_persistence.get_model_info(f"vectorizer_{name}")['version']
+            logger.info(f"Loaded text featurizer {name} with {saved.n_docs} documents")
+            return saved
+    except Exception as e:
+        logger.error(f"Failed to load text featurizer {name}: {e}")
+    return featurizer
+
+# Global instances
+text_featurizer = load_text_featurizer()
+analyze_featurizer = load_text_featurizer(ANALYZE_FEATURIZER_NAME, ngram_range=(1, 1), stop_words=None)